@@ -0,0 +1,120 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Time spent cropping the text boxes of a page: the former path (page copy,
+deepcopy of every box and of the crop list, one warp per box) against
+get_text_crop, on a synthetic page with axis-aligned and rotated boxes.
+The crops of both paths are compared.
+
+    python benchmark/bench_crop.py --num_boxes 500,1000 --rotated_ratio 0.2
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, "..")))
+
+from tools.infer.utility import get_rotate_crop_image, get_text_crop
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page_size", type=str, default="3508,2480")
+    parser.add_argument("--num_boxes", type=str, default="500,1000,2000")
+    parser.add_argument("--rotated_ratio", type=float, default=0.2)
+    parser.add_argument("--target_height", type=int, default=48)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def make_boxes(rng, page_h, page_w, num_boxes, rotated_ratio):
+    # text lines as DBPostProcess leaves them: clockwise, integer corners
+    boxes = []
+    for _ in range(num_boxes):
+        w, h = rng.randint(40, 600), rng.randint(16, 60)
+        cx = rng.uniform(w, page_w - w)
+        cy = rng.uniform(h + 40, page_h - h - 40)
+        angle = rng.uniform(-0.3, 0.3) if rng.rand() < rotated_ratio else 0.0
+        rot = np.array(
+            [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+        )
+        corners = np.array([[-w, -h], [w, -h], [w, h], [-w, h]]) / 2.0
+        boxes.append(np.round(corners @ rot.T + [cx, cy]).astype(np.float32))
+    return boxes
+
+
+def crop_before(img, dt_boxes):
+    ori_im = img.copy()
+    crops = []
+    for bno in range(len(dt_boxes)):
+        tmp_box = copy.deepcopy(dt_boxes[bno])
+        crops.append(get_rotate_crop_image(ori_im, tmp_box))
+    # TextClassifier copied the crop list once more
+    return copy.deepcopy(crops)
+
+
+def crop_after(img, dt_boxes, target_height=None):
+    return [get_text_crop(img, box, target_height=target_height) for box in dt_boxes]
+
+
+def timeit(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = func()
+    return (time.perf_counter() - start) / repeat, out
+
+
+def main():
+    args = parse_args()
+    rng = np.random.RandomState(args.seed)
+    page_h, page_w = [int(v) for v in args.page_size.split(",")]
+    img = rng.randint(0, 255, (page_h, page_w, 3)).astype(np.uint8)
+    print("page {}x{}, rotated ratio {}".format(page_h, page_w, args.rotated_ratio))
+    print(
+        "| boxes | before ms | after ms | speedup | same crops "
+        "| after, resized to {} ms |".format(args.target_height)
+    )
+    print("| --: | --: | --: | --: | --: | --: |")
+    for num_boxes in [int(v) for v in args.num_boxes.split(",")]:
+        boxes = make_boxes(rng, page_h, page_w, num_boxes, args.rotated_ratio)
+        before, ref = timeit(lambda: crop_before(img, boxes), args.repeat)
+        after, out = timeit(lambda: crop_after(img, boxes), args.repeat)
+        same = all(
+            a.shape == b.shape and np.array_equal(a, b) for a, b in zip(ref, out)
+        )
+        resized, _ = timeit(
+            lambda: crop_after(img, boxes, args.target_height), args.repeat
+        )
+        print(
+            "| {} | {:.1f} | {:.1f} | {:.1f}x | {} | {:.1f} |".format(
+                num_boxes,
+                before * 1000,
+                after * 1000,
+                before / after,
+                same,
+                resized * 1000,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Latency of CTC beam search decoding per beam width, against greedy decoding,
+on synthetic recognizer outputs (peaked softmax with confusable characters).
+
+    python benchmark/bench_ctc_beam_search.py --beam_widths 1,5,10,20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, "..")))
+
+from ppocr.postprocess import build_post_process
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--character_dict_path", type=str, default="./ppocr/utils/ppocr_keys_v1.txt"
+    )
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--seq_len", type=int, default=40)
+    parser.add_argument("--text_len", type=int, default=10)
+    parser.add_argument("--beam_widths", type=str, default="1,2,5,10,20")
+    parser.add_argument("--beam_topk", type=int, default=10)
+    parser.add_argument("--num_workers", type=int, default=0)
+    parser.add_argument("--with_lexicon", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def make_preds(num_classes, batch_size, seq_len, text_len, seed):
+    # one character every few frames, sometimes split with a look-alike
+    rng = np.random.RandomState(seed)
+    logits = rng.randn(batch_size, seq_len, num_classes).astype(np.float32)
+    logits[:, :, 0] += 16.0
+    texts = rng.randint(1, num_classes, (batch_size, text_len))
+    step = seq_len // (text_len + 1)
+    for b in range(batch_size):
+        for j in range(text_len):
+            t = step * (j + 1)
+            logits[b, t, texts[b, j]] += 20.0
+            if rng.rand() < 0.3:
+                logits[b, t, rng.randint(1, num_classes)] += 19.5
+    preds = np.exp(logits - logits.max(axis=2, keepdims=True))
+    preds /= preds.sum(axis=2, keepdims=True)
+    return preds, texts
+
+
+def timeit(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = func()
+    return (time.perf_counter() - start) / repeat, out
+
+
+def main():
+    args = parse_args()
+    common = {
+        "character_dict_path": args.character_dict_path,
+        "use_space_char": True,
+    }
+    greedy = build_post_process(dict(common, name="CTCLabelDecode"))
+    preds, texts = make_preds(
+        len(greedy.character), args.batch_size, args.seq_len, args.text_len, args.seed
+    )
+    lexicon_path = None
+    if args.with_lexicon:
+        lexicon_path = os.path.join(tempfile.mkdtemp(), "lexicon.txt")
+        with open(lexicon_path, "w", encoding="utf-8") as f:
+            for row in texts:
+                f.write("".join(greedy.character[i] for i in row) + "\n")
+
+    greedy_time, greedy_res = timeit(lambda: greedy(preds), args.repeat)
+    print(
+        "batch {} x T {} x C {}, topk {}, lexicon {}".format(
+            *preds.shape, args.beam_topk, "yes" if lexicon_path else "no"
+        )
+    )
+    print("| decoder | ms / batch | ms / sample | same as greedy |")
+    print("| :-- | --: | --: | --: |")
+    print(
+        "| greedy | {:.2f} | {:.3f} | - |".format(
+            greedy_time * 1000, greedy_time * 1000 / len(preds)
+        )
+    )
+    for beam_width in [int(w) for w in args.beam_widths.split(",")]:
+        beam = build_post_process(
+            dict(
+                common,
+                name="CTCBeamSearchLabelDecode",
+                beam_width=beam_width,
+                beam_topk=args.beam_topk,
+                lexicon_path=lexicon_path,
+                num_workers=args.num_workers,
+            )
+        )
+        beam_time, beam_res = timeit(lambda: beam(preds), args.repeat)
+        same = np.mean([a[0] == b[0] for a, b in zip(beam_res, greedy_res)])
+        print(
+            "| beam {} | {:.2f} | {:.3f} | {:.1%} |".format(
+                beam_width,
+                beam_time * 1000,
+                beam_time * 1000 / len(preds),
+                same,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare the batched DBPostProcess.boxes_from_bitmap with the per-contour
+reference on synthetic dense pages (receipts / forms like word layouts).
+
+    python benchmark/bench_db_postprocess.py --height 1280 --width 960
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, "..")))
+
+from ppocr.postprocess.db_postprocess import DBPostProcess
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--height", type=int, default=1280)
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument("--rotated_frac", type=float, default=0.15)
+    parser.add_argument("--score_mode", type=str, default="fast")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def make_prob_map(height, width, rotated_frac, seed):
+    rng = np.random.RandomState(seed)
+    pred = rng.uniform(0, 0.05, (height, width)).astype(np.float32)
+    y = 6
+    while y < height - 12:
+        line_h = rng.randint(5, 10)
+        x = rng.randint(2, 20)
+        while x < width - 10:
+            word_w = rng.randint(6, 70)
+            angle = rng.uniform(-20, 20) if rng.rand() < rotated_frac else 0.0
+            pts = cv2.boxPoints(
+                ((x + word_w / 2, y + line_h / 2), (word_w, line_h), angle)
+            ).astype(np.int32)
+            cv2.fillPoly(pred, [pts], float(rng.uniform(0.5, 1.0)))
+            x += word_w + rng.randint(5, 14)
+        y += line_h + rng.randint(6, 12)
+    return np.clip(pred, 0, 1)
+
+
+def timeit(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = func()
+    return (time.perf_counter() - start) / repeat, out
+
+
+def main():
+    args = parse_args()
+    pred = make_prob_map(args.height, args.width, args.rotated_frac, args.seed)
+    bitmap = pred > 0.3
+    post_process = DBPostProcess(
+        thresh=0.3, box_thresh=0.6, unclip_ratio=1.5, score_mode=args.score_mode
+    )
+    dest_w, dest_h = args.width * 2, args.height * 2
+
+    ref_time, (ref_boxes, ref_scores) = timeit(
+        lambda: post_process.boxes_from_bitmap_per_contour(
+            pred, bitmap, dest_w, dest_h
+        ),
+        args.repeat,
+    )
+    new_time, (boxes, scores) = timeit(
+        lambda: post_process.boxes_from_bitmap(pred, bitmap, dest_w, dest_h),
+        args.repeat,
+    )
+    assert np.array_equal(boxes, ref_boxes), "batched boxes differ from reference"
+    assert np.allclose(scores, ref_scores), "batched scores differ from reference"
+
+    print("boxes: {}".format(len(boxes)))
+    print("per-contour: {:.2f} ms".format(ref_time * 1000))
+    print("batched:     {:.2f} ms".format(new_time * 1000))
+    print("speedup:     {:.2f}x".format(ref_time / new_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Samples per second of the DB label ops (MakeBorderMap, MakeShrinkMap) with
+the per-polygon implementation and with use_distance_transform, on synthetic
+pages of text lines. The maps of both are compared.
+
+    python benchmark/bench_db_targets.py --num_lines 20,100,400 --size 640
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, "..")))
+
+from ppocr.data.imaug.make_border_map import MakeBorderMap
+from ppocr.data.imaug.make_shrink_map import MakeShrinkMap
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_lines", type=str, default="20,100,400")
+    parser.add_argument("--size", type=int, default=640)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def make_page(rng, num_lines, size):
+    """Rows of text lines, a third of them tilted, as DetLabelEncode gives"""
+    line_h = max(8, int(size / np.sqrt(num_lines * 3)))
+    polys = []
+    y = rng.randint(0, line_h)
+    while len(polys) < num_lines and y < size:
+        h = rng.randint(line_h // 2, line_h + 1)
+        x = rng.randint(-20, 20)
+        while len(polys) < num_lines and x < size:
+            w = rng.randint(3 * h, 12 * h)
+            tilt = rng.uniform(-0.2, 0.2) * h if rng.rand() < 0.3 else 0
+            polys.append([[x, y], [x + w, y + tilt], [x + w, y + tilt + h], [x, y + h]])
+            x += w + rng.randint(h // 2, 2 * h)
+        y += h + rng.randint(2, h)
+    polys = np.array(polys, dtype=np.float32).reshape(-1, 4, 2)
+    ignore_tags = rng.rand(len(polys)) < 0.05
+    return {
+        "image": np.zeros((size, size, 3), dtype=np.uint8),
+        "polys": polys,
+        "ignore_tags": ignore_tags,
+    }
+
+
+def run(ops, pages):
+    outs = []
+    start = time.perf_counter()
+    for page in pages:
+        data = {
+            "image": page["image"],
+            "polys": page["polys"].copy(),
+            "ignore_tags": page["ignore_tags"].copy(),
+        }
+        for op in ops:
+            data = op(data)
+        outs.append(data)
+    return len(pages) / (time.perf_counter() - start), outs
+
+
+def main():
+    args = parse_args()
+    rng = np.random.RandomState(args.seed)
+    print(
+        "| lines | before samples/s | after samples/s | speedup "
+        "| threshold mean diff | threshold p99 diff | mask agree % "
+        "| shrink IoU |"
+    )
+    print("| --: | --: | --: | --: | --: | --: | --: | --: |")
+    for num_lines in [int(v) for v in args.num_lines.split(",")]:
+        pages = [make_page(rng, num_lines, args.size) for _ in range(args.samples)]
+        before, ref = run([MakeBorderMap(), MakeShrinkMap()], pages)
+        after, out = run(
+            [
+                MakeBorderMap(use_distance_transform=True),
+                MakeShrinkMap(use_distance_transform=True),
+            ],
+            pages,
+        )
+        diff = np.stack(
+            [np.abs(a["threshold_map"] - b["threshold_map"]) for a, b in zip(ref, out)]
+        )
+        agree = np.mean(
+            [
+                np.mean(a["threshold_mask"] == b["threshold_mask"])
+                for a, b in zip(ref, out)
+            ]
+        )
+        inter = sum((a["shrink_map"] * b["shrink_map"]).sum() for a, b in zip(ref, out))
+        union = sum(
+            np.maximum(a["shrink_map"], b["shrink_map"]).sum() for a, b in zip(ref, out)
+        )
+        row = "| {} | {:.1f} | {:.1f} | {:.1f}x | {:.4f} | {:.4f} | {:.2f} | {:.4f} |"
+        print(
+            row.format(
+                num_lines,
+                before,
+                after,
+                after / before,
+                diff.mean(),
+                np.percentile(diff, 99),
+                agree * 100,
+                inter / max(union, 1),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
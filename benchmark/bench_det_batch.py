@@ -0,0 +1,95 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Throughput of TextDetector.predict_batch for several batch sizes against
+one predict() call per image. The batched boxes are checked against the
+unbatched ones.
+
+    python benchmark/bench_det_batch.py --det_model_dir ./inference/det \\
+        --image_dir ./doc/imgs --batch_sizes 1,2,4,8 --use_gpu False
+"""
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, "..")))
+
+import tools.infer.utility as utility
+from tools.infer.predict_det import TextDetector
+from ppocr.utils.utility import get_image_file_list
+
+
+def parse_args():
+    parser = utility.init_args()
+    parser.add_argument("--batch_sizes", type=str, default="1,2,4,8")
+    parser.add_argument("--num_images", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    return parser.parse_args()
+
+
+def load_images(image_dir, num_images):
+    images = []
+    for image_file in get_image_file_list(image_dir):
+        img = cv2.imread(image_file)
+        if img is not None:
+            images.append(img)
+    assert images, "no readable image in {}".format(image_dir)
+    # repeat the folder so batches can fill up
+    return [images[i % len(images)] for i in range(num_images)]
+
+
+def main():
+    args = parse_args()
+    images = load_images(args.image_dir, args.num_images)
+    text_detector = TextDetector(args)
+    for img in images[:2]:
+        text_detector.predict(img)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        ref_boxes = [text_detector.predict(img)[0] for img in images]
+    single_time = (time.perf_counter() - start) / args.repeat
+
+    print("images: {}".format(len(images)))
+    print("| mode | s / run | images / s | same boxes |")
+    print("| :-- | --: | --: | --: |")
+    print(
+        "| predict | {:.3f} | {:.2f} | - |".format(
+            single_time, len(images) / single_time
+        )
+    )
+    for batch_size in [int(v) for v in args.batch_sizes.split(",")]:
+        text_detector.predict_batch(images[:batch_size], batch_size)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            boxes, _ = text_detector.predict_batch(images, batch_size)
+        batch_time = (time.perf_counter() - start) / args.repeat
+        same = all(
+            a.shape == b.shape and np.array_equal(a, b)
+            for a, b in zip(ref_boxes, boxes)
+        )
+        print(
+            "| batch {} | {:.3f} | {:.2f} | {} |".format(
+                batch_size, batch_time, len(images) / batch_time, same
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
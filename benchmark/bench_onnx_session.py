@@ -0,0 +1,115 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+CPU latency of an exported det/rec/cls ONNX model: a bare InferenceSession,
+as create_predictor built it before, against the session configured from
+the --onnx_* args, with and without IO binding. Also reports the session
+creation time with a cold and a warm --onnx_cache_dir.
+
+    python benchmark/bench_onnx_session.py --model_path ./inference/rec.onnx \\
+        --shapes 6,3,48,320;6,3,48,640 --onnx_intra_op_threads 4 \\
+        --onnx_cache_dir ./output/onnx_cache
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, "..")))
+
+import tools.infer.utility as utility
+from tools.infer.onnx_backend import OnnxPredictor, create_onnx_session
+
+
+def parse_args():
+    parser = utility.init_args()
+    parser.add_argument("--model_path", type=str, required=True)
+    parser.add_argument("--shapes", type=str, default="1,3,960,960")
+    parser.add_argument("--repeat", type=int, default=20)
+    return parser.parse_args()
+
+
+def bench(predictor, feeds, repeat):
+    for feed in feeds:
+        predictor.run(None, feed)
+    times = []
+    for feed in feeds:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            predictor.run(None, feed)
+        times.append((time.perf_counter() - start) / repeat)
+    return times
+
+
+def main():
+    import onnxruntime as ort
+
+    args = parse_args()
+    providers = ["CPUExecutionProvider"]
+    shapes = [
+        tuple(int(v) for v in shape.split(",")) for shape in args.shapes.split(";")
+    ]
+    name = ort.InferenceSession(args.model_path, providers=providers).get_inputs()[0]
+    rng = np.random.RandomState(0)
+    feeds = [{name.name: rng.rand(*shape).astype(np.float32)} for shape in shapes]
+
+    cache_dir = args.onnx_cache_dir or tempfile.mkdtemp()
+    args.onnx_cache_dir = None
+    start = time.perf_counter()
+    create_onnx_session(args, args.model_path, providers)
+    no_cache = time.perf_counter() - start
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    args.onnx_cache_dir = cache_dir
+    start = time.perf_counter()
+    create_onnx_session(args, args.model_path, providers)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    sess = create_onnx_session(args, args.model_path, providers)
+    warm = time.perf_counter() - start
+    print(
+        "session creation: {:.1f} ms, cache cold {:.1f} ms, "
+        "cache warm {:.1f} ms".format(no_cache * 1000, cold * 1000, warm * 1000)
+    )
+
+    default = ort.InferenceSession(args.model_path, providers=providers)
+    rows = [
+        ("default session", bench(default, feeds, args.repeat)),
+        ("tuned", bench(OnnxPredictor(sess), feeds, args.repeat)),
+        (
+            "tuned + io binding",
+            bench(OnnxPredictor(sess, io_binding=True), feeds, args.repeat),
+        ),
+    ]
+    ref = [default.run(None, feed)[0] for feed in feeds]
+    out = [OnnxPredictor(sess, io_binding=True).run(None, feed)[0] for feed in feeds]
+    max_diff = max(float(np.abs(a - b).max()) for a, b in zip(ref, out))
+
+    print("| session | " + " | ".join(args.shapes.split(";")) + " |")
+    print("| :-- |" + " --: |" * len(shapes))
+    for label, times in rows:
+        print(
+            "| {} | ".format(label)
+            + " | ".join("{:.2f} ms".format(t * 1000) for t in times)
+            + " |"
+        )
+    print("max abs diff against the default session: {:.2e}".format(max_diff))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Scaling of sorted_boxes and merge_fragmented on synthetic dense pages: text
+lines of words, and the same words cut at slice borders for the merger. The
+former pairwise implementations are timed up to --max_ref_boxes and their
+output compared.
+
+    python benchmark/bench_reading_order.py --num_boxes 5000,20000,50000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, "..")))
+
+from tools.infer.predict_system import sorted_boxes
+from tools.infer.utility import merge_boxes, merge_fragmented
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_boxes", type=str, default="5000,10000,20000,50000")
+    parser.add_argument("--slice_width", type=int, default=400)
+    parser.add_argument("--max_ref_boxes", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def sorted_boxes_ref(dt_boxes):
+    num_boxes = dt_boxes.shape[0]
+    _boxes = list(sorted(dt_boxes, key=lambda x: (x[0][1], x[0][0])))
+    for i in range(num_boxes - 1):
+        for j in range(i, -1, -1):
+            if abs(_boxes[j + 1][0][1] - _boxes[j][0][1]) < 10 and (
+                _boxes[j + 1][0][0] < _boxes[j][0][0]
+            ):
+                _boxes[j], _boxes[j + 1] = _boxes[j + 1], _boxes[j]
+            else:
+                break
+    return _boxes
+
+
+def merge_fragmented_ref(boxes, x_threshold=10, y_threshold=10):
+    merged_boxes = []
+    visited = set()
+    for i, box1 in enumerate(boxes):
+        if i in visited:
+            continue
+        merged_box = [point[:] for point in box1]
+        for j, box2 in enumerate(boxes[i + 1 :], start=i + 1):
+            if j not in visited:
+                merged_result = merge_boxes(
+                    merged_box, box2, x_threshold=x_threshold, y_threshold=y_threshold
+                )
+                if merged_result:
+                    merged_box = merged_result
+                    visited.add(j)
+        merged_boxes.append(merged_box)
+    if len(merged_boxes) == len(boxes):
+        return np.array(merged_boxes)
+    return merge_fragmented_ref(merged_boxes, x_threshold, y_threshold)
+
+
+def make_page(rng, num_boxes, page_width=2400):
+    # lines of words with a few pixels of vertical jitter, shuffled
+    boxes = []
+    y = 5
+    while len(boxes) < num_boxes:
+        x, h = rng.randint(0, 30), rng.randint(14, 30)
+        while x < page_width - 200 and len(boxes) < num_boxes:
+            w, dy = rng.randint(20, 200), rng.randint(-3, 4)
+            top, bottom = y + dy, y + dy + h
+            boxes.append([[x, top], [x + w, top], [x + w, bottom], [x, bottom]])
+            x += w + rng.randint(8, 40)
+        y += h + rng.randint(12, 30)
+    boxes = np.array(boxes, dtype=np.float32)
+    return boxes[rng.permutation(len(boxes))]
+
+
+def fragment(rng, boxes, slice_width):
+    # cut every box at the slice borders, as sliced detection returns them
+    pieces = []
+    for box in boxes[np.lexsort((boxes[:, 0, 0], boxes[:, 0, 1]))]:
+        x0, x1, y0, y1 = box[0, 0], box[1, 0], box[0, 1], box[2, 1]
+        first = (int(x0) // slice_width + 1) * slice_width
+        cuts = [x0] + list(range(first, int(x1), slice_width)) + [x1]
+        for left, right in zip(cuts[:-1], cuts[1:]):
+            dy = rng.randint(-2, 3)
+            top = y0 + dy
+            pieces.append([[left, top], [right, top], [right, y1], [left, y1]])
+    return np.array(pieces, dtype=np.float32)
+
+
+def timeit(func):
+    start = time.perf_counter()
+    out = func()
+    return time.perf_counter() - start, out
+
+
+def main():
+    args = parse_args()
+    rng = np.random.RandomState(args.seed)
+    print(
+        "| boxes | sorted ms | sorted ref ms | same | fragments | merge ms "
+        "| merge ref ms | same |"
+    )
+    print("| --: | --: | --: | --: | --: | --: | --: | --: |")
+    for num_boxes in [int(v) for v in args.num_boxes.split(",")]:
+        boxes = make_page(rng, num_boxes)
+        pieces = fragment(rng, boxes, args.slice_width)
+        sort_time, order = timeit(lambda: sorted_boxes(boxes))
+        merge_time, merged = timeit(lambda: merge_fragmented(pieces))
+        row = [num_boxes, "{:.1f}".format(sort_time * 1000), "-", "-"]
+        row += [len(pieces), "{:.1f}".format(merge_time * 1000), "-", "-"]
+        if num_boxes <= args.max_ref_boxes:
+            ref_time, ref = timeit(lambda: sorted_boxes_ref(boxes))
+            row[2] = "{:.1f}".format(ref_time * 1000)
+            row[3] = all(np.array_equal(a, b) for a, b in zip(ref, order))
+        if len(pieces) <= args.max_ref_boxes:
+            ref_time, ref = timeit(lambda: merge_fragmented_ref(pieces))
+            row[6] = "{:.1f}".format(ref_time * 1000)
+            row[7] = ref.shape == merged.shape and np.array_equal(ref, merged)
+        print("| " + " | ".join(str(v) for v in row) + " |")
+
+
+if __name__ == "__main__":
+    main()
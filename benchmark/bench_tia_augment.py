@@ -0,0 +1,239 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-sample time of the TIA augmentations (tia_distort, tia_stretch,
+tia_perspective) with the vectorized WarpMLS against the former loop
+implementation, kept below as WarpMLSRef. Both run with the same random
+control points; the outputs are compared pixel by pixel.
+
+    python benchmark/bench_tia_augment.py --sizes 32x100,48x320,48x800 --segment 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, "..")))
+
+from ppocr.data.imaug.text_image_aug import augment
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=str, default="32x100,48x320,48x800")
+    parser.add_argument("--segment", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+class WarpMLSRef:
+    grid_size = 100
+
+    def __init__(self, src, src_pts, dst_pts, dst_w, dst_h, trans_ratio=1.0):
+        self.src = src
+        self.src_pts = src_pts
+        self.dst_pts = dst_pts
+        self.pt_count = len(self.dst_pts)
+        self.dst_w = dst_w
+        self.dst_h = dst_h
+        self.trans_ratio = trans_ratio
+        self.rdx = np.zeros((self.dst_h, self.dst_w))
+        self.rdy = np.zeros((self.dst_h, self.dst_w))
+
+    @staticmethod
+    def bilinear_interp(x, y, v11, v12, v21, v22):
+        return (v11 * (1 - y) + v12 * y) * (1 - x) + (v21 * (1 - y) + v22 * y) * x
+
+    def generate(self):
+        self.calc_delta()
+        return self.gen_img()
+
+    def calc_delta(self):
+        w = np.zeros(self.pt_count, dtype=np.float32)
+        if self.pt_count < 2:
+            return
+        i = 0
+        while 1:
+            if self.dst_w <= i < self.dst_w + self.grid_size - 1:
+                i = self.dst_w - 1
+            elif i >= self.dst_w:
+                break
+            j = 0
+            while 1:
+                if self.dst_h <= j < self.dst_h + self.grid_size - 1:
+                    j = self.dst_h - 1
+                elif j >= self.dst_h:
+                    break
+                sw = 0
+                swp = np.zeros(2, dtype=np.float32)
+                swq = np.zeros(2, dtype=np.float32)
+                new_pt = np.zeros(2, dtype=np.float32)
+                cur_pt = np.array([i, j], dtype=np.float32)
+                k = 0
+                for k in range(self.pt_count):
+                    if i == self.dst_pts[k][0] and j == self.dst_pts[k][1]:
+                        break
+                    w[k] = 1.0 / (
+                        (i - self.dst_pts[k][0]) * (i - self.dst_pts[k][0])
+                        + (j - self.dst_pts[k][1]) * (j - self.dst_pts[k][1])
+                    )
+                    sw += w[k]
+                    swp = swp + w[k] * np.array(self.dst_pts[k])
+                    swq = swq + w[k] * np.array(self.src_pts[k])
+                if k == self.pt_count - 1:
+                    pstar = 1 / sw * swp
+                    qstar = 1 / sw * swq
+                    miu_s = 0
+                    for k in range(self.pt_count):
+                        if i == self.dst_pts[k][0] and j == self.dst_pts[k][1]:
+                            continue
+                        pt_i = self.dst_pts[k] - pstar
+                        miu_s += w[k] * np.sum(pt_i * pt_i)
+                    cur_pt -= pstar
+                    cur_pt_j = np.array([-cur_pt[1], cur_pt[0]])
+                    for k in range(self.pt_count):
+                        if i == self.dst_pts[k][0] and j == self.dst_pts[k][1]:
+                            continue
+                        pt_i = self.dst_pts[k] - pstar
+                        pt_j = np.array([-pt_i[1], pt_i[0]])
+                        tmp_pt = np.zeros(2, dtype=np.float32)
+                        tmp_pt[0] = (
+                            np.sum(pt_i * cur_pt) * self.src_pts[k][0]
+                            - np.sum(pt_j * cur_pt) * self.src_pts[k][1]
+                        )
+                        tmp_pt[1] = (
+                            -np.sum(pt_i * cur_pt_j) * self.src_pts[k][0]
+                            + np.sum(pt_j * cur_pt_j) * self.src_pts[k][1]
+                        )
+                        tmp_pt *= w[k] / miu_s
+                        new_pt += tmp_pt
+                    new_pt += qstar
+                else:
+                    new_pt = self.src_pts[k]
+                self.rdx[j, i] = new_pt[0] - i
+                self.rdy[j, i] = new_pt[1] - j
+                j += self.grid_size
+            i += self.grid_size
+
+    def gen_img(self):
+        src_h, src_w = self.src.shape[:2]
+        dst = np.zeros_like(self.src, dtype=np.float32)
+        for i in np.arange(0, self.dst_h, self.grid_size):
+            for j in np.arange(0, self.dst_w, self.grid_size):
+                ni = i + self.grid_size
+                nj = j + self.grid_size
+                w = h = self.grid_size
+                if ni >= self.dst_h:
+                    ni = self.dst_h - 1
+                    h = ni - i + 1
+                if nj >= self.dst_w:
+                    nj = self.dst_w - 1
+                    w = nj - j + 1
+                di = np.reshape(np.arange(h), (-1, 1))
+                dj = np.reshape(np.arange(w), (1, -1))
+                delta_x = self.bilinear_interp(
+                    di / h,
+                    dj / w,
+                    self.rdx[i, j],
+                    self.rdx[i, nj],
+                    self.rdx[ni, j],
+                    self.rdx[ni, nj],
+                )
+                delta_y = self.bilinear_interp(
+                    di / h,
+                    dj / w,
+                    self.rdy[i, j],
+                    self.rdy[i, nj],
+                    self.rdy[ni, j],
+                    self.rdy[ni, nj],
+                )
+                nx = np.clip(j + dj + delta_x * self.trans_ratio, 0, src_w - 1)
+                ny = np.clip(i + di + delta_y * self.trans_ratio, 0, src_h - 1)
+                nxi = np.array(np.floor(nx), dtype=np.int32)
+                nyi = np.array(np.floor(ny), dtype=np.int32)
+                nxi1 = np.array(np.ceil(nx), dtype=np.int32)
+                nyi1 = np.array(np.ceil(ny), dtype=np.int32)
+                if len(self.src.shape) == 3:
+                    x = np.tile(np.expand_dims(ny - nyi, axis=-1), (1, 1, 3))
+                    y = np.tile(np.expand_dims(nx - nxi, axis=-1), (1, 1, 3))
+                else:
+                    x = ny - nyi
+                    y = nx - nxi
+                dst[i : i + h, j : j + w] = self.bilinear_interp(
+                    x,
+                    y,
+                    self.src[nyi, nxi],
+                    self.src[nyi, nxi1],
+                    self.src[nyi1, nxi],
+                    self.src[nyi1, nxi1],
+                )
+        dst = np.clip(dst, 0, 255)
+        return np.array(dst, dtype=np.uint8)
+
+
+def run(func, images, seed, warp_cls):
+    # the augmentations look WarpMLS up in their module at call time
+    warp_mls = augment.WarpMLS
+    augment.WarpMLS = warp_cls
+    try:
+        np.random.seed(seed)
+        start = time.perf_counter()
+        outs = [func(img) for img in images]
+        return (time.perf_counter() - start) / len(images), outs
+    finally:
+        augment.WarpMLS = warp_mls
+
+
+def main():
+    args = parse_args()
+    rng = np.random.RandomState(args.seed)
+    funcs = [
+        ("distort", lambda img: augment.tia_distort(img, args.segment)),
+        ("stretch", lambda img: augment.tia_stretch(img, args.segment)),
+        ("perspective", augment.tia_perspective),
+    ]
+    print(
+        "| size | augment | before ms | after ms | speedup "
+        "| max diff | diff pixels % |"
+    )
+    print("| :-- | :-- | --: | --: | --: | --: | --: |")
+    for size in args.sizes.split(","):
+        h, w = [int(v) for v in size.split("x")]
+        images = [
+            rng.randint(0, 256, (h, w, 3)).astype(np.uint8) for _ in range(args.samples)
+        ]
+        for name, func in funcs:
+            before, ref = run(func, images, args.seed, WarpMLSRef)
+            after, out = run(func, images, args.seed, augment.WarpMLS)
+            diff = np.stack([np.abs(a.astype(int) - b) for a, b in zip(ref, out)])
+            print(
+                "| {} | {} | {:.2f} | {:.2f} | {:.1f}x | {} | {:.4f} |".format(
+                    size,
+                    name,
+                    before * 1000,
+                    after * 1000,
+                    before / after,
+                    diff.max(),
+                    (diff > 0).mean() * 100,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
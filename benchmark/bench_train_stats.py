@@ -0,0 +1,176 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Step time of a small CTC recognition model trained as tools/program.train
+does, with the losses read back every step into TrainingStats and the
+training metric computed inline, against DeviceTrainingStats and the metric
+computed on a background thread.
+
+    python benchmark/bench_train_stats.py --batch_size 64 --steps 200
+"""
+
+import argparse
+import collections
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import paddle
+import paddle.nn as nn
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, "..")))
+
+from ppocr.metrics.rec_metric import RecMetric
+from ppocr.postprocess.rec_postprocess import CTCLabelDecode
+from ppocr.utils.stats import DeviceTrainingStats, TrainingStats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--print_batch_step", type=int, default=10)
+    parser.add_argument("--max_text_len", type=int, default=25)
+    parser.add_argument("--no_metric", action="store_true")
+    return parser.parse_args()
+
+
+class TinyRec(nn.Layer):
+    """Conv stem and a linear CTC head, 48x320 images to 40 time steps"""
+
+    def __init__(self, num_classes):
+        super(TinyRec, self).__init__()
+        self.stem = nn.Sequential(
+            nn.Conv2D(3, 16, 3, stride=2, padding=1),
+            nn.ReLU(),
+            nn.Conv2D(16, 32, 3, stride=2, padding=1),
+            nn.ReLU(),
+            nn.Conv2D(32, 64, 3, stride=(4, 2), padding=1),
+            nn.ReLU(),
+            nn.AdaptiveAvgPool2D((1, 40)),
+        )
+        self.head = nn.Linear(64, num_classes)
+
+    def forward(self, x):
+        x = self.stem(x).squeeze(2).transpose([0, 2, 1])
+        return self.head(x)
+
+
+def make_batches(rng, args, num_classes):
+    batches = []
+    for _ in range(4):
+        images = rng.rand(args.batch_size, 3, 48, 320).astype("float32")
+        lengths = rng.randint(1, args.max_text_len + 1, args.batch_size)
+        labels = rng.randint(1, num_classes, (args.batch_size, args.max_text_len))
+        labels[np.arange(args.max_text_len)[None, :] >= lengths[:, None]] = 0
+        batches.append(
+            [
+                paddle.to_tensor(images),
+                paddle.to_tensor(labels.astype("int32")),
+                paddle.to_tensor(lengths.astype("int64")),
+            ]
+        )
+    return batches
+
+
+def run(args, device_stats):
+    paddle.seed(0)
+    rng = np.random.RandomState(0)
+    post_process = CTCLabelDecode()
+    num_classes = len(post_process.character)
+    eval_class = RecMetric()
+    model = TinyRec(num_classes)
+    optimizer = paddle.optimizer.Adam(parameters=model.parameters())
+    ctc_loss = nn.CTCLoss(blank=0, reduction="none")
+    batches = make_batches(rng, args, num_classes)
+
+    def train_metric(preds, batch):
+        batch = [item.numpy() for item in batch]
+        post_result = post_process(paddle.nn.functional.softmax(preds), batch[1])
+        eval_class(post_result, batch)
+        return eval_class.get_metric()
+
+    executor = ThreadPoolExecutor(max_workers=1) if device_stats else None
+    jobs = collections.deque()
+    stats_class = DeviceTrainingStats if device_stats else TrainingStats
+    train_stats = stats_class(20, ["lr"])
+    start = None
+    for step in range(args.steps + 10):
+        if step == 10:
+            # warm up first
+            train_stats.get()
+            start = time.time()
+        batch = batches[step % len(batches)]
+        preds = model(batch[0])
+        log_probs = paddle.nn.functional.log_softmax(preds.transpose([1, 0, 2]))
+        input_lengths = paddle.full([args.batch_size], preds.shape[1], "int64")
+        per_sample = ctc_loss(log_probs, batch[1], input_lengths, batch[2])
+        loss = {
+            "loss": per_sample.mean(),
+            "loss_ctc": per_sample.mean(),
+            "loss_per_sample": per_sample,
+        }
+        loss["loss"].backward()
+        optimizer.step()
+        optimizer.clear_grad()
+
+        if not args.no_metric:
+            if device_stats:
+                jobs.append(executor.submit(train_metric, preds, batch))
+                if len(jobs) > 2:
+                    jobs.popleft().result()
+                train_stats.update(jobs[-1], step=step + 1)
+            else:
+                train_stats.update(train_metric(preds, batch))
+        if device_stats:
+            stats = dict(loss)
+            stats["lr"] = optimizer.get_lr()
+            train_stats.update(stats, step=step + 1)
+        else:
+            stats = {
+                k: float(v) if v.shape == [] else v.numpy().mean()
+                for k, v in loss.items()
+            }
+            stats["lr"] = optimizer.get_lr()
+            train_stats.update(stats)
+        if (step + 1) % args.print_batch_step == 0:
+            train_stats.log()
+    train_stats.log()
+    elapsed = time.time() - start
+    if executor is not None:
+        executor.shutdown()
+    return elapsed / args.steps * 1000
+
+
+def main():
+    args = parse_args()
+    print(
+        "device: {}, batch_size: {}, metric: {}".format(
+            paddle.device.get_device(), args.batch_size, not args.no_metric
+        )
+    )
+    before = run(args, device_stats=False)
+    after = run(args, device_stats=True)
+    print(
+        "before: {:.2f} ms/step, after: {:.2f} ms/step, speedup: {:.2f}x".format(
+            before, after, before / after
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
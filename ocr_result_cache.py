@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Content-addressed OCR result cache used by simple_ocr_server.py
+
+Results are keyed by a hash of the input content (uploaded file bytes or a
+rendered PDF page) plus a fingerprint of the effective pipeline parameters,
+so changing the language, thresholds or models never serves stale results.
+There are two tiers: an in-process LRU bounded by the size of the stored
+results, and an optional SQLite file that survives restarts.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def params_fingerprint(params):
+    """Stable hash of the pipeline parameters that influence OCR output"""
+    blob = json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+class _DiskTier(object):
+    def __init__(self, path, max_bytes=0):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ocr_cache_accessed ON ocr_cache (accessed)"
+        )
+        row = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache"
+        ).fetchone()
+        self.entries, self.total_bytes = row
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM ocr_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE ocr_cache SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            return bytes(row[0])
+
+    def put(self, key, value):
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM ocr_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), time.time()),
+            )
+            if old is None:
+                self.entries += 1
+            else:
+                self.total_bytes -= old[0]
+            self.total_bytes += len(value)
+            if self.max_bytes and self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM ocr_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if old is None:
+                return
+            self._conn.execute("DELETE FROM ocr_cache WHERE key = ?", (key,))
+            self.entries -= 1
+            self.total_bytes -= old[0]
+
+    def _evict(self):
+        # drop least recently used rows until the file is 10% under budget
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT key, size FROM ocr_cache ORDER BY accessed ASC"
+        )
+        victims = []
+        total = self.total_bytes
+        for key, size in rows:
+            if total <= target:
+                break
+            victims.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM ocr_cache WHERE key = ?", victims)
+        self.entries -= len(victims)
+        self.total_bytes = total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OCRResultCache(object):
+    """Two-tier (memory LRU + optional SQLite) cache of OCR results.
+
+    Args:
+        params (dict): effective pipeline parameters, folded into every key.
+        max_memory_bytes (int): budget of the in-process LRU, measured on the
+            serialized results.
+        disk_path (str|None): SQLite file for the persistent tier.
+        max_disk_bytes (int): budget of the persistent tier, 0 for unbounded.
+    """
+
+    def __init__(
+        self, params, max_memory_bytes=256 << 20, disk_path=None, max_disk_bytes=0
+    ):
+        self.fingerprint = params_fingerprint(params)
+        self.max_memory_bytes = max_memory_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = _DiskTier(disk_path, max_disk_bytes) if disk_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def make_key(self, kind, *parts):
+        """Hash the given bytes-like parts (bytes, ndarrays, ...) into a cache key"""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(self.fingerprint.encode("ascii"))
+        h.update(kind.encode("utf-8"))
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode("utf-8")
+            h.update(part)
+        return "{}:{}".format(kind, h.hexdigest())
+
+    def get(self, key):
+        """Return a fresh copy of the cached results, or None"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+        if value is None and self._disk is not None:
+            value = self._disk.get(key)
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._put_memory(key, value)
+        if value is not None:
+            try:
+                return json.loads(value)
+            except ValueError:
+                # a corrupted row is dropped and the results are recomputed
+                self._delete(key)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, results):
+        value = json.dumps(results).encode("utf-8")
+        self._put_memory(key, value)
+        if self._disk is not None:
+            self._disk.put(key, value)
+
+    def _put_memory(self, key, value):
+        if len(value) > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = value
+            self._memory_bytes += len(value)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _delete(self, key):
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+        if self._disk is not None:
+            self._disk.delete(key)
+
+    def get_or_compute(self, key, compute):
+        results = self.get(key)
+        if results is None:
+            results = compute()
+            self.put(key, results)
+        return results
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            stats = {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    round((self.memory_hits + self.disk_hits) / lookups, 4)
+                    if lookups
+                    else 0.0
+                ),
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
+        if self._disk is not None:
+            stats["disk_entries"] = self._disk.entries
+            stats["disk_bytes"] = self._disk.total_bytes
+        return stats
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Multi-process OCR worker pool used by simple_ocr_server.py
+
+Each worker is a separate process holding its own PaddleOCR pipeline, pinned
+to a slice of the host's cores and configured with a matching cpu_threads.
+Requests go into one shared queue in the server process and are handed out
+only to workers that reported themselves idle. Each worker has its own pipe,
+so a worker that crashes or is killed can never wedge a lock shared with the
+others; its in-flight job is put back at the head of the queue and the
+worker is replaced.
+"""
+
+import collections
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+import traceback
+from multiprocessing.connection import wait
+
+# Worker states reported on /health
+STARTING = "starting"
+IDLE = "idle"
+BUSY = "busy"
+STOPPING = "stopping"
+DEAD = "dead"
+
+# Pipes are created and the fork happens under this lock, so a worker forked
+# by another pool's supervisor never inherits (and keeps open) the child end
+# of a sibling's pipe or sentinel, which would hide that sibling's death.
+_spawn_lock = threading.Lock()
+
+
+def _available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _split_cores(num_workers, cores=None):
+    """Split the available cores into num_workers contiguous slices"""
+    cores = list(cores if cores is not None else _available_cores())
+    num_workers = max(1, num_workers)
+    if len(cores) < num_workers:
+        # oversubscribed: every worker shares all cores
+        return [cores for _ in range(num_workers)]
+    per_worker, extra = divmod(len(cores), num_workers)
+    slices = []
+    start = 0
+    for i in range(num_workers):
+        end = start + per_worker + (1 if i < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+def _paddleocr_factory(cpu_threads, **ocr_kwargs):
+    from paddleocr import PaddleOCR
+
+    return PaddleOCR(cpu_threads=cpu_threads, **ocr_kwargs)
+
+
+def _worker_main(cores, cpu_threads, ocr_kwargs, conn, ocr_factory=_paddleocr_factory):
+    """Entry point of one worker process"""
+    try:
+        if cores and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        # keep OpenMP/MKL thread pools inside this worker's core slice
+        os.environ["OMP_NUM_THREADS"] = str(cpu_threads)
+        os.environ["MKL_NUM_THREADS"] = str(cpu_threads)
+
+        ocr = ocr_factory(cpu_threads, **ocr_kwargs)
+    except Exception as e:
+        conn.send(("failed", None, repr(e)))
+        return
+    conn.send(("ready", None, None))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        job_id, inputs = job
+        try:
+            # plain dicts are cheap to pickle back to the server process
+            results = [res.json for res in ocr.predict_iter(inputs)]
+            conn.send(("done", job_id, (results, None)))
+        except Exception as e:
+            conn.send(
+                ("done", job_id, (None, "{}\n{}".format(e, traceback.format_exc())))
+            )
+
+
+class _Job(object):
+    __slots__ = ("job_id", "inputs", "attempts", "results", "error", "done")
+
+    def __init__(self, job_id, inputs):
+        self.job_id = job_id
+        self.inputs = inputs
+        self.attempts = 0
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class _WorkerInfo(object):
+    def __init__(self, worker_id, cores):
+        self.worker_id = worker_id
+        self.cores = cores
+        self.process = None
+        self.conn = None
+        self.pid = None
+        self.state = DEAD
+        self.current_job = None
+        self.job_started_at = None
+        self.jobs_done = 0
+        self.restarts = 0
+        self.failed_starts = 0
+        self.next_spawn_at = 0.0
+        self.last_error = None
+
+
+class OCRWorkerPool(object):
+    """Pre-fork pool of OCR worker processes with health-aware dispatch.
+
+    Args:
+        num_workers (int): number of worker processes.
+        ocr_kwargs (dict): keyword arguments for ``PaddleOCR`` in every worker.
+        cpu_threads (int|None): threads per worker, defaults to the size of
+            the worker's core slice.
+        max_attempts (int): how many workers may die on the same job before
+            the job is failed instead of being retried.
+        start_method (str|None): multiprocessing start method, ``fork`` is
+            used where available so workers share the already imported
+            modules copy-on-write.
+        ocr_factory (callable|None): ``ocr_factory(cpu_threads, **ocr_kwargs)``
+            builds the pipeline in each worker, ``PaddleOCR`` by default; it
+            must be picklable under the ``spawn`` start method.
+    """
+
+    def __init__(
+        self,
+        num_workers,
+        ocr_kwargs,
+        cpu_threads=None,
+        max_attempts=2,
+        start_method=None,
+        monitor_interval=1.0,
+        ocr_factory=None,
+    ):
+        if start_method is None:
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        self._ctx = mp.get_context(start_method)
+        self.num_workers = max(1, int(num_workers))
+        self.ocr_kwargs = dict(ocr_kwargs)
+        self.cpu_threads = cpu_threads
+        self.max_attempts = max_attempts
+        self.monitor_interval = monitor_interval
+        self.ocr_factory = ocr_factory or _paddleocr_factory
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._jobs = {}
+        self._job_ids = itertools.count()
+        self._closed = False
+        self._workers = [
+            _WorkerInfo(i, cores)
+            for i, cores in enumerate(_split_cores(self.num_workers))
+        ]
+        self._supervisor = None
+
+    def start(self, wait_first_ready=True, timeout=None):
+        """Start all workers.
+
+        The first worker is started alone and awaited, so the model files are
+        downloaded and unpacked once and the others load them from the local
+        cache (and the OS page cache) instead of fetching them concurrently.
+        """
+        first, rest = self._workers[0], self._workers[1:]
+        self._spawn(first)
+        self._supervisor = threading.Thread(
+            target=self._supervise, name="ocr-pool-supervisor", daemon=True
+        )
+        self._supervisor.start()
+        if wait_first_ready:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while first.state == STARTING and first.process.is_alive():
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+                time.sleep(0.1)
+        for info in rest:
+            self._spawn(info)
+        return self
+
+    def _spawn(self, info):
+        cpu_threads = self.cpu_threads or max(1, len(info.cores))
+        with _spawn_lock:
+            parent_conn, child_conn = self._ctx.Pipe()
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(
+                    info.cores,
+                    cpu_threads,
+                    self.ocr_kwargs,
+                    child_conn,
+                    self.ocr_factory,
+                ),
+                name="ocr-worker-{}".format(info.worker_id),
+                daemon=True,
+            )
+            process.start()
+            # only the child keeps its end, so the parent sees EOF when it dies
+            child_conn.close()
+        with self._lock:
+            info.process = process
+            info.conn = parent_conn
+            info.pid = process.pid
+            info.state = STARTING
+            info.last_error = None
+            info.current_job = None
+            info.job_started_at = None
+
+    def _supervise(self):
+        """Single thread handling worker messages, deaths and restarts"""
+        while not self._closed:
+            with self._lock:
+                waitables = {}
+                for info in self._workers:
+                    if info.state != DEAD:
+                        waitables[info.conn] = info
+                        waitables[info.process.sentinel] = info
+            ready = (
+                wait(list(waitables), timeout=self.monitor_interval)
+                if waitables
+                else []
+            )
+            if not waitables:
+                time.sleep(self.monitor_interval)
+            for obj in ready:
+                info = waitables[obj]
+                if info.state == DEAD:
+                    continue
+                if obj is info.conn:
+                    try:
+                        kind, job_id, payload = info.conn.recv()
+                    except (EOFError, OSError):
+                        self._handle_death(info)
+                        continue
+                    self._handle_message(info, kind, job_id, payload)
+                elif not info.conn.poll():
+                    # the process exited and has nothing left to say
+                    self._handle_death(info)
+            if self._closed:
+                break
+            now = time.monotonic()
+            for info in self._workers:
+                if (
+                    info.state == DEAD
+                    and info.next_spawn_at
+                    and now >= info.next_spawn_at
+                ):
+                    info.next_spawn_at = 0.0
+                    info.restarts += 1
+                    self._spawn(info)
+            self._dispatch()
+
+    def _handle_message(self, info, kind, job_id, payload):
+        with self._lock:
+            if kind == "ready":
+                if info.state != STOPPING:
+                    info.state = IDLE
+                info.failed_starts = 0
+            elif kind == "failed":
+                info.last_error = payload
+            elif kind == "done":
+                if info.state != STOPPING:
+                    info.state = IDLE
+                info.current_job = None
+                info.job_started_at = None
+                info.jobs_done += 1
+                job = self._jobs.pop(job_id, None)
+                if job is not None:
+                    job.results, job.error = payload
+                    job.done.set()
+
+    def _handle_death(self, info):
+        info.process.join(timeout=1)
+        with self._lock:
+            # a worker stopped by restart_workers is not to blame for its job
+            stopped = info.state == STOPPING
+            if info.state == STARTING:
+                # the pipeline could not be built; back off instead of
+                # restarting in a tight loop
+                info.failed_starts += 1
+            info.state = DEAD
+            if info.last_error is None:
+                info.last_error = "exited with code {}".format(info.process.exitcode)
+            delay = min(60.0, 2.0**info.failed_starts) if info.failed_starts else 0.0
+            info.next_spawn_at = time.monotonic() + delay
+            lost_job = self._jobs.get(info.current_job)
+            info.current_job = None
+            info.job_started_at = None
+            if lost_job is not None:
+                if not stopped:
+                    lost_job.attempts += 1
+                if lost_job.attempts >= self.max_attempts:
+                    self._jobs.pop(lost_job.job_id, None)
+                    lost_job.error = "OCR worker crashed while processing this request"
+                    lost_job.done.set()
+                else:
+                    self._pending.appendleft(lost_job)
+        info.conn.close()
+        if not self._closed:
+            print(
+                f"OCR worker {info.worker_id} (pid {info.pid}) died: {info.last_error}; "
+                f"restarting in {delay:.0f}s"
+            )
+
+    def _dispatch(self):
+        """Hand pending jobs to idle workers"""
+        with self._lock:
+            for info in self._workers:
+                if not self._pending:
+                    break
+                if info.state != IDLE:
+                    continue
+                job = self._pending.popleft()
+                info.state = BUSY
+                info.current_job = job.job_id
+                info.job_started_at = time.monotonic()
+                try:
+                    info.conn.send((job.job_id, job.inputs))
+                except (BrokenPipeError, OSError):
+                    # the supervisor notices the death and requeues the job
+                    pass
+
+    def predict(self, inputs, timeout=None):
+        """Run OCR on ``inputs`` (anything ``predict_iter`` accepts) in a worker.
+
+        Returns the list of ``res.json`` dicts, one per page/image.
+        """
+        if self._closed:
+            raise RuntimeError("OCR worker pool is closed")
+        job = _Job(next(self._job_ids), inputs)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._pending.append(job)
+        self._dispatch()
+        if not job.done.wait(timeout):
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+                if job in self._pending:
+                    self._pending.remove(job)
+            raise TimeoutError("OCR worker pool did not answer in time")
+        if job.error is not None:
+            raise RuntimeError(job.error)
+        return job.results
+
+    def restart_workers(self):
+        """Replace every worker; in-flight jobs are requeued on other workers"""
+        with self._lock:
+            stopping = []
+            for info in self._workers:
+                if info.state in (STARTING, IDLE, BUSY):
+                    # no new jobs are handed to a worker about to be killed
+                    info.state = STOPPING
+                    stopping.append(info)
+        for info in stopping:
+            info.process.terminate()
+
+    def is_ready(self):
+        with self._lock:
+            return any(info.state in (IDLE, BUSY) for info in self._workers)
+
+    def health(self):
+        now = time.monotonic()
+        with self._lock:
+            workers = []
+            for info in self._workers:
+                workers.append(
+                    {
+                        "worker_id": info.worker_id,
+                        "pid": info.pid,
+                        "state": info.state,
+                        "cores": info.cores,
+                        "jobs_done": info.jobs_done,
+                        "restarts": info.restarts,
+                        "busy_seconds": (
+                            round(now - info.job_started_at, 2)
+                            if info.job_started_at
+                            else 0.0
+                        ),
+                        "last_error": info.last_error,
+                    }
+                )
+            return {
+                "num_workers": self.num_workers,
+                "queued_jobs": len(self._pending),
+                "in_flight_jobs": len(self._jobs) - len(self._pending),
+                "workers": workers,
+            }
+
+    def close(self):
+        self._closed = True
+        if self._supervisor is not None:
+            # it must not respawn the workers that are being shut down
+            self._supervisor.join()
+        for info in self._workers:
+            if info.state != DEAD:
+                try:
+                    info.conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+        for info in self._workers:
+            if info.process is not None:
+                info.process.join(timeout=5)
+                if info.process.is_alive():
+                    info.process.terminate()
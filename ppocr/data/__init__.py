@@ -34,10 +34,16 @@ import paddle.distributed as dist
 
 from ppocr.data.imaug import transform, create_operators
 from ppocr.data.simple_dataset import SimpleDataSet, MultiScaleDataSet
-from ppocr.data.lmdb_dataset import LMDBDataSet, LMDBDataSetSR, LMDBDataSetTableMaster
+from ppocr.data.lmdb_dataset import (
+    LMDBBatchPrefetchSampler,
+    LMDBDataSet,
+    LMDBDataSetSR,
+    LMDBDataSetTableMaster,
+)
 from ppocr.data.pgnet_dataset import PGDataSet
 from ppocr.data.pubtab_dataset import PubTabDataSet
 from ppocr.data.multi_scale_sampler import MultiScaleSampler
+from ppocr.data.epoch_resample_sampler import EpochResampleBatchSampler
 from ppocr.data.latexocr_dataset import LaTeXOCRDataSet
 
 # for PaddleX dataset_type
@@ -114,13 +120,24 @@ def build_dataloader(config, mode, device, logger, seed=None):
         use_shared_memory = loader_config["use_shared_memory"]
     else:
         use_shared_memory = True
+    persistent_workers = loader_config.get("persistent_workers", False)
 
     if mode == "Train":
         # Distribute data to multiple cards
         if "sampler" in config[mode]:
+            assert not getattr(
+                dataset, "resample_per_epoch", False
+            ), "resample_per_epoch does its own sampling, remove the sampler"
             config_sampler = config[mode]["sampler"]
             sampler_name = config_sampler.pop("name")
             batch_sampler = eval(sampler_name)(dataset, **config_sampler)
+        elif getattr(dataset, "resample_per_epoch", False):
+            batch_sampler = EpochResampleBatchSampler(
+                dataset=dataset,
+                batch_size=batch_size,
+                shuffle=shuffle,
+                drop_last=drop_last,
+            )
         else:
             batch_sampler = DistributedBatchSampler(
                 dataset=dataset,
@@ -134,6 +151,9 @@ def build_dataloader(config, mode, device, logger, seed=None):
             dataset=dataset, batch_size=batch_size, shuffle=shuffle, drop_last=drop_last
         )
 
+    if getattr(dataset, "prefetch_batch", False):
+        batch_sampler = LMDBBatchPrefetchSampler(batch_sampler)
+
     if "collate_fn" in loader_config:
         from . import collate_fn
 
@@ -148,6 +168,7 @@ def build_dataloader(config, mode, device, logger, seed=None):
         return_list=True,
         use_shared_memory=use_shared_memory,
         collate_fn=collate_fn,
+        persistent_workers=persistent_workers and num_workers > 0,
     )
 
     return data_loader
@@ -0,0 +1,92 @@
+# Copyright (c) 2025 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+import numpy as np
+from paddle.io import DistributedBatchSampler
+
+
+class EpochResampleBatchSampler(DistributedBatchSampler):
+    """
+    Distributed batch sampler drawing, every epoch, round(size * ratio)
+    samples of each label file of the dataset, the ratio_list of the config.
+
+    The dataset keeps all the lines of its label files, in file order, and
+    exposes data_source_sizes and ratio_list. The draw of an epoch is seeded
+    by the dataset seed and the epoch, set with set_epoch or incremented after
+    each pass as in DistributedBatchSampler, so the dataset, the DataLoader
+    and its workers are built once for the whole training.
+    """
+
+    def __init__(
+        self,
+        dataset,
+        batch_size,
+        shuffle=True,
+        drop_last=False,
+        num_replicas=None,
+        rank=None,
+    ):
+        super(EpochResampleBatchSampler, self).__init__(
+            dataset,
+            batch_size,
+            num_replicas=num_replicas,
+            rank=rank,
+            shuffle=shuffle,
+            drop_last=drop_last,
+        )
+        sizes = np.asarray(dataset.data_source_sizes, dtype=np.int64)
+        ratios = np.asarray(dataset.ratio_list, dtype=np.float64)
+        assert len(sizes) == len(ratios), "one ratio per label file is needed"
+        self.seed = dataset.seed
+        self.source_offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self.source_counts = np.minimum(
+            [round(size * ratio) for size, ratio in zip(sizes, ratios)], sizes
+        )
+        self.num_samples = int(math.ceil(self.source_counts.sum() * 1.0 / self.nranks))
+        self.total_size = self.num_samples * self.nranks
+
+    def epoch_indices(self, epoch):
+        """Dataset indexes drawn for epoch, shuffled if shuffle is set"""
+        rng = np.random.RandomState(epoch if self.seed is None else [self.seed, epoch])
+        indices = []
+        for start, stop, count in zip(
+            self.source_offsets[:-1], self.source_offsets[1:], self.source_counts
+        ):
+            if count < stop - start:
+                indices.append(start + rng.permutation(stop - start)[:count])
+            else:
+                indices.append(np.arange(start, stop))
+        indices = np.concatenate(indices)
+        if self.shuffle:
+            rng.shuffle(indices)
+        return indices
+
+    def __iter__(self):
+        indices = self.epoch_indices(self.epoch)
+        self.epoch += 1
+        # pad to be evenly divisible, then take the indexes of this rank
+        if len(indices) < self.total_size:
+            indices = np.resize(indices, self.total_size)
+        indices = indices[self.local_rank : self.total_size : self.nranks].tolist()
+
+        batch_indices = []
+        for idx in indices:
+            batch_indices.append(idx)
+            if len(batch_indices) == self.batch_size:
+                yield batch_indices
+                batch_indices = []
+        if not self.drop_last and len(batch_indices) > 0:
+            yield batch_indices
@@ -35,11 +35,40 @@ warnings.simplefilter("ignore")
 __all__ = ["MakeBorderMap"]
 
 
+def polygon_shrink_distance(polygon, shrink_ratio):
+    """Offset distance of the DB targets, area * (1 - r^2) / perimeter"""
+    polygon = np.asarray(polygon, dtype=np.float64)
+    nxt = np.concatenate([polygon[1:], polygon[:1]])
+    area = 0.5 * abs(np.sum(polygon[:, 0] * nxt[:, 1] - polygon[:, 1] * nxt[:, 0]))
+    length = np.sqrt(np.square(nxt - polygon).sum(axis=1)).sum()
+    if area <= 0:
+        return 0.0
+    return area * (1 - np.power(shrink_ratio, 2)) / length
+
+
 class MakeBorderMap(object):
-    def __init__(self, shrink_ratio=0.4, thresh_min=0.3, thresh_max=0.7, **kwargs):
+    """
+    Threshold map and mask of DB. With use_distance_transform, the outlines
+    of all polygons are drawn once and the distance of every pixel to the
+    nearest outline comes from one cv2.distanceTransformWithLabels, instead
+    of point-to-segment distances per polygon and edge. The maps agree with
+    the per-polygon ones within rasterization error; where the neighbourhoods
+    of two polygons overlap, the nearest outline wins instead of the larger
+    value.
+    """
+
+    def __init__(
+        self,
+        shrink_ratio=0.4,
+        thresh_min=0.3,
+        thresh_max=0.7,
+        use_distance_transform=False,
+        **kwargs,
+    ):
         self.shrink_ratio = shrink_ratio
         self.thresh_min = thresh_min
         self.thresh_max = thresh_max
+        self.use_distance_transform = use_distance_transform
         if "total_epoch" in kwargs and "epoch" in kwargs and kwargs["epoch"] != "None":
             self.shrink_ratio = self.shrink_ratio + 0.2 * kwargs["epoch"] / float(
                 kwargs["total_epoch"]
@@ -50,19 +79,59 @@ class MakeBorderMap(object):
         text_polys = data["polys"]
         ignore_tags = data["ignore_tags"]
 
-        canvas = np.zeros(img.shape[:2], dtype=np.float32)
-        mask = np.zeros(img.shape[:2], dtype=np.float32)
-
-        for i in range(len(text_polys)):
-            if ignore_tags[i]:
-                continue
-            self.draw_border_map(text_polys[i], canvas, mask=mask)
+        if self.use_distance_transform:
+            canvas, mask = self.draw_border_maps(
+                [p for p, ignore in zip(text_polys, ignore_tags) if not ignore],
+                img.shape[:2],
+            )
+        else:
+            canvas = np.zeros(img.shape[:2], dtype=np.float32)
+            mask = np.zeros(img.shape[:2], dtype=np.float32)
+            for i in range(len(text_polys)):
+                if ignore_tags[i]:
+                    continue
+                self.draw_border_map(text_polys[i], canvas, mask=mask)
         canvas = canvas * (self.thresh_max - self.thresh_min) + self.thresh_min
 
         data["threshold_map"] = canvas
         data["threshold_mask"] = mask
         return data
 
+    def draw_border_maps(self, polygons, shape):
+        """Unscaled threshold map and mask of all polygons at once"""
+        h, w = shape
+        canvas = np.zeros((h, w), dtype=np.float32)
+        mask = np.zeros((h, w), dtype=np.float32)
+        polygons = [np.asarray(p, dtype=np.float64) for p in polygons]
+        distances = [polygon_shrink_distance(p, self.shrink_ratio) for p in polygons]
+        keep = [i for i, d in enumerate(distances) if d > 0]
+        if not keep:
+            return canvas, mask
+        distances = np.array([distances[i] for i in keep], dtype=np.float32)
+
+        # pad so the outlines of polygons crossing the border are drawn whole
+        pad = int(np.ceil(distances.max())) + 1
+        outline = np.ones((h + 2 * pad, w + 2 * pad), dtype=np.uint8)
+        owner = np.zeros(outline.shape, dtype=np.int32)
+        inside = np.zeros(outline.shape, dtype=np.uint8)
+        for k, i in enumerate(keep):
+            pts = np.round(polygons[i] + pad).astype(np.int32)[np.newaxis]
+            cv2.polylines(outline, pts, True, 0)
+            cv2.polylines(owner, pts, True, k)
+            cv2.fillPoly(inside, pts, 1)
+        dist, labels = cv2.distanceTransformWithLabels(
+            outline, cv2.DIST_L2, cv2.DIST_MASK_5, labelType=cv2.DIST_LABEL_PIXEL
+        )
+        # labels number the outline pixels in raster order, from 1
+        label_distance = np.concatenate([[1], distances[owner[outline == 0]]])
+        crop = (slice(pad, pad + h), slice(pad, pad + w))
+        dist, distance = dist[crop], label_distance[labels[crop]]
+        # pyclipper rounds the padded polygons to whole pixels
+        mask[(dist <= distance + 0.5) | (inside[crop] > 0)] = 1
+        ratio = dist / distance
+        np.subtract(1, np.minimum(ratio, 1, out=ratio), out=canvas)
+        return canvas, mask
+
     def draw_border_map(self, polygon, canvas, mask):
         polygon = np.array(polygon)
         assert polygon.ndim == 2
@@ -26,6 +26,8 @@ import cv2
 from shapely.geometry import Polygon
 import pyclipper
 
+from .make_border_map import polygon_shrink_distance
+
 __all__ = ["MakeShrinkMap"]
 
 
@@ -33,11 +35,21 @@ class MakeShrinkMap(object):
     r"""
     Making binary mask from detection data with ICDAR format.
     Typically following the process of class `MakeICDARData`.
+
+    With use_distance_transform, the shrunk polygons are not offset one by
+    one: the outlines of all polygons are drawn once, and a pixel of a
+    polygon is in the shrink map when its distance to the outline, from one
+    cv2.distanceTransform, reaches the offset distance. A polygon falls back
+    to the next shrink ratio when nothing is left, as with pyclipper, but
+    shrunk regions split in pieces are kept as they are.
     """
 
-    def __init__(self, min_text_size=8, shrink_ratio=0.4, **kwargs):
+    def __init__(
+        self, min_text_size=8, shrink_ratio=0.4, use_distance_transform=False, **kwargs
+    ):
         self.min_text_size = min_text_size
         self.shrink_ratio = shrink_ratio
+        self.use_distance_transform = use_distance_transform
         if "total_epoch" in kwargs and "epoch" in kwargs and kwargs["epoch"] != "None":
             self.shrink_ratio = self.shrink_ratio + 0.2 * kwargs["epoch"] / float(
                 kwargs["total_epoch"]
@@ -50,8 +62,12 @@ class MakeShrinkMap(object):
 
         h, w = image.shape[:2]
         text_polys, ignore_tags = self.validate_polygons(text_polys, ignore_tags, h, w)
-        gt = np.zeros((h, w), dtype=np.float32)
         mask = np.ones((h, w), dtype=np.float32)
+        if self.use_distance_transform:
+            data["shrink_map"] = self.shrink_maps(text_polys, ignore_tags, mask)
+            data["shrink_mask"] = mask
+            return data
+        gt = np.zeros((h, w), dtype=np.float32)
         for i in range(len(text_polys)):
             polygon = text_polys[i]
             height = max(polygon[:, 1]) - min(polygon[:, 1])
@@ -94,6 +110,50 @@ class MakeShrinkMap(object):
         data["shrink_mask"] = mask
         return data
 
+    def shrink_maps(self, text_polys, ignore_tags, mask):
+        """Shrink map of all polygons, ignored ones are cleared from mask"""
+        h, w = mask.shape
+        gt = np.zeros((h, w), dtype=np.float32)
+        outline = np.ones((h, w), dtype=np.uint8)
+        owner = np.zeros((h, w), dtype=np.int32)
+        candidates = []
+        for i in range(len(text_polys)):
+            polygon = text_polys[i]
+            height = max(polygon[:, 1]) - min(polygon[:, 1])
+            width = max(polygon[:, 0]) - min(polygon[:, 0])
+            pts = polygon.astype(np.int32)[np.newaxis, :, :]
+            if ignore_tags[i] or min(height, width) < self.min_text_size:
+                cv2.fillPoly(mask, pts, 0)
+                ignore_tags[i] = True
+                continue
+            candidates.append(i)
+            cv2.polylines(outline, pts, True, 0)
+            cv2.fillPoly(owner, pts, len(candidates))
+        if not candidates:
+            return gt
+
+        # pyclipper rounds the shrunk polygons to whole pixels
+        depth = cv2.distanceTransform(outline, cv2.DIST_L2, cv2.DIST_MASK_5)
+        depth += 0.5
+        offsets = np.full(len(candidates) + 1, np.inf, dtype=np.float32)
+        possible_ratios = np.arange(self.shrink_ratio, 1, self.shrink_ratio)
+        for k, i in enumerate(candidates, 1):
+            pts = text_polys[i].astype(np.int32)
+            x0, y0 = pts.min(axis=0)
+            x1, y1 = pts.max(axis=0) + 1
+            region = owner[y0:y1, x0:x1] == k
+            max_depth = depth[y0:y1, x0:x1][region].max() if region.any() else 0
+            for ratio in possible_ratios:
+                distance = polygon_shrink_distance(text_polys[i], ratio)
+                if distance <= max_depth:
+                    offsets[k] = distance
+                    break
+            else:
+                cv2.fillPoly(mask, pts[np.newaxis, :, :], 0)
+                ignore_tags[i] = True
+        gt[depth >= offsets[owner]] = 1
+        return gt
+
     def validate_polygons(self, polygons, ignore_tags, h, w):
         """
         polygons (numpy.array, required): of shape (num_instances, num_points, 2)
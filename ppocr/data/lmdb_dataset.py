@@ -24,7 +24,59 @@ from PIL import Image
 from .imaug import transform, create_operators
 
 
+# lmdb.open options; "random" suits shuffled training reads, "sequential"
+# lets the kernel read ahead, e.g. for evaluation in key order
+LMDB_PROFILES = {
+    "random": dict(max_readers=32, lock=False, readahead=False, meminit=False),
+    "sequential": dict(max_readers=32, lock=False, readahead=True, meminit=False),
+}
+
+
+class LMDBBatchIndex(int):
+    """Sample index that carries the indexes of its whole batch"""
+
+    def __new__(cls, idx, batch):
+        obj = super(LMDBBatchIndex, cls).__new__(cls, idx)
+        obj.batch = batch
+        return obj
+
+    def __reduce__(self):
+        return LMDBBatchIndex, (int(self), self.batch)
+
+
+class LMDBBatchPrefetchSampler(object):
+    """
+    Wraps a batch sampler so each index knows its batch: the first one an
+    LMDBDataSet worker sees makes it read the whole batch in one sorted pass.
+    """
+
+    def __init__(self, batch_sampler):
+        self.batch_sampler = batch_sampler
+
+    def __iter__(self):
+        for batch in self.batch_sampler:
+            batch = [int(idx) for idx in batch]
+            yield [LMDBBatchIndex(idx, batch) for idx in batch]
+
+    def __len__(self):
+        return len(self.batch_sampler)
+
+    def __getattr__(self, name):
+        return getattr(self.batch_sampler, name)
+
+
 class LMDBDataSet(Dataset):
+    """
+    Samples of all the lmdb environments under data_dir.
+
+    Environments are opened lazily, once per process, so DataLoader workers
+    never share the handles of their parent. The sample order is a uint32
+    array of global indexes (uint64 past 2**32 samples), mapped to an
+    environment through the cumulative sample counts. With prefetch_batch
+    and LMDBBatchPrefetchSampler, the keys of a whole batch, and of its
+    ext_data draws, are read in one sorted pass.
+    """
+
     def __init__(self, config, mode, logger, seed=None):
         super(LMDBDataSet, self).__init__()
 
@@ -34,6 +86,15 @@ class LMDBDataSet(Dataset):
         batch_size = loader_config["batch_size_per_card"]
         data_dir = dataset_config["data_dir"]
         self.do_shuffle = loader_config["shuffle"]
+        self.lmdb_options = dict(
+            LMDB_PROFILES[dataset_config.get("lmdb_profile", "random")],
+            **dataset_config.get("lmdb_options", {}),
+        )
+        self.prefetch_batch = dataset_config.get("prefetch_batch", False)
+        self._envs = {}
+        self._pid = None
+        self._prefetched = {}
+        self._ext_prefetched = []
 
         self.lmdb_sets = self.load_hierarchical_lmdb_dataset(data_dir)
         logger.info("Initialize indexes of datasets:%s" % data_dir)
@@ -46,45 +107,102 @@ class LMDBDataSet(Dataset):
         ratio_list = dataset_config.get("ratio_list", [1.0])
         self.need_reset = True in [x < 1 for x in ratio_list]
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_envs"] = {}
+        state["_pid"] = None
+        return state
+
+    def open_lmdb(self, dirpath):
+        return lmdb.open(dirpath, readonly=True, **self.lmdb_options)
+
     def load_hierarchical_lmdb_dataset(self, data_dir):
         lmdb_sets = {}
         dataset_idx = 0
         for dirpath, dirnames, filenames in os.walk(data_dir + "/"):
             if not dirnames:
-                env = lmdb.open(
-                    dirpath,
-                    max_readers=32,
-                    readonly=True,
-                    lock=False,
-                    readahead=False,
-                    meminit=False,
-                )
-                txn = env.begin(write=False)
-                num_samples = int(txn.get("num-samples".encode()))
+                # only read the sample count here, workers open their own
+                with self.open_lmdb(dirpath) as env:
+                    with env.begin(write=False) as txn:
+                        num_samples = int(txn.get("num-samples".encode()))
                 lmdb_sets[dataset_idx] = {
                     "dirpath": dirpath,
-                    "env": env,
-                    "txn": txn,
                     "num_samples": num_samples,
                 }
                 dataset_idx += 1
         return lmdb_sets
 
+    def get_txn(self, lmdb_idx):
+        """Read transaction of an lmdb set, opened on first use in a process"""
+        if self._pid != os.getpid():
+            # forked: the parent's handles must not be used
+            self._envs = {}
+            self._pid = os.getpid()
+        if lmdb_idx not in self._envs:
+            env = self.open_lmdb(self.lmdb_sets[lmdb_idx]["dirpath"])
+            self._envs[lmdb_idx] = (env, env.begin(write=False))
+        return self._envs[lmdb_idx][1]
+
+    def close(self):
+        """Close the environments this process opened"""
+        if self._pid == os.getpid():
+            for env, txn in self._envs.values():
+                txn.abort()
+                env.close()
+        self._envs = {}
+
     def dataset_traversal(self):
         lmdb_num = len(self.lmdb_sets)
-        total_sample_num = 0
-        for lno in range(lmdb_num):
-            total_sample_num += self.lmdb_sets[lno]["num_samples"]
-        data_idx_order_list = np.zeros((total_sample_num, 2))
-        beg_idx = 0
-        for lno in range(lmdb_num):
-            tmp_sample_num = self.lmdb_sets[lno]["num_samples"]
-            end_idx = beg_idx + tmp_sample_num
-            data_idx_order_list[beg_idx:end_idx, 0] = lno
-            data_idx_order_list[beg_idx:end_idx, 1] = list(range(tmp_sample_num))
-            data_idx_order_list[beg_idx:end_idx, 1] += 1
-            beg_idx = beg_idx + tmp_sample_num
-        return data_idx_order_list
+        sample_nums = [self.lmdb_sets[lno]["num_samples"] for lno in range(lmdb_num)]
+        # global index -> lmdb set through the cumulative sample counts
+        self.lmdb_offsets = np.cumsum([0] + sample_nums, dtype=np.int64)
+        total_sample_num = int(self.lmdb_offsets[-1])
+        dtype = np.uint32 if total_sample_num <= np.iinfo(np.uint32).max else np.uint64
+        return np.arange(total_sample_num, dtype=dtype)
+
+    def locate(self, idx):
+        """(lmdb set, file index) of the idx-th sample in the current order"""
+        global_idx = int(self.data_idx_order_list[idx])
+        lmdb_idx = int(np.searchsorted(self.lmdb_offsets, global_idx, "right")) - 1
+        return lmdb_idx, global_idx - int(self.lmdb_offsets[lmdb_idx]) + 1
+
+    def read_samples(self, idxs):
+        """
+        get_lmdb_sample_info of many samples, reading the keys of each lmdb
+        set in sorted order with one cursor call
+        """
+        by_set = {}
+        for idx in idxs:
+            lmdb_idx, file_idx = self.locate(idx)
+            by_set.setdefault(lmdb_idx, []).append(file_idx)
+        values = {}
+        for lmdb_idx, file_idxs in by_set.items():
+            keys = sorted(
+                key
+                for file_idx in set(file_idxs)
+                for key in (b"label-%09d" % file_idx, b"image-%09d" % file_idx)
+            )
+            with self.get_txn(lmdb_idx).cursor() as cursor:
+                for key, value in cursor.getmulti(keys):
+                    values[lmdb_idx, key] = value
+        samples = []
+        for idx in idxs:
+            lmdb_idx, file_idx = self.locate(idx)
+            label = values.get((lmdb_idx, b"label-%09d" % file_idx))
+            if label is None:
+                samples.append(None)
+                continue
+            imgbuf = values.get((lmdb_idx, b"image-%09d" % file_idx))
+            samples.append((imgbuf, label.decode("utf-8")))
+        return samples
+
+    def _prefetch(self, batch):
+        # samples of the batch and ext_data draws for all of it in one pass
+        ext_data_num = self.get_ext_data_num()
+        ext_idxs = list(np.random.randint(len(self), size=len(batch) * ext_data_num))
+        samples = self.read_samples(list(batch) + ext_idxs)
+        self._prefetched = dict(zip(batch, samples[: len(batch)]))
+        self._ext_prefetched = samples[len(batch) :]
 
     def get_img_data(self, value):
         """get_img_data"""
@@ -98,22 +216,25 @@ class LMDBDataSet(Dataset):
             return None
         return imgori
 
-    def get_ext_data(self):
-        ext_data_num = 0
+    def get_ext_data_num(self):
         for op in self.ops:
             if hasattr(op, "ext_data_num"):
-                ext_data_num = getattr(op, "ext_data_num")
-                break
+                return getattr(op, "ext_data_num")
+        return 0
+
+    def get_ext_data(self):
+        ext_data_num = self.get_ext_data_num()
         load_data_ops = self.ops[: self.ext_op_transform_idx]
         ext_data = []
 
         while len(ext_data) < ext_data_num:
-            lmdb_idx, file_idx = self.data_idx_order_list[np.random.randint(len(self))]
-            lmdb_idx = int(lmdb_idx)
-            file_idx = int(file_idx)
-            sample_info = self.get_lmdb_sample_info(
-                self.lmdb_sets[lmdb_idx]["txn"], file_idx
-            )
+            if self._ext_prefetched:
+                sample_info = self._ext_prefetched.pop()
+            else:
+                lmdb_idx, file_idx = self.locate(np.random.randint(len(self)))
+                sample_info = self.get_lmdb_sample_info(
+                    self.get_txn(lmdb_idx), file_idx
+                )
             if sample_info is None:
                 continue
             img, label = sample_info
@@ -135,12 +256,14 @@ class LMDBDataSet(Dataset):
         return imgbuf, label
 
     def __getitem__(self, idx):
-        lmdb_idx, file_idx = self.data_idx_order_list[idx]
-        lmdb_idx = int(lmdb_idx)
-        file_idx = int(file_idx)
-        sample_info = self.get_lmdb_sample_info(
-            self.lmdb_sets[lmdb_idx]["txn"], file_idx
-        )
+        batch = getattr(idx, "batch", None)
+        if self.prefetch_batch and batch is not None and idx not in self._prefetched:
+            self._prefetch(batch)
+        if idx in self._prefetched:
+            sample_info = self._prefetched.pop(idx)
+        else:
+            lmdb_idx, file_idx = self.locate(idx)
+            sample_info = self.get_lmdb_sample_info(self.get_txn(lmdb_idx), file_idx)
         if sample_info is None:
             return self.__getitem__(np.random.randint(self.__len__()))
         img, label = sample_info
@@ -195,12 +318,8 @@ class LMDBDataSetSR(LMDBDataSet):
         return img_HR, img_lr, label_str
 
     def __getitem__(self, idx):
-        lmdb_idx, file_idx = self.data_idx_order_list[idx]
-        lmdb_idx = int(lmdb_idx)
-        file_idx = int(file_idx)
-        sample_info = self.get_lmdb_sample_info(
-            self.lmdb_sets[lmdb_idx]["txn"], file_idx
-        )
+        lmdb_idx, file_idx = self.locate(idx)
+        sample_info = self.get_lmdb_sample_info(self.get_txn(lmdb_idx), file_idx)
         if sample_info is None:
             return self.__getitem__(np.random.randint(self.__len__()))
         img_HR, img_lr, label_str = sample_info
@@ -215,20 +334,11 @@ class LMDBDataSetTableMaster(LMDBDataSet):
     def load_hierarchical_lmdb_dataset(self, data_dir):
         lmdb_sets = {}
         dataset_idx = 0
-        env = lmdb.open(
-            data_dir,
-            max_readers=32,
-            readonly=True,
-            lock=False,
-            readahead=False,
-            meminit=False,
-        )
-        txn = env.begin(write=False)
-        num_samples = int(pickle.loads(txn.get(b"__len__")))
+        with self.open_lmdb(data_dir) as env:
+            with env.begin(write=False) as txn:
+                num_samples = int(pickle.loads(txn.get(b"__len__")))
         lmdb_sets[dataset_idx] = {
             "dirpath": data_dir,
-            "env": env,
-            "txn": txn,
             "num_samples": num_samples,
         }
         return lmdb_sets
@@ -286,10 +396,8 @@ class LMDBDataSetTableMaster(LMDBDataSet):
         return line_info
 
     def __getitem__(self, idx):
-        lmdb_idx, file_idx = self.data_idx_order_list[idx]
-        lmdb_idx = int(lmdb_idx)
-        file_idx = int(file_idx)
-        data = self.get_lmdb_sample_info(self.lmdb_sets[lmdb_idx]["txn"], file_idx)
+        lmdb_idx, file_idx = self.locate(idx)
+        data = self.get_lmdb_sample_info(self.get_txn(lmdb_idx), file_idx)
         if data is None:
             return self.__getitem__(np.random.randint(self.__len__()))
         outs = transform(data, self.ops)
@@ -45,19 +45,31 @@ class SimpleDataSet(Dataset):
         self.data_dir = dataset_config["data_dir"]
         self.do_shuffle = loader_config["shuffle"]
         self.seed = seed
+        # with resample_per_epoch all lines are kept, in file order, and
+        # EpochResampleBatchSampler draws ratio_list of them every epoch
+        self.resample_per_epoch = self.mode == "train" and dataset_config.get(
+            "resample_per_epoch", False
+        )
+        self.ratio_list = ratio_list
         logger.info("Initialize indexes of datasets:%s" % label_file_list)
-        self.data_lines = self.get_image_info_list(label_file_list, ratio_list)
+        self.data_lines = self.get_image_info_list(
+            label_file_list,
+            [1.0] * data_source_num if self.resample_per_epoch else ratio_list,
+        )
         self.data_idx_order_list = list(range(len(self.data_lines)))
-        if self.mode == "train" and self.do_shuffle:
+        if self.mode == "train" and self.do_shuffle and not self.resample_per_epoch:
             self.shuffle_data_random()
         self.ops = create_operators(dataset_config["transforms"], global_config)
         self.ext_op_transform_idx = dataset_config.get("ext_op_transform_idx", 2)
-        self.need_reset = True in [x < 1 for x in ratio_list]
+        self.need_reset = not self.resample_per_epoch and True in [
+            x < 1 for x in ratio_list
+        ]
 
     def get_image_info_list(self, file_list, ratio_list):
         if isinstance(file_list, str):
             file_list = [file_list]
         data_lines = []
+        self.data_source_sizes = []
         for idx, file in enumerate(file_list):
             with open(file, "rb") as f:
                 lines = f.readlines()
@@ -65,6 +77,7 @@ class SimpleDataSet(Dataset):
                     random.seed(self.seed)
                     lines = random.sample(lines, round(len(lines) * ratio_list[idx]))
                 data_lines.extend(lines)
+                self.data_source_sizes.append(len(lines))
         return data_lines
 
     def shuffle_data_random(self):
@@ -22,8 +22,12 @@ from .eval_det_iou import DetectionIoUEvaluator
 
 
 class DetMetric(object):
-    def __init__(self, main_indicator="hmean", **kwargs):
-        self.evaluator = DetectionIoUEvaluator()
+    def __init__(self, main_indicator="hmean", num_workers=0, **kwargs):
+        """
+        num_workers > 1 defers the evaluation of the images to get_metric,
+        where they are spread over that many processes.
+        """
+        self.evaluator = DetectionIoUEvaluator(num_workers=num_workers)
         self.main_indicator = main_indicator
         self.reset()
 
@@ -51,6 +55,9 @@ class DetMetric(object):
             det_info_list = [
                 {"points": det_polyon, "text": ""} for det_polyon in pred["points"]
             ]
+            if self.evaluator.num_workers > 1:
+                self.pending.append((gt_info_list, det_info_list))
+                continue
             result = self.evaluator.evaluate_image(gt_info_list, det_info_list)
             self.results.append(result)
 
@@ -62,13 +69,16 @@ class DetMetric(object):
                  'hmean': 0
             }
         """
-
+        if self.pending:
+            gts, preds = zip(*self.pending)
+            self.results.extend(self.evaluator.evaluate_images(gts, preds))
         metrics = self.evaluator.combine_results(self.results)
         self.reset()
         return metrics
 
     def reset(self):
         self.results = []  # clear results
+        self.pending = []
 
 
 class DetFCEMetric(object):
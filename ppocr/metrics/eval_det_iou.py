@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from collections import namedtuple
+import multiprocessing
+
 import numpy as np
+import shapely
 from shapely.geometry import Polygon
 
 """
@@ -10,191 +12,198 @@ https://github.com/MhLiao/DB/blob/3c32b808d4412680310d3d28eeb6a2d5bf1566c5/conce
 """
 
 
+def _cross(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def _to_polygons(points_list):
+    """
+    Polygons of points_list, built once. Also returns the points as a
+    (N, 4, 2) float64 array when all of them are quads, else None.
+    """
+    if len(points_list) == 0:
+        return np.empty(0, dtype=object), np.zeros((0, 4, 2))
+    try:
+        points = np.asarray(points_list, dtype=np.float64)
+    except ValueError:
+        points = None
+    if points is None or points.ndim != 3 or points.shape[2] != 2:
+        pols = np.empty(len(points_list), dtype=object)
+        pols[:] = [Polygon(p) for p in points_list]
+        return pols, None
+    pols = shapely.polygons(points)
+    return pols, points if points.shape[1] == 4 else None
+
+
+def _convex_quads(quads):
+    """Whether each quad is convex, counter-clockwise copies of the quads"""
+    if quads is None:
+        return None, None
+    edges = np.roll(quads, -1, axis=1) - quads
+    turns = _cross(edges, np.roll(edges, -1, axis=1))
+    convex = np.all(turns >= 0, axis=1) | np.all(turns <= 0, axis=1)
+    ccw = quads.copy()
+    cw = turns.sum(axis=1) < 0
+    ccw[cw] = ccw[cw, ::-1]
+    return convex, ccw
+
+
+def quad_intersection_area(a, b):
+    """
+    Intersection areas of the convex counter-clockwise quads a[i] and b[i],
+    both (P, 4, 2). The intersection is convex, its vertices are the corners
+    of each quad inside the other and the crossings of their edges; they are
+    ordered by angle around their mean and measured with the shoelace formula.
+    """
+    if len(a) == 0:
+        return np.zeros(0)
+    scale = max(np.abs(a).max(), np.abs(b).max(), 1.0)
+    tol = 1e-9 * scale * scale
+    ea = np.roll(a, -1, axis=1) - a
+    eb = np.roll(b, -1, axis=1) - b
+    # corners of a inside b: on the left of every edge of b, and vice versa
+    a_in_b = np.all(
+        _cross(eb[:, None, :, :], a[:, :, None, :] - b[:, None, :, :]) >= -tol,
+        axis=2,
+    )
+    b_in_a = np.all(
+        _cross(ea[:, None, :, :], b[:, :, None, :] - a[:, None, :, :]) >= -tol,
+        axis=2,
+    )
+    # crossings of edge i of a with edge j of b
+    r = ea[:, :, None, :]
+    s = eb[:, None, :, :]
+    qp = b[:, None, :, :] - a[:, :, None, :]
+    denom = _cross(r, s)
+    parallel = np.abs(denom) <= 1e-12 * scale * scale
+    denom = np.where(parallel, 1.0, denom)
+    t = _cross(qp, s) / denom
+    u = _cross(qp, r) / denom
+    crossing = ~parallel & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    cross_pts = a[:, :, None, :] + t[..., None] * r
+
+    pts = np.concatenate([a, b, cross_pts.reshape(len(a), 16, 2)], axis=1)
+    mask = np.concatenate([a_in_b, b_in_a, crossing.reshape(len(a), 16)], axis=1)
+    count = mask.sum(axis=1)
+    center = (pts * mask[..., None]).sum(axis=1) / np.maximum(count, 1)[:, None]
+    angle = np.arctan2(pts[..., 1] - center[:, 1:2], pts[..., 0] - center[:, 0:1])
+    angle[~mask] = np.inf
+    order = np.argsort(angle, axis=1)
+    pts = np.take_along_axis(pts, order[..., None], axis=1)
+    mask = np.take_along_axis(mask, order, axis=1)
+    # pad with the first vertex, the padding adds nothing to the sum
+    pts = np.where(mask[..., None], pts, pts[:, 0:1, :])
+    area = 0.5 * np.abs(_cross(pts, np.roll(pts, -1, axis=1)).sum(axis=1))
+    area[count < 3] = 0
+    return area
+
+
 class DetectionIoUEvaluator(object):
-    def __init__(self, iou_constraint=0.5, area_precision_constraint=0.5):
+    """
+    ICDAR 2015 detection evaluation. Polygons are built once per image and
+    the pairs to compare come from an STR-tree, so only overlapping gt/det
+    pairs are intersected; pairs of convex quads go through
+    quad_intersection_area, others through shapely. With num_workers > 1,
+    evaluate_images spreads images over a process pool.
+    """
+
+    def __init__(
+        self, iou_constraint=0.5, area_precision_constraint=0.5, num_workers=0
+    ):
         self.iou_constraint = iou_constraint
         self.area_precision_constraint = area_precision_constraint
-
-    def evaluate_image(self, gt, pred):
-        def get_union(pD, pG):
-            return Polygon(pD).union(Polygon(pG)).area
-
-        def get_intersection_over_union(pD, pG):
-            return get_intersection(pD, pG) / get_union(pD, pG)
-
-        def get_intersection(pD, pG):
-            return Polygon(pD).intersection(Polygon(pG)).area
-
-        def compute_ap(confList, matchList, numGtCare):
-            correct = 0
-            AP = 0
-            if len(confList) > 0:
-                confList = np.array(confList)
-                matchList = np.array(matchList)
-                sorted_ind = np.argsort(-confList)
-                confList = confList[sorted_ind]
-                matchList = matchList[sorted_ind]
-                for n in range(len(confList)):
-                    match = matchList[n]
-                    if match:
-                        correct += 1
-                        AP += float(correct) / (n + 1)
-
-                if numGtCare > 0:
-                    AP /= numGtCare
-
-            return AP
-
-        perSampleMetrics = {}
-
-        matchedSum = 0
-
-        Rectangle = namedtuple("Rectangle", "xmin ymin xmax ymax")
-
-        numGlobalCareGt = 0
-        numGlobalCareDet = 0
-
-        arrGlobalConfidences = []
-        arrGlobalMatches = []
-
-        recall = 0
-        precision = 0
-        hmean = 0
-
-        detMatched = 0
-
-        iouMat = np.empty([1, 1])
-
-        gtPols = []
-        detPols = []
-
-        gtPolPoints = []
-        detPolPoints = []
-
-        # Array of Ground Truth Polygons' keys marked as don't Care
-        gtDontCarePolsNum = []
-        # Array of Detected Polygons' matched with a don't Care GT
-        detDontCarePolsNum = []
-
-        pairs = []
-        detMatchedNums = []
-
-        arrSampleConfidences = []
-        arrSampleMatch = []
-
-        evaluationLog = ""
-
-        for n in range(len(gt)):
-            points = gt[n]["points"]
-            dontCare = gt[n]["ignore"]
-            if not Polygon(points).is_valid:
-                continue
-
-            gtPol = points
-            gtPols.append(gtPol)
-            gtPolPoints.append(points)
-            if dontCare:
-                gtDontCarePolsNum.append(len(gtPols) - 1)
-
-        evaluationLog += (
-            "GT polygons: "
-            + str(len(gtPols))
-            + (
-                " (" + str(len(gtDontCarePolsNum)) + " don't care)\n"
-                if len(gtDontCarePolsNum) > 0
-                else "\n"
-            )
-        )
-
-        for n in range(len(pred)):
-            points = pred[n]["points"]
-            if not Polygon(points).is_valid:
-                continue
-
-            detPol = points
-            detPols.append(detPol)
-            detPolPoints.append(points)
-            if len(gtDontCarePolsNum) > 0:
-                for dontCarePol in gtDontCarePolsNum:
-                    dontCarePol = gtPols[dontCarePol]
-                    intersected_area = get_intersection(dontCarePol, detPol)
-                    pdDimensions = Polygon(detPol).area
-                    precision = (
-                        0 if pdDimensions == 0 else intersected_area / pdDimensions
-                    )
-                    if precision > self.area_precision_constraint:
-                        detDontCarePolsNum.append(len(detPols) - 1)
-                        break
-
-        evaluationLog += (
-            "DET polygons: "
-            + str(len(detPols))
-            + (
-                " (" + str(len(detDontCarePolsNum)) + " don't care)\n"
-                if len(detDontCarePolsNum) > 0
-                else "\n"
-            )
-        )
-
-        if len(gtPols) > 0 and len(detPols) > 0:
-            # Calculate IoU and precision matrixs
-            outputShape = [len(gtPols), len(detPols)]
-            iouMat = np.empty(outputShape)
-            gtRectMat = np.zeros(len(gtPols), np.int8)
-            detRectMat = np.zeros(len(detPols), np.int8)
-            for gtNum in range(len(gtPols)):
-                for detNum in range(len(detPols)):
-                    pG = gtPols[gtNum]
-                    pD = detPols[detNum]
-                    iouMat[gtNum, detNum] = get_intersection_over_union(pD, pG)
-
-            for gtNum in range(len(gtPols)):
-                for detNum in range(len(detPols)):
-                    if (
-                        gtRectMat[gtNum] == 0
-                        and detRectMat[detNum] == 0
-                        and gtNum not in gtDontCarePolsNum
-                        and detNum not in detDontCarePolsNum
-                    ):
-                        if iouMat[gtNum, detNum] > self.iou_constraint:
-                            gtRectMat[gtNum] = 1
-                            detRectMat[detNum] = 1
-                            detMatched += 1
-                            pairs.append({"gt": gtNum, "det": detNum})
-                            detMatchedNums.append(detNum)
-                            evaluationLog += (
-                                "Match GT #"
-                                + str(gtNum)
-                                + " with Det #"
-                                + str(detNum)
-                                + "\n"
-                            )
-
-        numGtCare = len(gtPols) - len(gtDontCarePolsNum)
-        numDetCare = len(detPols) - len(detDontCarePolsNum)
-        if numGtCare == 0:
-            recall = float(1)
-            precision = float(0) if numDetCare > 0 else float(1)
+        self.num_workers = num_workers
+
+    def _intersection_area(self, side_a, idx_a, side_b, idx_b):
+        pols_a, convex_a, ccw_a = side_a
+        pols_b, convex_b, ccw_b = side_b
+        area = np.empty(len(idx_a))
+        if convex_a is not None and convex_b is not None:
+            fast = convex_a[idx_a] & convex_b[idx_b]
         else:
-            recall = float(detMatched) / numGtCare
-            precision = 0 if numDetCare == 0 else float(detMatched) / numDetCare
-
-        hmean = (
-            0
-            if (precision + recall) == 0
-            else 2.0 * precision * recall / (precision + recall)
+            fast = np.zeros(len(idx_a), dtype=bool)
+        if fast.any():
+            area[fast] = quad_intersection_area(ccw_a[idx_a[fast]], ccw_b[idx_b[fast]])
+        slow = ~fast
+        area[slow] = shapely.area(
+            shapely.intersection(pols_a[idx_a[slow]], pols_b[idx_b[slow]])
         )
+        return area
 
-        matchedSum += detMatched
-        numGlobalCareGt += numGtCare
-        numGlobalCareDet += numDetCare
+    def _prepare(self, infos):
+        pols, quads = _to_polygons([info["points"] for info in infos])
+        valid = shapely.is_valid(pols)
+        pols = pols[valid]
+        if quads is not None:
+            quads = quads[valid]
+        convex, ccw = _convex_quads(quads)
+        return (pols, convex, ccw), valid
 
-        perSampleMetrics = {
-            "gtCare": numGtCare,
-            "detCare": numDetCare,
-            "detMatched": detMatched,
+    def evaluate_image(self, gt, pred):
+        gt_side, gt_valid = self._prepare(gt)
+        det_side, _ = self._prepare(pred)
+        gt_pols, det_pols = gt_side[0], det_side[0]
+        gt_dont_care = np.array([bool(g["ignore"]) for g in gt], dtype=bool)
+        gt_dont_care = gt_dont_care[gt_valid] if len(gt) else gt_dont_care
+        det_dont_care = np.zeros(len(det_pols), dtype=bool)
+        det_area = shapely.area(det_pols)
+
+        if gt_dont_care.any() and len(det_pols) > 0:
+            # dets mostly covered by a don't care gt are don't care as well
+            dont_care_ids = np.nonzero(gt_dont_care)[0]
+            tree = shapely.STRtree(gt_pols[dont_care_ids])
+            det_ids, tree_ids = tree.query(det_pols, predicate="intersects")
+            gt_ids = dont_care_ids[tree_ids]
+            inter = self._intersection_area(det_side, det_ids, gt_side, gt_ids)
+            pd_area = det_area[det_ids]
+            precision = np.zeros(len(det_ids))
+            np.divide(inter, pd_area, out=precision, where=pd_area != 0)
+            det_dont_care[det_ids[precision > self.area_precision_constraint]] = True
+
+        det_matched = 0
+        if len(gt_pols) > 0 and len(det_pols) > 0:
+            tree = shapely.STRtree(det_pols)
+            gt_ids, det_ids = tree.query(gt_pols, predicate="intersects")
+            care = ~gt_dont_care[gt_ids] & ~det_dont_care[det_ids]
+            gt_ids, det_ids = gt_ids[care], det_ids[care]
+            inter = self._intersection_area(det_side, det_ids, gt_side, gt_ids)
+            union = shapely.area(gt_pols)[gt_ids] + det_area[det_ids] - inter
+            hit = inter / union > self.iou_constraint
+            gt_ids, det_ids = gt_ids[hit], det_ids[hit]
+            # greedy matching in gt order, then det order
+            order = np.lexsort((det_ids, gt_ids))
+            gt_done, det_done = set(), set()
+            for gt_num, det_num in zip(gt_ids[order].tolist(), det_ids[order].tolist()):
+                if gt_num in gt_done or det_num in det_done:
+                    continue
+                gt_done.add(gt_num)
+                det_done.add(det_num)
+                det_matched += 1
+
+        return {
+            "gtCare": len(gt_pols) - int(gt_dont_care.sum()),
+            "detCare": len(det_pols) - int(det_dont_care.sum()),
+            "detMatched": det_matched,
         }
-        return perSampleMetrics
+
+    def _evaluate_pair(self, pair):
+        return self.evaluate_image(*pair)
+
+    def evaluate_images(self, gts, preds):
+        """evaluate_image over the images, in a process pool if num_workers > 1"""
+        pairs = list(zip(gts, preds))
+        if self.num_workers <= 1 or len(pairs) <= 1:
+            return [self._evaluate_pair(pair) for pair in pairs]
+        num_workers = min(self.num_workers, len(pairs))
+        chunksize = max(1, len(pairs) // (num_workers * 4))
+        pool = multiprocessing.Pool(num_workers)
+        try:
+            return pool.map(self._evaluate_pair, pairs, chunksize=chunksize)
+        finally:
+            # close and join rather than terminate, paddle reports SIGTERM
+            # in the workers as a fatal error
+            pool.close()
+            pool.join()
 
     def combine_results(self, results):
         numGlobalCareGt = 0
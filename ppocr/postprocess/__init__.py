@@ -31,6 +31,7 @@ from .rec_postprocess import (
     AttnLabelDecode,
     SRNLabelDecode,
     DistillationCTCLabelDecode,
+    CTCBeamSearchLabelDecode,
     NRTRLabelDecode,
     SARLabelDecode,
     SEEDLabelDecode,
@@ -75,6 +76,7 @@ def build_post_process(config, global_config=None):
         "SRNLabelDecode",
         "PGPostProcess",
         "DistillationCTCLabelDecode",
+        "CTCBeamSearchLabelDecode",
         "TableLabelDecode",
         "DistillationDBPostProcess",
         "NRTRLabelDecode",
@@ -0,0 +1,359 @@
+# copyright (c) 2025 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+CTC prefix beam search with optional character-level priors.
+
+A prior scores a prefix incrementally through three methods:
+
+    initial_state()        -> state
+    advance(state, char)   -> (new_state, log_score), or None to reject char
+    finish(state)          -> log_score of ending here, or None to reject
+
+LexiconTrie constrains the output to words from a lexicon, CharNgramLM adds
+a character n-gram language model score and CombinedPrior chains several.
+"""
+
+import heapq
+import math
+from collections import defaultdict
+
+import numpy as np
+
+NEG_INF = float("-inf")
+
+
+def _logaddexp(a, b):
+    if a == NEG_INF:
+        return b
+    if b == NEG_INF:
+        return a
+    if a > b:
+        return a + math.log1p(math.exp(b - a))
+    return b + math.log1p(math.exp(a - b))
+
+
+class LexiconTrie(object):
+    """
+    Hard lexicon constraint: the text must be a lexicon entry, or several
+    entries joined by one of the delimiters (a space by default).
+    """
+
+    def __init__(self, words, delimiters=" "):
+        self.root = {}
+        self.delimiters = set(delimiters)
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    @classmethod
+    def from_file(cls, path, delimiters=" "):
+        with open(path, "rb") as fin:
+            words = [line.decode("utf-8").strip("\r\n") for line in fin]
+        return cls([w for w in words if w], delimiters)
+
+    def add(self, word):
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        if None not in node:
+            node[None] = True  # end-of-word marker
+            self.size += 1
+
+    def initial_state(self):
+        return self.root
+
+    def advance(self, node, char):
+        child = node.get(char)
+        if child is not None:
+            return child, 0.0
+        if char in self.delimiters and None in node:
+            return self.root, 0.0
+        return None
+
+    def finish(self, node):
+        return 0.0 if None in node else None
+
+
+class CharNgramLM(object):
+    """
+    Character n-gram model with stupid backoff, estimated from a text corpus
+    (one sample per line). Unseen characters get an add-one unigram floor.
+    """
+
+    def __init__(self, order=3, backoff=0.4):
+        assert order >= 1, "order must be >= 1"
+        self.order = order
+        self.log_backoff = math.log(backoff)
+        self.counts = [defaultdict(int) for _ in range(order)]
+        self.context_counts = [defaultdict(int) for _ in range(order)]
+        self.vocab = set()
+        self._cache = {}
+
+    @classmethod
+    def from_corpus(cls, path, order=3, backoff=0.4):
+        lm = cls(order, backoff)
+        with open(path, "rb") as fin:
+            for line in fin:
+                lm.add_text(line.decode("utf-8").strip("\r\n"))
+        return lm
+
+    def add_text(self, text):
+        # "\x02" pads the start of the sample and "\x03" marks its end
+        chars = ["\x02"] * (self.order - 1) + list(text) + ["\x03"]
+        self.vocab.update(text)
+        self.vocab.add("\x03")
+        for i in range(self.order - 1, len(chars)):
+            for n in range(self.order):
+                context = tuple(chars[i - n : i])
+                self.counts[n][context + (chars[i],)] += 1
+                self.context_counts[n][context] += 1
+        self._cache.clear()
+
+    def log_prob(self, context, char):
+        key = (context, char)
+        score = self._cache.get(key)
+        if score is not None:
+            return score
+        penalty = 0.0
+        score = None
+        for n in range(len(context), 0, -1):
+            sub = context[len(context) - n :]
+            count = self.counts[n].get(sub + (char,))
+            if count:
+                score = penalty + math.log(count / self.context_counts[n][sub])
+                break
+            penalty += self.log_backoff
+        if score is None:
+            total = self.context_counts[0].get((), 0)
+            count = self.counts[0].get((char,), 0)
+            score = penalty + math.log((count + 1.0) / (total + len(self.vocab) + 1.0))
+        self._cache[key] = score
+        return score
+
+    def initial_state(self):
+        return ("\x02",) * (self.order - 1)
+
+    def advance(self, context, char):
+        score = self.log_prob(context, char)
+        if self.order > 1:
+            context = (context + (char,))[1:]
+        return context, score
+
+    def finish(self, context):
+        return self.log_prob(context, "\x03")
+
+
+class CombinedPrior(object):
+    def __init__(self, priors, weights):
+        self.priors = list(priors)
+        self.weights = list(weights)
+
+    def initial_state(self):
+        return tuple(p.initial_state() for p in self.priors)
+
+    def advance(self, states, char):
+        new_states = []
+        total = 0.0
+        for prior, weight, state in zip(self.priors, self.weights, states):
+            res = prior.advance(state, char)
+            if res is None:
+                return None
+            new_states.append(res[0])
+            total += weight * res[1]
+        return tuple(new_states), total
+
+    def finish(self, states):
+        total = 0.0
+        for prior, weight, state in zip(self.priors, self.weights, states):
+            score = prior.finish(state)
+            if score is None:
+                return None
+            total += weight * score
+        return total
+
+
+def prune_candidates(probs, topk, blank=0, blank_skip_thresh=1.0, min_prob=0.0):
+    """
+    Per-timestep candidates for a (batch, time, classes) probability array,
+    computed for the whole batch at once.
+
+    Returns (cand_ids, cand_probs, blank_only) with shapes (B, T, k),
+    (B, T, k) and (B, T). Candidates below min_prob, and slots left empty
+    because fewer than k classes reach it, have a probability of 0 and are
+    skipped by the search. Frames whose blank probability reaches
+    blank_skip_thresh only extend the beams with a blank.
+    """
+    batch_size, seq_len, num_classes = probs.shape
+    topk = max(1, min(topk, num_classes))
+    blank_only = probs[..., blank] >= blank_skip_thresh
+    if min_prob <= 0:
+        if topk < num_classes:
+            cand_ids = np.argpartition(probs, num_classes - topk, axis=2)
+            cand_ids = cand_ids[..., num_classes - topk :]
+        else:
+            cand_ids = np.broadcast_to(np.arange(num_classes), probs.shape)
+        cand_probs = np.take_along_axis(probs, cand_ids, axis=2)
+        return cand_ids, cand_probs, blank_only
+
+    # at most 1 / min_prob classes can pass, so a sparse pass is much cheaper
+    # than partitioning every frame over a large dictionary
+    flat = np.flatnonzero(probs >= min_prob)
+    p = probs.reshape(-1)[flat]
+    b, t, c = np.unravel_index(flat, probs.shape)
+    order = np.lexsort((-p, t, b))
+    b, t, c, p = b[order], t[order], c[order], p[order]
+    frame = b * seq_len + t
+    is_first = np.ones(len(frame), dtype=bool)
+    is_first[1:] = frame[1:] != frame[:-1]
+    first = np.maximum.accumulate(np.where(is_first, np.arange(len(frame)), 0))
+    rank = np.arange(len(frame)) - first
+    keep = rank < topk
+    cand_ids = np.zeros((batch_size, seq_len, topk), dtype=np.int64)
+    cand_probs = np.zeros((batch_size, seq_len, topk), dtype=probs.dtype)
+    cand_ids[b[keep], t[keep], rank[keep]] = c[keep]
+    cand_probs[b[keep], t[keep], rank[keep]] = p[keep]
+    return cand_ids, cand_probs, blank_only
+
+
+def ctc_prefix_beam_search(
+    probs,
+    beam_width=10,
+    blank=0,
+    candidates=None,
+    prior=None,
+    id_to_char=None,
+    insertion_bonus=0.0,
+):
+    """
+    Prefix beam search over one (time, classes) CTC probability matrix.
+
+    Args:
+        probs: softmax output of one sample.
+        beam_width: number of prefixes kept after every frame.
+        blank: index of the CTC blank.
+        candidates: (cand_ids, cand_probs, blank_only) of this sample from
+            prune_candidates, all classes are candidates if None.
+        prior: optional prior (see the module docstring), it sees characters
+            obtained through id_to_char.
+        insertion_bonus: log score added per emitted character, offsets the
+            prior's bias towards short outputs.
+
+    Returns:
+        (ids, confs, cols) of the best prefix, or None if the prior rejected
+        every hypothesis. confs holds, for each character, the highest
+        probability among the frames that emitted it on any path reaching the
+        prefix, and cols the index of that frame. Greedy decoding reports the
+        first frame of each run instead; both agree when a character spans a
+        single frame.
+    """
+    seq_len = probs.shape[0]
+    if candidates is None:
+        candidates = prune_candidates(probs[None], probs.shape[1], blank)
+        candidates = tuple(c[0] for c in candidates)
+    cand_ids, cand_probs, blank_only = candidates
+    blank_only = blank_only.tolist()
+    blank_probs = probs[:, blank].tolist()
+    # (char, prob, log prob) per frame, without the blank and pruned slots
+    frame_cands = [
+        [(c, p, math.log(p)) for c, p in zip(ids, ps) if c != blank and p > 0.0]
+        for ids, ps in zip(cand_ids.tolist(), cand_probs.tolist())
+    ]
+
+    # prefix -> [log p ending in blank, log p ending in non-blank]
+    beams = {(): [0.0, NEG_INF]}
+    # prefix -> (prior state, prior score, confs, cols), filled on creation
+    meta = {(): (prior.initial_state() if prior else None, 0.0, (), ())}
+
+    for t in range(seq_len):
+        blank_lp = math.log(max(blank_probs[t], 1e-30))
+        if blank_only[t] or not frame_cands[t]:
+            # every beam moves by the same blank score, the ranking is kept
+            beams = {
+                prefix: [_logaddexp(pb, pnb) + blank_lp, NEG_INF]
+                for prefix, (pb, pnb) in beams.items()
+            }
+            continue
+        next_beams = defaultdict(lambda: [NEG_INF, NEG_INF])
+        for prefix, (pb, pnb) in beams.items():
+            entry = next_beams[prefix]
+            entry[0] = _logaddexp(entry[0], _logaddexp(pb, pnb) + blank_lp)
+        for prefix, (pb, pnb) in beams.items():
+            last = prefix[-1] if prefix else None
+            total = _logaddexp(pb, pnb)
+            state, prior_score, confs, cols = meta[prefix]
+            for c, p, lp in frame_cands[t]:
+                if c == last:
+                    # "aa" collapses to "a"; only "a-a" emits a new "a"
+                    entry = next_beams[prefix]
+                    entry[1] = _logaddexp(entry[1], pnb + lp)
+                    path = pb + lp
+                else:
+                    path = total + lp
+                if path == NEG_INF:
+                    continue
+                new_prefix = prefix + (c,)
+                if new_prefix not in meta:
+                    if prior is not None:
+                        res = prior.advance(state, id_to_char(c))
+                        if res is None:
+                            continue
+                        new_state, score = res
+                        new_score = prior_score + score
+                    else:
+                        new_state, new_score = None, 0.0
+                    meta[new_prefix] = (
+                        new_state,
+                        new_score,
+                        confs + (p,),
+                        cols + (t,),
+                    )
+                elif p > meta[new_prefix][2][-1]:
+                    # report the strongest emission of the last character
+                    new_meta = meta[new_prefix]
+                    meta[new_prefix] = (
+                        new_meta[0],
+                        new_meta[1],
+                        new_meta[2][:-1] + (p,),
+                        new_meta[3][:-1] + (t,),
+                    )
+                entry = next_beams[new_prefix]
+                entry[1] = _logaddexp(entry[1], path)
+
+        def rank(item):
+            prefix, (pb, pnb) = item
+            return _logaddexp(pb, pnb) + meta[prefix][1] + insertion_bonus * len(prefix)
+
+        if len(next_beams) > beam_width:
+            beams = dict(heapq.nlargest(beam_width, next_beams.items(), key=rank))
+        else:
+            beams = dict(next_beams)
+        # drop metadata of prefixes that fell out of the beam
+        if len(meta) > 4 * beam_width + 1:
+            meta = {prefix: meta[prefix] for prefix in beams}
+
+    best, best_score = None, NEG_INF
+    for prefix, (pb, pnb) in beams.items():
+        state, prior_score, confs, cols = meta[prefix]
+        score = _logaddexp(pb, pnb) + prior_score + insertion_bonus * len(prefix)
+        if prior is not None:
+            end_score = prior.finish(state)
+            if end_score is None:
+                continue
+            score += end_score
+        if score > best_score:
+            best, best_score = prefix, score
+    if best is None:
+        return None
+    _, _, confs, cols = meta[best]
+    return list(best), list(confs), list(cols)
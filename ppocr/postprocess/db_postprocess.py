@@ -110,18 +110,66 @@ class DBPostProcess(object):
         """
         _bitmap: single map with shape (1, H, W),
                 whose values are binarized as {0, 1}
+
+        Batched version of boxes_from_bitmap_per_contour: mini-box ordering,
+        box scores, unclip distances and rescaling are computed for all
+        contours at once, only the OpenCV/pyclipper calls remain per contour.
         """
 
         bitmap = _bitmap
         height, width = bitmap.shape
 
-        outs = cv2.findContours(
-            (bitmap * 255).astype(np.uint8), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE
+        contours = self._find_contours(bitmap)[: self.max_candidates]
+        if len(contours) == 0:
+            return np.array([], dtype="int32"), []
+
+        points, ssides = self.get_mini_boxes_batch(contours)
+        keep = np.nonzero(ssides >= self.min_size)[0]
+        points = points[keep]
+        if self.score_mode == "fast":
+            scores = self.box_scores_fast(pred, points)
+        else:
+            scores = np.array(
+                [self.box_score_slow(pred, contours[i]) for i in keep], dtype=np.float64
+            )
+        keep = ~(self.box_thresh > scores)
+        points, scores = points[keep], scores[keep]
+
+        distances = self.unclip_distances(points, self.unclip_ratio)
+        expanded = []
+        keep = []
+        for i in range(len(points)):
+            box = self._offset(points[i], distances[i])
+            if len(box) > 1:
+                continue
+            expanded.append(np.array(box).reshape(-1, 1, 2))
+            keep.append(i)
+        if not expanded:
+            return np.array([], dtype="int32"), []
+        boxes, ssides = self.get_mini_boxes_batch(expanded)
+        keep = np.array(keep)[ssides >= self.min_size + 2]
+        boxes = boxes[ssides >= self.min_size + 2]
+        if len(boxes) == 0:
+            return np.array([], dtype="int32"), []
+
+        boxes[:, :, 0] = np.clip(
+            np.round(boxes[:, :, 0] / width * dest_width), 0, dest_width
         )
-        if len(outs) == 3:
-            img, contours, _ = outs[0], outs[1], outs[2]
-        elif len(outs) == 2:
-            contours, _ = outs[0], outs[1]
+        boxes[:, :, 1] = np.clip(
+            np.round(boxes[:, :, 1] / height * dest_height), 0, dest_height
+        )
+        return boxes.astype("int32"), scores[keep].tolist()
+
+    def boxes_from_bitmap_per_contour(self, pred, _bitmap, dest_width, dest_height):
+        """
+        Reference implementation of boxes_from_bitmap that handles one contour
+        at a time, kept to check and benchmark the batched version against.
+        """
+
+        bitmap = _bitmap
+        height, width = bitmap.shape
+
+        contours = self._find_contours(bitmap)
 
         num_contours = min(len(contours), self.max_candidates)
 
@@ -157,14 +205,49 @@ class DBPostProcess(object):
             scores.append(score)
         return np.array(boxes, dtype="int32"), scores
 
+    def _find_contours(self, bitmap):
+        outs = cv2.findContours(
+            (bitmap * 255).astype(np.uint8), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE
+        )
+        if len(outs) == 3:
+            img, contours, _ = outs[0], outs[1], outs[2]
+        elif len(outs) == 2:
+            contours, _ = outs[0], outs[1]
+        return contours
+
     def unclip(self, box, unclip_ratio):
         poly = Polygon(box)
         distance = poly.area * unclip_ratio / poly.length
+        return self._offset(box, distance)
+
+    def _offset(self, box, distance):
         offset = pyclipper.PyclipperOffset()
         offset.AddPath(box, pyclipper.JT_ROUND, pyclipper.ET_CLOSEDPOLYGON)
         expanded = offset.Execute(distance)
         return expanded
 
+    @staticmethod
+    def unclip_distances(boxes, unclip_ratio):
+        """
+        Unclip distance (area * unclip_ratio / perimeter) of N quads (N, 4, 2)
+        at once. Area and perimeter are accumulated in the same order as
+        GEOS does for Polygon.area and Polygon.length, so the distances are
+        the ones unclip computes.
+        """
+        pts = boxes.astype(np.float64)
+        x, y = pts[:, :, 0], pts[:, :, 1]
+        # closed ring p0, p1, p2, p3, p0 with the shoelace terms anchored at p0
+        area = np.zeros(len(pts), dtype=np.float64)
+        for i in range(1, 4):
+            area += (x[:, i] - x[:, 0]) * (y[:, i - 1] - y[:, (i + 1) % 4])
+        area = np.abs(area / 2.0)
+        length = np.zeros(len(pts), dtype=np.float64)
+        for i in range(4):
+            dx = x[:, (i + 1) % 4] - x[:, i]
+            dy = y[:, (i + 1) % 4] - y[:, i]
+            length += np.sqrt(dx * dx + dy * dy)
+        return area * unclip_ratio / length
+
     def get_mini_boxes(self, contour):
         bounding_box = cv2.minAreaRect(contour)
         points = sorted(list(cv2.boxPoints(bounding_box)), key=lambda x: x[0])
@@ -186,6 +269,30 @@ class DBPostProcess(object):
         box = [points[index_1], points[index_2], points[index_3], points[index_4]]
         return box, min(bounding_box[1])
 
+    def get_mini_boxes_batch(self, contours):
+        """
+        get_mini_boxes for a list of contours: returns the ordered points as
+        a (N, 4, 2) float32 array and the short sides as a (N,) array.
+        """
+        rects = [cv2.minAreaRect(contour) for contour in contours]
+        points = np.array(
+            [cv2.boxPoints(rect) for rect in rects], dtype=np.float32
+        ).reshape(-1, 4, 2)
+        ssides = np.array([min(rect[1]) for rect in rects], dtype=np.float64)
+
+        # stable sort by x, then the same top/bottom choice as get_mini_boxes
+        order = np.argsort(points[:, :, 0], axis=1, kind="stable")
+        points = np.take_along_axis(points, order[:, :, None], axis=1)
+        left_down = points[:, 1, 1] > points[:, 0, 1]
+        right_down = points[:, 3, 1] > points[:, 2, 1]
+        index = np.empty((len(points), 4), dtype=np.int64)
+        index[:, 0] = np.where(left_down, 0, 1)
+        index[:, 3] = np.where(left_down, 1, 0)
+        index[:, 1] = np.where(right_down, 2, 3)
+        index[:, 2] = np.where(right_down, 3, 2)
+        points = np.take_along_axis(points, index[:, :, None], axis=1)
+        return points, ssides
+
     def box_score_fast(self, bitmap, _box):
         """
         box_score_fast: use bbox mean score as the mean score
@@ -203,6 +310,71 @@ class DBPostProcess(object):
         cv2.fillPoly(mask, box.reshape(1, -1, 2).astype("int32"), 1)
         return cv2.mean(bitmap[ymin : ymax + 1, xmin : xmax + 1], mask)[0]
 
+    def box_scores_fast(self, bitmap, boxes):
+        """
+        box_score_fast for N boxes (N, 4, 2). Boxes whose rasterized polygon
+        is an axis-aligned rectangle, the common case for horizontal text, are
+        scored from a summed-area table of the map; the others are filled
+        one by one exactly like box_score_fast.
+        """
+        h, w = bitmap.shape[:2]
+        scores = np.zeros(len(boxes), dtype=np.float64)
+        if len(boxes) == 0:
+            return scores
+        xmin = np.clip(np.floor(boxes[:, :, 0].min(axis=1)).astype("int32"), 0, w - 1)
+        xmax = np.clip(np.ceil(boxes[:, :, 0].max(axis=1)).astype("int32"), 0, w - 1)
+        ymin = np.clip(np.floor(boxes[:, :, 1].min(axis=1)).astype("int32"), 0, h - 1)
+        ymax = np.clip(np.ceil(boxes[:, :, 1].max(axis=1)).astype("int32"), 0, h - 1)
+
+        local = boxes.copy()
+        local[:, :, 0] -= xmin[:, None]
+        local[:, :, 1] -= ymin[:, None]
+        local = local.astype("int32")
+
+        # edges alternate horizontal / vertical -> fillPoly fills a rectangle
+        edges = np.roll(local, -1, axis=1) - local
+        horizontal = edges[:, :, 1] == 0
+        vertical = edges[:, :, 0] == 0
+        axis_aligned = (
+            horizontal[:, 0::2].all(axis=1) & vertical[:, 1::2].all(axis=1)
+        ) | (vertical[:, 0::2].all(axis=1) & horizontal[:, 1::2].all(axis=1))
+
+        rect_ids = np.nonzero(axis_aligned)[0]
+        if len(rect_ids) > 0:
+            integral = cv2.integral(
+                np.ascontiguousarray(bitmap, dtype=np.float32), sdepth=cv2.CV_64F
+            )
+            rect = local[rect_ids]
+            # fillPoly covers both boundary rows/columns; clip to the ROI
+            x0 = xmin[rect_ids] + np.maximum(rect[:, :, 0].min(axis=1), 0)
+            x1 = xmin[rect_ids] + np.minimum(
+                rect[:, :, 0].max(axis=1), xmax[rect_ids] - xmin[rect_ids]
+            )
+            y0 = ymin[rect_ids] + np.maximum(rect[:, :, 1].min(axis=1), 0)
+            y1 = ymin[rect_ids] + np.minimum(
+                rect[:, :, 1].max(axis=1), ymax[rect_ids] - ymin[rect_ids]
+            )
+            valid = (x1 >= x0) & (y1 >= y0)
+            x0, x1, y0, y1 = x0[valid], x1[valid], y0[valid], y1[valid]
+            sums = (
+                integral[y1 + 1, x1 + 1]
+                - integral[y0, x1 + 1]
+                - integral[y1 + 1, x0]
+                + integral[y0, x0]
+            )
+            counts = (x1 - x0 + 1).astype(np.float64) * (y1 - y0 + 1)
+            scores[rect_ids[valid]] = sums / counts
+
+        for i in np.nonzero(~axis_aligned)[0]:
+            mask = np.zeros(
+                (ymax[i] - ymin[i] + 1, xmax[i] - xmin[i] + 1), dtype=np.uint8
+            )
+            cv2.fillPoly(mask, local[i].reshape(1, -1, 2), 1)
+            scores[i] = cv2.mean(
+                bitmap[ymin[i] : ymax[i] + 1, xmin[i] : xmax[i] + 1], mask
+            )[0]
+        return scores
+
     def box_score_slow(self, bitmap, contour):
         """
         box_score_slow: use polyon mean score as the mean score
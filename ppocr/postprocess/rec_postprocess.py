@@ -18,6 +18,15 @@ import paddle
 from paddle.nn import functional as F
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .ctc_beam_search import (
+    CharNgramLM,
+    CombinedPrior,
+    LexiconTrie,
+    ctc_prefix_beam_search,
+    prune_candidates,
+)
 
 
 class BaseRecLabelDecode(object):
@@ -142,7 +151,20 @@ class BaseRecLabelDecode(object):
         is_remove_duplicate=False,
         return_word_box=False,
     ):
-        """convert text-index into text-label."""
+        """
+        convert text-index into text-label.
+
+        A 2-D ndarray text_index (with a text_prob of the same shape, or None)
+        goes through decode_batch, for every decoder that inherits this method
+        (CTCLabelDecode, DistillationCTCLabelDecode, CTCBeamSearchLabelDecode
+        and any subclass that only customizes character, reverse or
+        get_ignored_tokens); lists of rows take the per-sample loop. Decoders
+        with their own decode, such as Attn, SRN or SAR, are not affected.
+        """
+        if self._can_decode_batch(text_index, text_prob):
+            return self.decode_batch(
+                text_index, text_prob, is_remove_duplicate, return_word_box
+            )
         result_list = []
         ignored_tokens = self.get_ignored_tokens()
         batch_size = len(text_index)
@@ -188,6 +210,107 @@ class BaseRecLabelDecode(object):
                 result_list.append((text, np.mean(conf_list).tolist()))
         return result_list
 
+    @staticmethod
+    def _can_decode_batch(text_index, text_prob):
+        if not isinstance(text_index, np.ndarray) or text_index.ndim != 2:
+            return False
+        if text_prob is None:
+            return True
+        return isinstance(text_prob, np.ndarray) and text_prob.shape == text_index.shape
+
+    def _char_code_table(self):
+        """
+        Code point of every dict entry (-1 for entries that are not a single
+        character, e.g. 'blank'), cached as long as self.character is unchanged.
+        """
+        cache = getattr(self, "_char_code_cache", None)
+        if (
+            cache is None
+            or cache[0] is not self.character
+            or cache[1] != len(self.character)
+        ):
+            codes = np.array(
+                [
+                    ord(c) if isinstance(c, str) and len(c) == 1 else -1
+                    for c in self.character
+                ],
+                dtype=np.int64,
+            )
+            cache = (self.character, len(self.character), codes)
+            self._char_code_cache = cache
+        return cache[2]
+
+    def _gather_texts(self, text_index, selection, lengths):
+        selected = text_index[selection]
+        ends = np.cumsum(lengths).tolist()
+        starts = [0] + ends[:-1]
+        codes = self._char_code_table()
+        if selected.size == 0:
+            return [""] * len(lengths)
+        if selected.min() >= 0 and selected.max() < len(codes):
+            code_points = codes[selected]
+            if code_points.min() >= 0:
+                try:
+                    # one decode for the whole batch, then slice per sample
+                    joined = code_points.astype("<u4").tobytes().decode("utf-32-le")
+                    return [joined[b:e] for b, e in zip(starts, ends)]
+                except UnicodeDecodeError:
+                    pass
+        selected = selected.tolist()
+        return [
+            "".join(self.character[text_id] for text_id in selected[b:e])
+            for b, e in zip(starts, ends)
+        ]
+
+    def decode_batch(
+        self,
+        text_index,
+        text_prob=None,
+        is_remove_duplicate=False,
+        return_word_box=False,
+    ):
+        """
+        decode for a (batch, time) index array: duplicate and ignored-token
+        removal, confidences and string assembly are done for the whole batch
+        at once. Returns the same results as the per-sample loop.
+        """
+        batch_size, seq_len = text_index.shape
+        selection = np.ones(text_index.shape, dtype=bool)
+        if is_remove_duplicate:
+            selection[:, 1:] = text_index[:, 1:] != text_index[:, :-1]
+        for ignored_token in self.get_ignored_tokens():
+            selection &= text_index != ignored_token
+        lengths = selection.sum(axis=1)
+        texts = self._gather_texts(text_index, selection, lengths)
+
+        if text_prob is not None:
+            sums = np.where(selection, text_prob, 0).sum(axis=1, dtype=np.float64)
+            confs = sums / np.maximum(lengths, 1)
+            # np.mean keeps the dtype of the probabilities
+            confs = np.where(lengths > 0, confs, 0).astype(text_prob.dtype).tolist()
+        else:
+            confs = [1.0 if seq_len > 0 else 0.0] * batch_size
+
+        result_list = []
+        for batch_idx in range(batch_size):
+            text = texts[batch_idx]
+            if self.reverse:  # for arabic rec
+                text = self.pred_reverse(text)
+            if return_word_box:
+                word_list, word_col_list, state_list = self.get_word_info(
+                    text, selection[batch_idx]
+                )
+                result_list.append(
+                    (
+                        text,
+                        confs[batch_idx],
+                        [seq_len, word_list, word_col_list, state_list],
+                    )
+                )
+            else:
+                result_list.append((text, confs[batch_idx]))
+        return result_list
+
     def get_ignored_tokens(self):
         return [0]  # for ctc blank
 
@@ -203,8 +326,9 @@ class CTCLabelDecode(BaseRecLabelDecode):
             preds = preds[-1]
         if isinstance(preds, paddle.Tensor):
             preds = preds.numpy()
+        # one pass over (B, T, C): the max is gathered at the argmax
         preds_idx = preds.argmax(axis=2)
-        preds_prob = preds.max(axis=2)
+        preds_prob = np.take_along_axis(preds, preds_idx[..., None], axis=2)[..., 0]
         text = self.decode(
             preds_idx,
             preds_prob,
@@ -263,6 +387,153 @@ class DistillationCTCLabelDecode(CTCLabelDecode):
         return output
 
 
+class CTCBeamSearchLabelDecode(CTCLabelDecode):
+    """
+    CTC prefix beam search with an optional lexicon and character n-gram prior
+
+    Args:
+        beam_width (int): prefixes kept per frame.
+        beam_topk (int): candidate characters per frame, the others are pruned.
+        min_char_prob (float): candidates less likely than this are pruned too.
+        blank_skip_thresh (float): frames whose blank probability reaches this
+            value only extend the beams with a blank.
+        lexicon_path (str): file with one allowed word per line, the output is
+            constrained to these words joined by spaces. Samples that cannot be
+            matched fall back to greedy decoding.
+        lm_corpus_path (str): text file (one sample per line) to estimate the
+            character n-gram model from.
+        lm_order (int): order of the n-gram model.
+        lm_weight (float): weight of the n-gram log probability.
+        insertion_bonus (float): log score added per emitted character.
+        num_workers (int): threads decoding the samples of a batch, 0 decodes
+            in the calling thread.
+    """
+
+    def __init__(
+        self,
+        character_dict_path=None,
+        use_space_char=False,
+        beam_width=10,
+        beam_topk=10,
+        min_char_prob=1e-3,
+        blank_skip_thresh=0.999,
+        lexicon_path=None,
+        lm_corpus_path=None,
+        lm_order=3,
+        lm_weight=0.5,
+        insertion_bonus=0.0,
+        num_workers=0,
+        **kwargs,
+    ):
+        super(CTCBeamSearchLabelDecode, self).__init__(
+            character_dict_path, use_space_char
+        )
+        self.beam_width = max(1, int(beam_width))
+        self.beam_topk = max(1, int(beam_topk))
+        self.min_char_prob = min_char_prob
+        self.blank_skip_thresh = blank_skip_thresh
+        self.insertion_bonus = insertion_bonus
+        priors, weights = [], []
+        if lexicon_path:
+            priors.append(LexiconTrie.from_file(lexicon_path))
+            weights.append(1.0)
+        if lm_corpus_path:
+            priors.append(CharNgramLM.from_corpus(lm_corpus_path, lm_order))
+            weights.append(lm_weight)
+        self.prior = CombinedPrior(priors, weights) if priors else None
+        self.num_workers = num_workers
+        self._executor = None
+
+    def _map(self, func, items):
+        if self.num_workers <= 0 or len(items) <= 1:
+            return [func(item) for item in items]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.num_workers, thread_name_prefix="ctc_beam_search"
+            )
+        return list(self._executor.map(func, items))
+
+    def beam_search(self, preds):
+        """decode (batch, time, classes) probabilities to (ids, confs, cols)"""
+        cand_ids, cand_probs, blank_only = prune_candidates(
+            preds,
+            self.beam_topk,
+            blank=0,
+            blank_skip_thresh=self.blank_skip_thresh,
+            min_prob=self.min_char_prob,
+        )
+        id_to_char = self.character.__getitem__
+
+        def search(batch_idx):
+            res = ctc_prefix_beam_search(
+                preds[batch_idx],
+                beam_width=self.beam_width,
+                blank=0,
+                candidates=(
+                    cand_ids[batch_idx],
+                    cand_probs[batch_idx],
+                    blank_only[batch_idx],
+                ),
+                prior=self.prior,
+                id_to_char=id_to_char,
+                insertion_bonus=self.insertion_bonus,
+            )
+            if res is None:
+                # nothing satisfied the lexicon, keep the best path
+                idx = preds[batch_idx].argmax(axis=1)
+                sel = np.ones(len(idx), dtype=bool)
+                sel[1:] = idx[1:] != idx[:-1]
+                sel &= idx != 0
+                cols = np.where(sel)[0]
+                res = (
+                    idx[cols].tolist(),
+                    preds[batch_idx][cols, idx[cols]].tolist(),
+                    cols.tolist(),
+                )
+            return res
+
+        return self._map(search, list(range(len(preds))))
+
+    def __call__(self, preds, label=None, return_word_box=False, *args, **kwargs):
+        if isinstance(preds, tuple) or isinstance(preds, list):
+            preds = preds[-1]
+        if isinstance(preds, paddle.Tensor):
+            preds = preds.numpy()
+        seq_len = preds.shape[1]
+        text = []
+        for rec_idx, (ids, confs, cols) in enumerate(self.beam_search(preds)):
+            chars = "".join(self.character[i] for i in ids)
+            if self.reverse:  # for arabic rec
+                chars = self.pred_reverse(chars)
+            score = float(np.mean(confs)) if confs else 0.0
+            if return_word_box:
+                selection = np.zeros(seq_len, dtype=bool)
+                selection[cols] = True
+                word_list, word_col_list, state_list = self.get_word_info(
+                    chars, selection
+                )
+                wh_ratio = kwargs["wh_ratio_list"][rec_idx]
+                max_wh_ratio = kwargs["max_wh_ratio"]
+                text.append(
+                    (
+                        chars,
+                        score,
+                        [
+                            seq_len * (wh_ratio / max_wh_ratio),
+                            word_list,
+                            word_col_list,
+                            state_list,
+                        ],
+                    )
+                )
+            else:
+                text.append((chars, score))
+        if label is None:
+            return text
+        label = self.decode(label)
+        return text, label
+
+
 class AttnLabelDecode(BaseRecLabelDecode):
     """Convert between text-label and text-index"""
 
@@ -16,12 +16,18 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import atexit
+import copy
 import errno
 import os
 import pickle
 import json
+import queue
+import shutil
+import threading
 from packaging import version
 
+import numpy as np
 import paddle
 
 from ppocr.utils.logging import get_logger
@@ -211,6 +217,103 @@ def load_pretrained_params(model, path):
     return is_float16
 
 
+def _snapshot_state(obj):
+    """
+    Host copy of a (nested) state dict. Tensors keep their names, so
+    paddle.save writes the same file as for the live state dict.
+    """
+    if isinstance(obj, paddle.Tensor):
+        return paddle.Tensor(
+            np.array(obj.cpu()), paddle.CPUPlace(), obj.persistable, False, obj.name
+        )
+    if isinstance(obj, dict):
+        return obj.__class__((k, _snapshot_state(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return obj.__class__(_snapshot_state(v) for v in obj)
+    return copy.deepcopy(obj)
+
+
+def _atomic_write(path, write):
+    # readers never see a partially written file
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _link_or_copy(src, dst):
+    def write(tmp_path):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(src, tmp_path)
+        except OSError:
+            # no hard links across devices or on some network filesystems
+            shutil.copyfile(src, tmp_path)
+
+    _atomic_write(dst, write)
+
+
+class CheckpointWriter(object):
+    """
+    Writes checkpoints on a background thread.
+
+    save_model(..., writer=writer) snapshots the state dicts to host memory
+    on the calling thread and queues the writes. Files are written under a
+    temporary name and renamed into place, and best_model is hard-linked to
+    best_accuracy rather than written twice. At most max_pending saves are in
+    flight: a save arriving when that many are queued or writing blocks until
+    one is done. Errors of the writer are raised by the next submit, wait or
+    close.
+    """
+
+    def __init__(self, max_pending=1):
+        self.max_pending = max(1, int(max_pending))
+        self._slots = threading.Semaphore(self.max_pending)
+        self._jobs = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="checkpoint-writer", daemon=True
+        )
+        self._thread.start()
+        # a daemon thread would be killed at exit, finish the last save first
+        atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    return
+                job()
+            except BaseException as e:
+                self._error = e
+            finally:
+                if job is not None:
+                    self._slots.release()
+                self._jobs.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, job):
+        self._raise_error()
+        self._slots.acquire()
+        self._jobs.put(job)
+
+    def wait(self):
+        """Block until all submitted saves are written"""
+        self._jobs.join()
+        self._raise_error()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._jobs.put(None)
+            self._thread.join()
+        self._raise_error()
+
+
 def save_model(
     model,
     optimizer,
@@ -219,27 +322,49 @@ def save_model(
     config,
     is_best=False,
     prefix="ppocr",
+    writer=None,
     **kwargs,
 ):
     """
-    save model to the target path
+    save model to the target path, on the thread of writer if given
     """
     _mkdir_if_not_exist(model_path, logger)
     model_prefix = os.path.join(model_path, prefix)
 
+    best_model_path = None
     if prefix == "best_accuracy":
         best_model_path = os.path.join(model_path, "best_model")
         _mkdir_if_not_exist(best_model_path, logger)
 
+    is_nlp_model = config["Architecture"]["model_type"] == "kie" and config[
+        "Architecture"
+    ]["algorithm"] not in ["SDMGR"]
+
+    if writer is not None and not is_nlp_model:
+        params = _snapshot_state(model.state_dict())
+        opt_state = _snapshot_state(optimizer.state_dict())
+        kwargs = copy.deepcopy(kwargs)
+
+        def write():
+            for state, suffix in ((opt_state, ".pdopt"), (params, ".pdparams")):
+                path = model_prefix + suffix
+                _atomic_write(path, lambda tmp_path: paddle.save(state, tmp_path))
+                if best_model_path is not None:
+                    best_path = os.path.join(best_model_path, "model" + suffix)
+                    _link_or_copy(path, best_path)
+            _save_model_states(
+                model_path, model_prefix, prefix, logger, config, is_best, kwargs
+            )
+
+        writer.submit(write)
+        return
+
     paddle.save(optimizer.state_dict(), model_prefix + ".pdopt")
     if prefix == "best_accuracy":
         paddle.save(
             optimizer.state_dict(), os.path.join(best_model_path, "model.pdopt")
         )
 
-    is_nlp_model = config["Architecture"]["model_type"] == "kie" and config[
-        "Architecture"
-    ]["algorithm"] not in ["SDMGR"]
     if is_nlp_model is not True:
         paddle.save(model.state_dict(), model_prefix + ".pdparams")
         metric_prefix = model_prefix
@@ -262,18 +387,36 @@ def save_model(
         if prefix == "best_accuracy":
             arch.backbone.model.save_pretrained(best_model_path)
 
+    _save_model_states(
+        model_path, metric_prefix, prefix, logger, config, is_best, kwargs
+    )
+
+
+def _save_model_states(
+    model_path, metric_prefix, prefix, logger, config, is_best, kwargs
+):
+    def dump(path, mode, save):
+        def write(tmp_path):
+            with open(tmp_path, mode) as f:
+                save(f)
+
+        _atomic_write(path, write)
+
     save_model_info = kwargs.pop("save_model_info", False)
     if save_model_info:
-        with open(os.path.join(model_path, f"{prefix}.info.json"), "w") as f:
-            json.dump(kwargs, f)
+        dump(
+            os.path.join(model_path, f"{prefix}.info.json"),
+            "w",
+            lambda f: json.dump(kwargs, f),
+        )
         logger.info("Already save model info in {}".format(model_path))
         if prefix != "latest":
             done_flag = kwargs.pop("done_flag", False)
             update_train_results(config, prefix, save_model_info, done_flag=done_flag)
 
     # save metric and config
-    with open(metric_prefix + ".states", "wb") as f:
-        pickle.dump(kwargs, f, protocol=2)
+    dump(metric_prefix + ".states", "wb", lambda f: pickle.dump(kwargs, f, protocol=2))
+    model_prefix = os.path.join(model_path, prefix)
     if is_best:
         logger.info("save best model is to {}".format(model_prefix))
     else:
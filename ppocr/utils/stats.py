@@ -13,10 +13,12 @@
 # limitations under the License.
 
 import collections
+from concurrent.futures import Future
 import numpy as np
 import datetime
+import paddle
 
-__all__ = ["TrainingStats", "Time"]
+__all__ = ["TrainingStats", "DeviceTrainingStats", "Time"]
 
 
 class SmoothedValue(object):
@@ -68,3 +70,64 @@ class TrainingStats(object):
             strs.append("{}: {:x<6f}".format(k, v))
         strs = ", ".join(strs)
         return strs
+
+
+class DeviceTrainingStats(TrainingStats):
+    """
+    TrainingStats that keeps the stats of each step as they are given: tensors
+    stay on their device and futures of stats dicts stay pending, so a step
+    does not wait for the device. flush reads all the pending tensors back
+    with one copy and feeds the windows in update order, get and log flush
+    first, so they give the same values as TrainingStats.
+    """
+
+    def __init__(self, window_size, stats_keys):
+        super(DeviceTrainingStats, self).__init__(window_size, stats_keys)
+        self.pending = []
+
+    def update(self, stats, step=None):
+        if not isinstance(stats, Future):
+            stats = {
+                k: v.detach() if isinstance(v, paddle.Tensor) else v
+                for k, v in stats.items()
+            }
+        self.pending.append((step, stats))
+
+    def flush(self, history=False):
+        """
+        Feeds the pending stats to the windows. With history, returns the
+        (step, stats) pairs get would have given after the last update of each
+        step passed to update.
+        """
+        pending, self.pending = self.pending, []
+        steps = [step for step, _ in pending]
+        pending = [
+            stats.result() if isinstance(stats, Future) else stats
+            for _, stats in pending
+        ]
+        tensors = [
+            v
+            for stats in pending
+            for v in stats.values()
+            if isinstance(v, paddle.Tensor)
+        ]
+        if tensors:
+            # a tensor stat is the mean of its values, as v.numpy().mean()
+            means = paddle.stack([t.astype("float32").mean() for t in tensors])
+            means = iter(means.tolist())
+        results = []
+        for i, stats in enumerate(pending):
+            super(DeviceTrainingStats, self).update(
+                {
+                    k: next(means) if isinstance(v, paddle.Tensor) else v
+                    for k, v in stats.items()
+                }
+            )
+            step = steps[i]
+            if history and step is not None and steps[i + 1 : i + 2] != [step]:
+                results.append((step, super(DeviceTrainingStats, self).get()))
+        return results
+
+    def get(self, extras=None):
+        self.flush()
+        return super(DeviceTrainingStats, self).get(extras)
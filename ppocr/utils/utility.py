@@ -12,8 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import itertools
 import logging
 import os
+import threading
 import cv2
 import random
 import numpy as np
@@ -21,6 +24,7 @@ import paddle
 import importlib.util
 import sys
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 
 def print_dict(d, logger, delimiter=0):
@@ -129,29 +133,122 @@ def check_and_read(img_path):
         imgvalue = frame[:, :, ::-1]
         return imgvalue, True, False
     elif os.path.basename(img_path)[-3:].lower() == "pdf":
-        from paddle.utils import try_import
-
-        fitz = try_import("fitz")
-        from PIL import Image
-
-        imgs = []
-        with fitz.open(img_path) as pdf:
-            for pg in range(0, pdf.page_count):
-                page = pdf[pg]
-                mat = fitz.Matrix(2, 2)
-                pm = page.get_pixmap(matrix=mat, alpha=False)
-
-                # if width or height > 2000 pixels, don't enlarge the image
-                if pm.width > 2000 or pm.height > 2000:
-                    pm = page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
-
-                img = Image.frombytes("RGB", [pm.width, pm.height], pm.samples)
-                img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-                imgs.append(img)
-            return imgs, False, True
+        imgs = list(iter_pdf_pages(img_path))
+        return imgs, False, True
     return None, False, False
 
 
+def get_pdf_render_zoom(page, zoom=2, max_side=2000):
+    """
+    Pick the render zoom from the page geometry: `zoom`, unless the rendered
+    bitmap would be wider or higher than `max_side` pixels, then 1 (pages are
+    not enlarged). Same rule as rendering at 2x and re-rendering at 1x when the
+    result is too large, without rasterizing the page twice.
+    """
+    from paddle.utils import try_import
+
+    fitz = try_import("fitz")
+    irect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    if irect.width > max_side or irect.height > max_side:
+        return 1
+    return zoom
+
+
+def render_pdf_page(page, zoom=2, max_side=2000):
+    """Render a fitz page to a BGR image"""
+    from paddle.utils import try_import
+
+    fitz = try_import("fitz")
+    zoom = get_pdf_render_zoom(page, zoom, max_side)
+    pm = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    img = np.frombuffer(pm.samples, dtype=np.uint8).reshape(pm.height, pm.width, pm.n)
+    if pm.n == 1:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+
+def open_pdf(pdf):
+    """Open a pdf given by its path or by its bytes"""
+    from paddle.utils import try_import
+
+    fitz = try_import("fitz")
+    if isinstance(pdf, (bytes, bytearray)):
+        return fitz.open(stream=pdf, filetype="pdf")
+    return fitz.open(pdf)
+
+
+def get_pdf_page_count(pdf_path):
+    with open_pdf(pdf_path) as pdf:
+        return pdf.page_count
+
+
+def iter_pdf_pages(
+    pdf_path,
+    page_num=0,
+    num_workers=1,
+    prefetch=4,
+    page_indices=None,
+    zoom=2,
+    max_side=2000,
+):
+    """
+    Yield the pages of a pdf as BGR images, in page order.
+
+    Pages are rendered by a pool of `num_workers` threads, each with its own
+    document handle, and at most `prefetch` rendered pages are kept ahead of
+    the consumer. Rasterizing the next pages thus overlaps with whatever the
+    consumer (e.g. OCR) does with the current one, while memory stays bounded.
+    MuPDF keeps the GIL while it renders, so that overlap is the whole gain:
+    more than one thread does not render faster. `num_workers=0` renders in
+    the calling thread. `page_num > 0` limits the
+    output to the first `page_num` pages, `page_indices` renders these pages
+    instead, in that order. `pdf_path` may also be the bytes of the pdf.
+    """
+    if page_indices is None:
+        page_count = get_pdf_page_count(pdf_path)
+        if 0 < page_num < page_count:
+            page_count = page_num
+        page_indices = range(page_count)
+
+    if num_workers <= 0:
+        with open_pdf(pdf_path) as pdf:
+            for pg in page_indices:
+                yield render_pdf_page(pdf[pg], zoom, max_side)
+        return
+
+    local = threading.local()
+    opened = []
+    lock = threading.Lock()
+
+    def _render(pg):
+        pdf = getattr(local, "pdf", None)
+        if pdf is None:
+            # fitz documents must not be shared between threads
+            pdf = local.pdf = open_pdf(pdf_path)
+            with lock:
+                opened.append(pdf)
+        return render_pdf_page(pdf[pg], zoom, max_side)
+
+    pending = collections.deque()
+    pages = iter(page_indices)
+    executor = ThreadPoolExecutor(max_workers=num_workers)
+    try:
+        for pg in itertools.islice(pages, max(1, prefetch)):
+            pending.append(executor.submit(_render, pg))
+        while pending:
+            img = pending.popleft().result()
+            pg = next(pages, None)
+            if pg is not None:
+                pending.append(executor.submit(_render, pg))
+            yield img
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        for pdf in opened:
+            pdf.close()
+
+
 def load_vqa_bio_label_maps(label_map_path):
     with open(label_map_path, "r", encoding="utf-8") as fin:
         lines = fin.readlines()
@@ -34,6 +34,8 @@ logger = get_logger()
 def parse_args():
     parser = init_args()
     parser.add_argument("--gt_path", type=str)
+    # parsed ground truth tables kept between runs, default under output
+    parser.add_argument("--teds_cache_dir", type=str, default=None)
     return parser.parse_args()
 
 
@@ -97,9 +99,15 @@ def main(gt_path, img_root, args):
         gt_htmls.append(gt_html)
 
     # compute teds
-    teds = TEDS(n_jobs=16)
-    scores = teds.batch_evaluate_html(gt_htmls, pred_htmls)
+    teds_cache_dir = args.teds_cache_dir or os.path.join(args.output, "teds_cache")
+    teds = TEDS(n_jobs=16, cache_dir=teds_cache_dir)
+    scores = teds.batch_evaluate_html(pred_htmls, gt_htmls)
     logger.info("teds: {}".format(sum(scores) / len(scores)))
+    logger.info(
+        "teds evaluated {} tables in {:.2f}s, {:.2f} tables/s".format(
+            teds.stats["tables"], teds.stats["elapse"], teds.stats["tables_per_sec"]
+        )
+    )
 
 
 if __name__ == "__main__":
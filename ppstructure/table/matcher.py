@@ -55,6 +55,74 @@ def compute_iou(rec1, rec2):
         return (intersect / (sum_area - intersect)) * 1.0
 
 
+# above this many ocr box x cell pairs, cells overlapping each ocr box are
+# looked up in a grid instead of comparing against every cell
+GRID_MIN_PAIRS = 1 << 22
+
+
+def _cell_rects(pred_bboxes):
+    """(x0, y0, x1, y1) of the cells, 8-point cells are reduced to their bounds"""
+    if isinstance(pred_bboxes, np.ndarray) and pred_bboxes.ndim == 2:
+        if pred_bboxes.shape[1] == 4:
+            return pred_bboxes
+        if pred_bboxes.shape[1] == 8:
+            return np.stack(
+                [
+                    pred_bboxes[:, 0::2].min(axis=1),
+                    pred_bboxes[:, 1::2].min(axis=1),
+                    pred_bboxes[:, 0::2].max(axis=1),
+                    pred_bboxes[:, 1::2].max(axis=1),
+                ],
+                axis=1,
+            )
+    rects = [
+        (
+            [
+                np.min(box[0::2]),
+                np.min(box[1::2]),
+                np.max(box[0::2]),
+                np.max(box[1::2]),
+            ]
+            if len(box) == 8
+            else box
+        )
+        for box in pred_bboxes
+    ]
+    return np.asarray(rects).reshape(-1, 4)
+
+
+def match_costs(boxes, rects):
+    """
+    (1 - IoU, L1 distance) of boxes against rects, broadcast over the leading
+    axes. Same operations, in the same order and dtype, as compute_iou and
+    distance, so the values are bit-identical to theirs.
+    """
+    b0, b1, b2, b3 = (boxes[..., k] for k in range(4))
+    r0, r1, r2, r3 = (rects[..., k] for k in range(4))
+    d0 = np.abs(r0 - b0)
+    d1 = np.abs(r1 - b1)
+    d2 = np.abs(r2 - b2)
+    d3 = np.abs(r3 - b3)
+    dist = d0 + d1 + d2 + d3 + np.minimum(d0 + d1, d2 + d3)
+
+    sum_area = (b2 - b0) * (b3 - b1) + (r2 - r0) * (r3 - r1)
+    left = np.maximum(b1, r1)
+    right = np.minimum(b3, r3)
+    top = np.maximum(b0, r0)
+    bottom = np.minimum(b2, r2)
+    overlap = (left < right) & (top < bottom)
+    intersect = (right - left) * (bottom - top)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iou = np.where(overlap, intersect / (sum_area - intersect) * 1.0, 0.0)
+    return 1.0 - iou, dist
+
+
+def _lex_argmin(cost, dist):
+    # first index of the smallest (cost, dist) along the last axis
+    best = cost == cost.min(axis=-1, keepdims=True)
+    return np.argmin(np.where(best, dist, np.inf), axis=-1)
+
+
 class TableMatch:
     def __init__(self, filter_ocr_result=False, use_master=False):
         self.filter_ocr_result = filter_ocr_result
@@ -76,31 +144,61 @@ class TableMatch:
         return pred_html
 
     def match_result(self, dt_boxes, pred_bboxes):
+        """
+        Cell index -> indexes of the ocr boxes matched to it. Each ocr box
+        goes to the cell of highest IoU, then of smallest L1 distance, the
+        first such cell on ties.
+        """
         matched = {}
-        for i, gt_box in enumerate(dt_boxes):
-            distances = []
-            for j, pred_box in enumerate(pred_bboxes):
-                if len(pred_box) == 8:
-                    pred_box = [
-                        np.min(pred_box[0::2]),
-                        np.min(pred_box[1::2]),
-                        np.max(pred_box[0::2]),
-                        np.max(pred_box[1::2]),
-                    ]
-                distances.append(
-                    (distance(gt_box, pred_box), 1.0 - compute_iou(gt_box, pred_box))
-                )  # compute iou and l1 distance
-            sorted_distances = distances.copy()
-            # select det box by iou and l1 distance
-            sorted_distances = sorted(
-                sorted_distances, key=lambda item: (item[1], item[0])
+        if len(dt_boxes) == 0 or len(pred_bboxes) == 0:
+            return matched
+        boxes = np.asarray(dt_boxes).reshape(-1, 4)
+        rects = _cell_rects(pred_bboxes)
+        dtype = np.result_type(boxes, rects)
+        boxes, rects = boxes.astype(dtype), rects.astype(dtype)
+        if len(boxes) * len(rects) > GRID_MIN_PAIRS:
+            best = self._match_by_grid(boxes, rects)
+        else:
+            # rows in chunks to bound the size of the cost matrices
+            step = max(1, (1 << 16) // len(rects))
+            best = np.concatenate(
+                [
+                    _lex_argmin(*match_costs(boxes[i : i + step, None], rects))
+                    for i in range(0, len(boxes), step)
+                ]
             )
-            if distances.index(sorted_distances[0]) not in matched.keys():
-                matched[distances.index(sorted_distances[0])] = [i]
-            else:
-                matched[distances.index(sorted_distances[0])].append(i)
+        for i, j in enumerate(best.tolist()):
+            matched.setdefault(j, []).append(i)
         return matched
 
+    def _match_by_grid(self, boxes, rects):
+        # only cells overlapping a box can have IoU > 0, boxes overlapping no
+        # cell fall back to the whole row, where all costs are 1
+        cell = max(float(np.median(rects[:, 2:] - rects[:, :2])), 1.0)
+        grid = {}
+        lo = np.floor(rects[:, :2] / cell).astype(np.int64)
+        hi = np.floor(rects[:, 2:] / cell).astype(np.int64)
+        for j, (gx0, gy0, gx1, gy1) in enumerate(np.hstack([lo, hi]).tolist()):
+            for gx in range(gx0, gx1 + 1):
+                for gy in range(gy0, gy1 + 1):
+                    grid.setdefault((gx, gy), []).append(j)
+        lo = np.floor(boxes[:, :2] / cell).astype(np.int64)
+        hi = np.floor(boxes[:, 2:] / cell).astype(np.int64)
+        best = np.empty(len(boxes), dtype=np.int64)
+        for i, (gx0, gy0, gx1, gy1) in enumerate(np.hstack([lo, hi]).tolist()):
+            cands = set()
+            for gx in range(gx0, gx1 + 1):
+                for gy in range(gy0, gy1 + 1):
+                    cands.update(grid.get((gx, gy), ()))
+            cands = np.array(sorted(cands), dtype=np.int64)
+            if len(cands) > 0:
+                cost, dist = match_costs(boxes[i], rects[cands])
+                if cost.min() < 1.0:
+                    best[i] = cands[_lex_argmin(cost, dist)]
+                    continue
+            best[i] = _lex_argmin(*match_costs(boxes[i], rects))
+        return best
+
     def get_pred_html(self, pred_structures, matched_index, ocr_contents):
         end_html = []
         td_index = 0
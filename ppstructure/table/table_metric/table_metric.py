@@ -9,14 +9,24 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 # Apache 2.0 License for more details.
 
+import hashlib
+import os
+import pickle
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 from rapidfuzz.distance import Levenshtein
 from apted import APTED, Config
 from apted.helpers import Tree
-from collections import deque
-from .parallel import parallel_process
 from tqdm import tqdm
 from paddle.utils import try_import
 
+# bump when the cached ground truth trees change format
+TREE_CACHE_VERSION = 1
+# ground truth trees loaded by this process, shared by the TEDS instances
+_true_trees = {}
+
 
 class TableTree(Tree):
     def __init__(self, tag, colspan=None, rowspan=None, content=None, *children):
@@ -41,6 +51,37 @@ class TableTree(Tree):
             result += child.bracket()
         return "{{{}}}".format(result)
 
+    def signature(self):
+        """Hashable form of the tree, equal for identical trees"""
+        content = None if self.content is None else tuple(self.content)
+        return (
+            self.tag,
+            self.colspan,
+            self.rowspan,
+            content,
+            tuple(child.signature() for child in self.children),
+        )
+
+    def nodes(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+def edit_distance_lower_bound(tree_1, tree_2):
+    """
+    Lower bound of the tree edit distance from the node labels. Nodes of the
+    larger tree left unmapped cost 1 each, as do mapped nodes of different
+    tag or spans, so the distance is at least the size of the larger tree
+    minus the (tag, colspan, rowspan) labels the trees have in common.
+    """
+    labels_1 = Counter((n.tag, n.colspan, n.rowspan) for n in tree_1.nodes())
+    labels_2 = Counter((n.tag, n.colspan, n.rowspan) for n in tree_2.nodes())
+    common = sum((labels_1 & labels_2).values())
+    return max(sum(labels_1.values()), sum(labels_2.values())) - common
+
 
 class CustomConfig(Config):
     def rename(self, node1, node2):
@@ -107,16 +148,35 @@ class CustomConfig_del_block(Config):
 
 
 class TEDS(object):
-    """Tree Edit Distance basead Similarity"""
+    """Tree Edit Distance basead Similarity
+
+    Ground truth tables are parsed once and, with cache_dir, kept on disk
+    between runs. Identical trees score 1 without APTED. With min_score, a
+    pair whose score is bounded below min_score by edit_distance_lower_bound
+    gets that bound instead of its exact score, so only scores under
+    min_score change. With n_jobs > 1 the batch methods spread the pairs over
+    a process pool, largest tables first; stats holds the counts and
+    throughput of the last batch.
+    """
 
-    def __init__(self, structure_only=False, n_jobs=1, ignore_nodes=None):
+    def __init__(
+        self,
+        structure_only=False,
+        n_jobs=1,
+        ignore_nodes=None,
+        cache_dir=None,
+        min_score=None,
+    ):
         assert isinstance(n_jobs, int) and (
             n_jobs >= 1
         ), "n_jobs must be an integer greater than 1"
         self.structure_only = structure_only
         self.n_jobs = n_jobs
         self.ignore_nodes = ignore_nodes
+        self.cache_dir = cache_dir
+        self.min_score = min_score
         self.__tokens__ = []
+        self.stats = {}
 
     def tokenize(self, node):
         """Tokenizes table cells"""
@@ -157,35 +217,117 @@ class TEDS(object):
         if parent is None:
             return new_node
 
+    def _parse(self, html_str):
+        # table element of an html string, None without one
+        try_import("lxml")
+        from lxml import etree, html
+
+        parser = html.HTMLParser(remove_comments=True, encoding="utf-8")
+        root = html.fromstring(html_str, parser=parser)
+        if not root.xpath("body/table"):
+            return None
+        table = root.xpath("body/table")[0]
+        if self.ignore_nodes:
+            etree.strip_tags(table, *self.ignore_nodes)
+        return table
+
+    def _load_tree(self, html_str):
+        # (number of html elements, TableTree), None without a table
+        table = self._parse(html_str)
+        if table is None:
+            return None
+        return len(table.xpath(".//*")), self.load_html_tree(table)
+
+    def _cache_key(self, true):
+        key = repr((TREE_CACHE_VERSION, self.structure_only, self.ignore_nodes, true))
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _load_true_tree(self, true):
+        """_load_tree of a ground truth, memoized and cached in cache_dir"""
+        key = self._cache_key(true)
+        if key in _true_trees:
+            return _true_trees[key]
+        path = None
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, key[:2], key + ".pkl")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    tree = pickle.load(f)
+                _true_trees[key] = tree
+                return tree
+        tree = self._load_tree(true)
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(path, os.getpid())
+            with open(tmp_path, "wb") as f:
+                pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        _true_trees[key] = tree
+        return tree
+
+    def _evaluate(self, pred, true):
+        # score and how it was found: "empty", "identical", "bound" or "apted"
+        if (not pred) or (not true):
+            return 0.0, "empty"
+        pred = self._load_tree(pred)
+        true = self._load_true_tree(true)
+        if pred is None or true is None:
+            return 0.0, "empty"
+        n_nodes = max(pred[0], true[0])
+        tree_pred, tree_true = pred[1], true[1]
+        if tree_pred.signature() == tree_true.signature():
+            return 1.0, "identical"
+        if self.min_score is not None:
+            lower = edit_distance_lower_bound(tree_pred, tree_true)
+            bound = 1.0 - (float(lower) / n_nodes)
+            if bound < self.min_score:
+                return bound, "bound"
+        distance = APTED(tree_pred, tree_true, CustomConfig()).compute_edit_distance()
+        return 1.0 - (float(distance) / n_nodes), "apted"
+
     def evaluate(self, pred, true):
         """Computes TEDS score between the prediction and the ground truth of a
         given sample
         """
-        try_import("lxml")
-        from lxml import etree, html
+        return self._evaluate(pred, true)[0]
 
-        if (not pred) or (not true):
-            return 0.0
-        parser = html.HTMLParser(remove_comments=True, encoding="utf-8")
-        pred = html.fromstring(pred, parser=parser)
-        true = html.fromstring(true, parser=parser)
-        if pred.xpath("body/table") and true.xpath("body/table"):
-            pred = pred.xpath("body/table")[0]
-            true = true.xpath("body/table")[0]
-            if self.ignore_nodes:
-                etree.strip_tags(pred, *self.ignore_nodes)
-                etree.strip_tags(true, *self.ignore_nodes)
-            n_nodes_pred = len(pred.xpath(".//*"))
-            n_nodes_true = len(true.xpath(".//*"))
-            n_nodes = max(n_nodes_pred, n_nodes_true)
-            tree_pred = self.load_html_tree(pred)
-            tree_true = self.load_html_tree(true)
-            distance = APTED(
-                tree_pred, tree_true, CustomConfig()
-            ).compute_edit_distance()
-            return 1.0 - (float(distance) / n_nodes)
+    def _evaluate_pair(self, index, pred, true):
+        score, how = self._evaluate(pred, true)
+        return index, score, how
+
+    def _evaluate_pairs(self, pairs):
+        """Scores of (pred, true) pairs, in a process pool if n_jobs > 1"""
+        start = time.time()
+        scores = [None] * len(pairs)
+        counts = Counter()
+        if self.n_jobs == 1:
+            for index, (pred, true) in enumerate(tqdm(pairs)):
+                _, scores[index], how = self._evaluate_pair(index, pred, true)
+                counts[how] += 1
         else:
-            return 0.0
+            # APTED grows with the product of the tree sizes, submitting the
+            # largest tables first keeps them from finishing last alone
+            order = sorted(
+                range(len(pairs)),
+                key=lambda i: -(pairs[i][0] or "").count("<")
+                * (pairs[i][1] or "").count("<"),
+            )
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as pool:
+                futures = [
+                    pool.submit(self._evaluate_pair, i, pairs[i][0], pairs[i][1])
+                    for i in order
+                ]
+                for future in tqdm(as_completed(futures), total=len(futures)):
+                    index, scores[index], how = future.result()
+                    counts[how] += 1
+        elapse = time.time() - start
+        self.stats = dict(
+            counts,
+            tables=len(pairs),
+            elapse=elapse,
+            tables_per_sec=len(pairs) / elapse if elapse > 0 else 0.0,
+        )
+        return scores
 
     def batch_evaluate(self, pred_json, true_json):
         """Computes TEDS score between the prediction and the ground truth of
@@ -194,45 +336,20 @@ class TEDS(object):
         @params true_json: {'FILENAME': {'html': 'HTML CODE'}, ...}
         @output: {'FILENAME': 'TEDS SCORE', ...}
         """
-        samples = true_json.keys()
-        if self.n_jobs == 1:
-            scores = [
-                self.evaluate(pred_json.get(filename, ""), true_json[filename]["html"])
-                for filename in tqdm(samples)
-            ]
-        else:
-            inputs = [
-                {
-                    "pred": pred_json.get(filename, ""),
-                    "true": true_json[filename]["html"],
-                }
+        samples = list(true_json.keys())
+        scores = self._evaluate_pairs(
+            [
+                (pred_json.get(filename, ""), true_json[filename]["html"])
                 for filename in samples
             ]
-            scores = parallel_process(
-                inputs, self.evaluate, use_kwargs=True, n_jobs=self.n_jobs, front_num=1
-            )
-        scores = dict(zip(samples, scores))
-        return scores
+        )
+        return dict(zip(samples, scores))
 
     def batch_evaluate_html(self, pred_htmls, true_htmls):
         """Computes TEDS score between the prediction and the ground truth of
         a batch of samples
         """
-        if self.n_jobs == 1:
-            scores = [
-                self.evaluate(pred_html, true_html)
-                for (pred_html, true_html) in zip(pred_htmls, true_htmls)
-            ]
-        else:
-            inputs = [
-                {"pred": pred_html, "true": true_html}
-                for (pred_html, true_html) in zip(pred_htmls, true_htmls)
-            ]
-
-            scores = parallel_process(
-                inputs, self.evaluate, use_kwargs=True, n_jobs=self.n_jobs, front_num=1
-            )
-        return scores
+        return self._evaluate_pairs(list(zip(pred_htmls, true_htmls)))
 
 
 if __name__ == "__main__":
@@ -6,7 +6,7 @@ Simple OCR HTTP Server using PaddleOCR 3.x
 This provides a REST API for OCR functionality
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from paddleocr import PaddleOCR
 import cv2
@@ -16,16 +16,27 @@ import io
 import openai
 import json
 from PIL import Image, ImageFile
+
 # Allow loading truncated images to avoid errors on some PNGs
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 import traceback
 import fitz  # PyMuPDF for PDF processing
+
+# the server runs from the repository root, PDF rendering is shared with ppocr
+from ppocr.utils.utility import iter_pdf_pages
 import json
 import requests
 import os
+import multiprocessing
+import queue
+import threading
+import time
+from collections import Counter, deque
+
 try:
     # Optional: load variables from a .env file if python-dotenv is installed
     from dotenv import load_dotenv  # type: ignore
+
     load_dotenv()
 except Exception:
     pass
@@ -36,28 +47,72 @@ CORS(app)  # Enable CORS for all routes
 # OpenAI configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
+# Micro-batching configuration (opt-in): concurrent image requests that arrive
+# within OCR_BATCH_MAX_WAIT_MS of each other are run as one predict_iter call
+OCR_BATCH_ENABLED = os.getenv("OCR_BATCH_ENABLED", "0").lower() in ("1", "true", "yes")
+OCR_BATCH_MAX_SIZE = int(os.getenv("OCR_BATCH_MAX_SIZE", "8"))
+OCR_BATCH_MAX_WAIT_MS = float(os.getenv("OCR_BATCH_MAX_WAIT_MS", "10"))
+OCR_BATCH_MAX_QUEUE = int(os.getenv("OCR_BATCH_MAX_QUEUE", "256"))
+
+# Longest image side fed to OCR; larger uploads are downscaled first
+MAX_IMAGE_SIDE = 1280
+
+# Rendering rule of ppocr.utils.utility.render_pdf_page: 2x zoom, or 1x
+# when the 2x bitmap would exceed PDF_RENDER_MAX_SIDE pixels on either side
+PDF_RENDER_ZOOM = 2
+PDF_RENDER_MAX_SIDE = 2000
+# Render threads and how many rendered pages may wait ahead of the OCR stage;
+# MuPDF holds the GIL, so one thread already gives all the overlap there is
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "1"))
+PDF_PREFETCH = int(os.getenv("PDF_PREFETCH", "4"))
+# Reported on every PDF line next to an empty model_settings, as PaddleOCR's
+# own PDF results were
+PDF_TEXT_TYPE = "general"
+
+# Result cache configuration (opt-in): repeated uploads and repeated PDF pages
+# are answered from an in-process LRU and, if OCR_CACHE_DB is set, a SQLite file
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+OCR_CACHE_MAX_MB = float(os.getenv("OCR_CACHE_MAX_MB", "256"))
+OCR_CACHE_DB = os.getenv("OCR_CACHE_DB", "")
+OCR_CACHE_DB_MAX_MB = float(os.getenv("OCR_CACHE_DB_MAX_MB", "0"))
+
+# Worker pool configuration (opt-in): OCR_WORKERS > 0 runs OCR in that many
+# worker processes, each pinned to its own slice of cores, instead of one
+# in-process pipeline
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+OCR_WORKER_CPU_THREADS = int(os.getenv("OCR_WORKER_CPU_THREADS", "0")) or None
+
+OCR_INIT_KWARGS = dict(
+    use_doc_orientation_classify=False,
+    use_doc_unwarping=False,
+    use_textline_orientation=False,
+    lang="en",
+)
+
+# Worker processes (spawned or forked) must not build the pool themselves
+IS_MAIN_PROCESS = multiprocessing.parent_process() is None
+
 
 # Initialize PaddleOCR
 print("Initializing PaddleOCR...")
 ocr = None
+ocr_pool = None
+
 
 def initialize_ocr():
     global ocr
     try:
         print("Attempting to initialize PaddleOCR...")
         # PaddleOCR 3.x initialization
-        ocr = PaddleOCR(
-            use_doc_orientation_classify=False,
-            use_doc_unwarping=False,
-            use_textline_orientation=False,
-            lang='en'
-        )
+        ocr = PaddleOCR(**OCR_INIT_KWARGS)
         print("PaddleOCR initialized successfully!")
         return True
     except PermissionError as e:
         print(f"Permission error initializing PaddleOCR: {e}")
         print("This is likely due to Windows file permissions on the model files.")
-        print("Please try running the server as Administrator or delete the model cache:")
+        print(
+            "Please try running the server as Administrator or delete the model cache:"
+        )
         print("Delete folder: C:\\Users\\SDS\\.paddlex\\official_models\\")
         return False
     except Exception as e:
@@ -72,8 +127,31 @@ def initialize_ocr():
             print(f"Alternative initialization also failed: {e2}")
             return False
 
-# Initialize OCR
-initialize_ocr()
+
+def initialize_ocr_pool():
+    global ocr_pool
+    from ocr_worker_pool import OCRWorkerPool
+
+    print(f"Starting OCR worker pool with {OCR_WORKERS} workers...")
+    ocr_pool = OCRWorkerPool(
+        OCR_WORKERS, OCR_INIT_KWARGS, cpu_threads=OCR_WORKER_CPU_THREADS
+    ).start()
+    print(f"OCR worker pool ready: {ocr_pool.is_ready()}")
+
+
+def ocr_ready():
+    if ocr_pool is not None:
+        return ocr_pool.is_ready()
+    return ocr is not None
+
+
+# Initialize OCR; in pool mode the model lives only in the worker processes
+if OCR_WORKERS > 0:
+    if IS_MAIN_PROCESS:
+        initialize_ocr_pool()
+else:
+    initialize_ocr()
+
 
 def warmup_ocr():
     """Warm-up to trigger model download at startup to avoid first-request latency"""
@@ -82,93 +160,234 @@ def warmup_ocr():
         if ocr is None:
             return
         import numpy as np
-        dummy = (np.ones((64, 64, 3), dtype=np.uint8) * 255)
+
+        dummy = np.ones((64, 64, 3), dtype=np.uint8) * 255
         print("Warming up OCR (this may download models on first run)...")
         _ = ocr.predict(dummy)
         print("Warm-up finished.")
     except Exception as e:
         print(f"Warm-up skipped: {e}")
 
+
 warmup_ocr()
 
+
+class _BatchJob(object):
+    __slots__ = ("image", "result", "error", "done", "enqueued_at")
+
+    def __init__(self, image):
+        self.image = image
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.enqueued_at = time.monotonic()
+
+
+class OCRMicroBatcher(object):
+    """Dynamic micro-batching scheduler in front of ``ocr.predict_iter``.
+
+    Requests are queued and a single worker thread collects up to
+    ``max_batch_size`` of them, waiting at most ``max_wait_ms`` after the first
+    one arrives, runs them as one batched call and hands every caller its own
+    result. Since only the worker touches the pipeline, concurrent requests no
+    longer race on the shared predictor.
+    """
+
+    def __init__(
+        self, max_batch_size=8, max_wait_ms=10, max_queue_size=256, latency_window=1000
+    ):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._batch_size_hist = Counter()
+        self._latencies = deque(maxlen=latency_window)
+        self._max_queue_depth = 0
+        self._num_requests = 0
+        self._num_batches = 0
+        self._busy_time = 0.0
+        self._worker = threading.Thread(
+            target=self._run, name="ocr-micro-batcher", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, image, timeout=None):
+        """Queue one BGR image and block until its OCR result is ready."""
+        job = _BatchJob(image)
+        # raises queue.Full when the server is overloaded instead of growing
+        # the backlog (and the tail latency) without bound
+        self._queue.put_nowait(job)
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        if not job.done.wait(timeout):
+            raise TimeoutError("OCR request timed out in the batch queue")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # take whatever is already waiting, but do not block
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            t0 = time.monotonic()
+            try:
+                results = list(ocr.predict_iter([job.image for job in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        "predict_iter returned {} results for {} inputs".format(
+                            len(results), len(batch)
+                        )
+                    )
+                for job, res in zip(batch, results):
+                    job.result = res
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].error = e
+                else:
+                    # isolate the failing input instead of failing the whole batch
+                    print(
+                        f"Batched OCR failed ({e}), retrying {len(batch)} requests one by one"
+                    )
+                    for job in batch:
+                        try:
+                            job.result = ocr.predict(job.image)[0]
+                        except Exception as job_error:
+                            job.error = job_error
+            finished = time.monotonic()
+            with self._stats_lock:
+                self._num_batches += 1
+                self._num_requests += len(batch)
+                self._batch_size_hist[len(batch)] += 1
+                self._busy_time += finished - t0
+                for job in batch:
+                    self._latencies.append(finished - job.enqueued_at)
+            for job in batch:
+                job.done.set()
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            num_batches = self._num_batches
+
+            def percentile(q):
+                if not latencies:
+                    return 0.0
+                idx = min(len(latencies) - 1, int(round(q * (len(latencies) - 1))))
+                return round(latencies[idx] * 1000, 2)
+
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "requests": self._num_requests,
+                "batches": num_batches,
+                "avg_batch_size": (
+                    round(self._num_requests / num_batches, 2) if num_batches else 0.0
+                ),
+                "batch_size_histogram": {
+                    str(k): v for k, v in sorted(self._batch_size_hist.items())
+                },
+                "latency_ms": {"p50": percentile(0.5), "p99": percentile(0.99)},
+                "busy_seconds": round(self._busy_time, 3),
+            }
+
+
+result_cache = None
+if OCR_CACHE_ENABLED and IS_MAIN_PROCESS:
+    import paddleocr
+    from ocr_result_cache import OCRResultCache
+
+    # everything that changes the OCR output is part of the cache key
+    result_cache = OCRResultCache(
+        params=dict(
+            OCR_INIT_KWARGS,
+            paddleocr_version=getattr(paddleocr, "__version__", ""),
+            max_image_side=MAX_IMAGE_SIDE,
+            pdf_render_zoom=PDF_RENDER_ZOOM,
+            pdf_render_max_side=PDF_RENDER_MAX_SIDE,
+        ),
+        max_memory_bytes=int(OCR_CACHE_MAX_MB * (1 << 20)),
+        disk_path=OCR_CACHE_DB or None,
+        max_disk_bytes=int(OCR_CACHE_DB_MAX_MB * (1 << 20)),
+    )
+    print(
+        f"OCR result cache enabled (memory: {OCR_CACHE_MAX_MB} MB, disk: {OCR_CACHE_DB or 'off'})"
+    )
+
+ocr_batcher = None
+if OCR_BATCH_ENABLED and OCR_WORKERS > 0:
+    print("OCR_BATCH_ENABLED is ignored in worker pool mode")
+elif OCR_BATCH_ENABLED:
+    ocr_batcher = OCRMicroBatcher(
+        max_batch_size=OCR_BATCH_MAX_SIZE,
+        max_wait_ms=OCR_BATCH_MAX_WAIT_MS,
+        max_queue_size=OCR_BATCH_MAX_QUEUE,
+    )
+    print(
+        f"OCR micro-batching enabled: max_batch_size={OCR_BATCH_MAX_SIZE}, max_wait_ms={OCR_BATCH_MAX_WAIT_MS}"
+    )
+
+
+def process_pdf_pages(pdf_bytes):
+    """Process PDF page by page through ocr_bgr_image (and so the batcher and cache)"""
+    all_results = []
+    page_count = 0
+    for page_idx, page_results, seconds in iter_pdf_page_results(pdf_bytes):
+        page_count += 1
+        print(
+            f"OCR completed for page {page_idx + 1} in {seconds:.2f} seconds: "
+            f"{len(page_results)} text lines"
+        )
+        all_results.extend(page_results)
+    print(
+        f"PDF processing complete: {page_count} pages, {len(all_results)} total text lines"
+    )
+    return all_results
+
+
+def process_pdf_cached(pdf_bytes):
+    """Process PDF through the result cache; whole documents and single pages are cached"""
+    doc_key = result_cache.make_key("pdf", pdf_bytes)
+    cached = result_cache.get(doc_key)
+    if cached is not None:
+        print(f"PDF result cache hit: {len(cached)} text lines")
+        return cached
+    all_results = process_pdf_pages(pdf_bytes)
+    result_cache.put(doc_key, all_results)
+    return all_results
+
+
 def process_pdf(pdf_bytes):
-    """Process PDF using PaddleOCR's built-in predict_iter method"""
+    """Process PDF pages rendered from memory, whatever the serving mode.
+
+    Pages are rasterized by iter_rendered_pdf_pages and recognized one by one
+    through ocr_bgr_image, so a single pipeline call, the micro-batcher and
+    the worker pool all see the same page images and return the same lines.
+    """
     try:
-        # Save PDF bytes to temporary file
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-            temp_file.write(pdf_bytes)
-            temp_pdf_path = temp_file.name
-        
-        print(f"Processing PDF using predict_iter: {temp_pdf_path}")
-        
-        all_results = []
-        page_count = 0
-        
-        # Use PaddleOCR's efficient predict_iter for PDFs
-        for i, res in enumerate(ocr.predict_iter(temp_pdf_path)):
-            page_idx = res.json.get("page_index", i)
-            page_count += 1
-            
-            print(f"Processing PDF page {page_idx + 1}")
-            import time
-            t0 = time.time()
-            
-            # Extract text results from the response
-            page_results = []
-            if hasattr(res, 'json') and res.json:
-                json_data = res.json
-                
-                # Extract data from the nested "res" structure
-                res_data = json_data.get('res', {})
-                rec_texts = res_data.get('rec_texts', [])
-                rec_scores = res_data.get('rec_scores', [])
-                rec_boxes = res_data.get('rec_boxes', [])
-
-                
-                # Combine texts, scores, and boxes
-                print(f"Processing {len(rec_texts)} text lines for page {page_idx + 1}")
-                for i, text in enumerate(rec_texts):
-                    confidence = rec_scores[i] if i < len(rec_scores) else 0.0
-                    bbox = rec_boxes[i] if i < len(rec_boxes) else []
-                    
-                    page_results.append({
-                        "text": text,
-                        "confidence": float(confidence),
-                        "bbox": convert_numpy_to_list(bbox),
-                        "page": page_idx + 1,
-                        "text_type": json_data.get('text_type', 'general'),
-                        "model_settings": json_data.get('model_settings', {})
-                    })
-                
-                print(f"Added {len(page_results)} results for page {page_idx + 1}")
-            
-            processing_time = time.time() - t0
-            print(f"OCR completed for page {page_idx + 1} in {processing_time:.2f} seconds")
-            print(f"Page {page_idx + 1} results: {len(page_results)} text lines")
-            
-            all_results.extend(page_results)
-        
-        # Clean up temporary file
-        import os
-        os.unlink(temp_pdf_path)
-        
-        print(f"PDF processing complete: {page_count} pages, {len(all_results)} total text lines")
-        print(f"Returning {len(all_results)} results to frontend")
-        if len(all_results) > 0:
-            print(f"First result sample: {all_results[0]}")
-        return all_results
-        
+        if result_cache is not None:
+            return process_pdf_cached(pdf_bytes)
+        return process_pdf_pages(pdf_bytes)
     except Exception as e:
         print(f"PDF processing error: {e}")
-        # Clean up temp file if it exists
-        try:
-            if 'temp_pdf_path' in locals():
-                os.unlink(temp_pdf_path)
-        except:
-            pass
         raise e
 
+
 def convert_numpy_to_list(obj):
     """Convert numpy arrays to Python lists for JSON serialization"""
     if isinstance(obj, np.ndarray):
@@ -180,9 +399,18 @@ def convert_numpy_to_list(obj):
     else:
         return obj
 
+
 def process_image(image_bytes):
     """Process image file and run OCR"""
     try:
+        cache_key = None
+        if result_cache is not None:
+            cache_key = result_cache.make_key("image", image_bytes)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                print(f"Image result cache hit: {len(cached)} text lines")
+                return cached
+
         # Convert to PIL Image
         pil_image = Image.open(io.BytesIO(image_bytes))
         # Normalize to RGB (handles PNG with alpha or paletted images)
@@ -190,56 +418,84 @@ def process_image(image_bytes):
             pil_image = pil_image.convert("RGB")
         elif pil_image.mode == "L":
             pil_image = pil_image.convert("RGB")
-        
+
         # Convert to OpenCV format
         cv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-        
+
         # Downscale very large images for faster inference while keeping readability
-        max_side = 1280
-        h, w = cv_image.shape[:2]
-        scale = max(h, w) / max_side
-        if scale > 1.0:
-            new_w = int(w / scale)
-            new_h = int(h / scale)
-            cv_image = cv2.resize(cv_image, (new_w, new_h), interpolation=cv2.INTER_AREA)
-            print(f"Downscaled image from {w}x{h} to {new_w}x{new_h}")
-        
+        cv_image = downscale_for_ocr(cv_image)
+        ocr_results = ocr_bgr_image(cv_image)
+        if cache_key is not None:
+            result_cache.put(cache_key, ocr_results)
+        return ocr_results
+    except Exception as e:
+        print(f"Image processing error: {e}")
+        raise e
+
+
+def downscale_for_ocr(cv_image, max_side=MAX_IMAGE_SIDE):
+    """Downscale so the longest side is at most max_side (single INTER_AREA resize)"""
+    h, w = cv_image.shape[:2]
+    scale = max(h, w) / max_side
+    if scale > 1.0:
+        new_w = int(w / scale)
+        new_h = int(h / scale)
+        cv_image = cv2.resize(cv_image, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        print(f"Downscaled image from {w}x{h} to {new_w}x{new_h}")
+    return cv_image
+
+
+def ocr_bgr_image(cv_image):
+    """Run OCR on a BGR ndarray and format the recognized lines"""
+    try:
         # Run OCR
         print(f"Running OCR on image of size: {cv_image.shape}")
-        import time
         t0 = time.time()
-        result = ocr.predict(cv_image)
+        if ocr_pool is not None:
+            result = [page["res"] for page in ocr_pool.predict(cv_image)]
+        elif ocr_batcher is not None:
+            result = [ocr_batcher.submit(cv_image)]
+        else:
+            result = ocr.predict(cv_image)
         print(f"OCR completed in {time.time() - t0:.2f} seconds")
-        print(f"OCR result type: {type(result)}, length: {len(result) if result else 'None'}")
-        
+        print(
+            f"OCR result type: {type(result)}, length: {len(result) if result else 'None'}"
+        )
+
         # Format results
         ocr_results = []
         if result:
 
             # Case 1: Newer dict-based schema: [{ 'rec_texts': [...], 'rec_scores': [...], 'rec_boxes': ... }]
             if isinstance(result[0], dict) and (
-                'rec_texts' in result[0] or 'rec_scores' in result[0] or 'rec_boxes' in result[0]
+                "rec_texts" in result[0]
+                or "rec_scores" in result[0]
+                or "rec_boxes" in result[0]
             ):
-                print("Parsing OCR result in dict schema (rec_texts/rec_scores/rec_boxes)")
+                print(
+                    "Parsing OCR result in dict schema (rec_texts/rec_scores/rec_boxes)"
+                )
                 first = result[0]
-                rec_texts = first.get('rec_texts', [])
+                rec_texts = first.get("rec_texts", [])
                 if rec_texts is None:
                     rec_texts = []
-                rec_scores = first.get('rec_scores', [])
+                rec_scores = first.get("rec_scores", [])
                 if rec_scores is None:
                     rec_scores = []
-                rec_boxes = first.get('rec_boxes', [])
+                rec_boxes = first.get("rec_boxes", [])
                 if rec_boxes is None:
                     rec_boxes = []
                 for i, text in enumerate(rec_texts):
                     confidence = rec_scores[i] if i < len(rec_scores) else 0.0
                     bbox = rec_boxes[i] if i < len(rec_boxes) else []
-                    
-                    ocr_results.append({
-                        "text": text,
-                        "confidence": float(confidence),
-                        "bbox": convert_numpy_to_list(bbox)
-                    })
+
+                    ocr_results.append(
+                        {
+                            "text": text,
+                            "confidence": float(confidence),
+                            "bbox": convert_numpy_to_list(bbox),
+                        }
+                    )
             # Case 2: Legacy list schema: [[bbox, [text, score]], ...]
             elif isinstance(result[0], list) or isinstance(result[0], tuple):
                 lines = result[0] if isinstance(result[0], list) else result
@@ -251,48 +507,139 @@ def process_image(image_bytes):
                         text = line[1][0]
                         confidence = line[1][1]
                         bbox = line[0]
-                        ocr_results.append({
-                            "text": text,
-                            "confidence": float(confidence),
-                            "bbox": convert_numpy_to_list(bbox)
-                        })
+                        ocr_results.append(
+                            {
+                                "text": text,
+                                "confidence": float(confidence),
+                                "bbox": convert_numpy_to_list(bbox),
+                            }
+                        )
                     except Exception:
                         # Fallback: try dict-like
                         if isinstance(line, dict):
-                            text = line.get('text', '')
-                            confidence = float(line.get('score', 0.0))
-                            bbox = line.get('bbox', [])
-                            ocr_results.append({"text": text, "confidence": confidence, "bbox": convert_numpy_to_list(bbox)})
+                            text = line.get("text", "")
+                            confidence = float(line.get("score", 0.0))
+                            bbox = line.get("bbox", [])
+                            ocr_results.append(
+                                {
+                                    "text": text,
+                                    "confidence": confidence,
+                                    "bbox": convert_numpy_to_list(bbox),
+                                }
+                            )
             else:
-                print("Unexpected OCR result structure; returning raw text strings if available")
+                print(
+                    "Unexpected OCR result structure; returning raw text strings if available"
+                )
                 # Attempt to flatten any strings present
                 try:
                     for item in result:
                         if isinstance(item, str):
-                            ocr_results.append({"text": item, "confidence": 0.0, "bbox": []})
+                            ocr_results.append(
+                                {"text": item, "confidence": 0.0, "bbox": []}
+                            )
                 except Exception:
                     pass
         else:
             print("No text detected in image")
-        
+
         return ocr_results
-        
+
     except Exception as e:
         print(f"Image processing error: {e}")
         raise e
 
+
+# Magic bytes of the formats accepted by the binary upload endpoint
+_IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+)
+
+
+def sniff_file_type(file_bytes):
+    """Return (file_type, format) from the leading magic bytes, or (None, None)"""
+    head = bytes(file_bytes[:16])
+    if head.lstrip()[:5] == b"%PDF-":
+        return "pdf", "pdf"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image", "webp"
+    for signature, fmt in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return "image", fmt
+    return None, None
+
+
+def _jpeg_size(file_bytes):
+    """Read (width, height) from the JPEG SOF marker without decoding pixels"""
+    data = memoryview(file_bytes)
+    pos = 2
+    n = len(data)
+    while pos + 9 < n:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        length = (data[pos + 2] << 8) | data[pos + 3]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = (data[pos + 5] << 8) | data[pos + 6]
+            width = (data[pos + 7] << 8) | data[pos + 8]
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def decode_image_bgr(file_bytes, fmt=None, max_side=MAX_IMAGE_SIDE):
+    """Decode image bytes once, straight into a BGR ndarray no larger than needed.
+
+    Large JPEGs are decoded at 1/2, 1/4 or 1/8 resolution by libjpeg itself
+    when the result still has at least max_side pixels on its longest side,
+    so the full-resolution bitmap of a big scan is never materialized.
+    Returns None if OpenCV cannot decode the data.
+    """
+    buf = np.frombuffer(file_bytes, dtype=np.uint8)
+    flags = cv2.IMREAD_COLOR
+    if fmt == "jpeg":
+        size = _jpeg_size(file_bytes)
+        if size is not None:
+            longest = max(size)
+            for factor, reduced_flag in (
+                (8, cv2.IMREAD_REDUCED_COLOR_8),
+                (4, cv2.IMREAD_REDUCED_COLOR_4),
+                (2, cv2.IMREAD_REDUCED_COLOR_2),
+            ):
+                if longest // factor >= max_side:
+                    flags = reduced_flag
+                    break
+    # PIL (used by /ocr) does not apply EXIF rotation either; keep both paths equal
+    cv_image = cv2.imdecode(buf, flags | cv2.IMREAD_IGNORE_ORIENTATION)
+    if cv_image is None:
+        return None
+    return downscale_for_ocr(cv_image, max_side)
+
+
 def lookup_icd10_description(code: str) -> str:
     """Lookup ICD-10-CM code description using NIH Clinical Tables API.
     Tries multiple query variants (with and without dot). Returns empty string on failure.
     """
     try:
-        norm = (code or "").strip().upper().rstrip(':;.,')
+        norm = (code or "").strip().upper().rstrip(":;.,")
         if not norm:
             return ""
         candidates = [norm]
         # variant: remove dot
-        if '.' in norm:
-            candidates.append(norm.replace('.', ''))
+        if "." in norm:
+            candidates.append(norm.replace(".", ""))
         # variant: ensure uppercase
         candidates = list(dict.fromkeys(candidates))  # de-dup
 
@@ -320,7 +667,9 @@ def lookup_icd10_description(code: str) -> str:
                         if names:
                             return names[0]
                 except Exception as inner_e:
-                    print(f"ICD-10 lookup attempt failed for {term} ({field_param}): {inner_e}")
+                    print(
+                        f"ICD-10 lookup attempt failed for {term} ({field_param}): {inner_e}"
+                    )
                     continue
         print(f"ICD-10 lookup: no match for {code}")
         return ""
@@ -328,32 +677,34 @@ def lookup_icd10_description(code: str) -> str:
         print(f"ICD-10 lookup failed for {code}: {e}")
         return ""
 
-@app.route('/ocr', methods=['POST'])
+
+@app.route("/ocr", methods=["POST"])
 def ocr_endpoint():
     """OCR endpoint that accepts base64 encoded images or PDFs"""
     try:
-        if ocr is None:
+        if not ocr_ready():
             return jsonify({"error": "OCR not initialized"}), 500
-        
+
         # Get the data
         data = request.get_json()
-        if not data or 'file' not in data:
+        if not data or "file" not in data:
             return jsonify({"error": "No file data provided"}), 400
-        
+
         # Decode base64 data
-        file_data = data['file']
-        if file_data.startswith('data:'):
+        file_data = data["file"]
+        if file_data.startswith("data:"):
             # Remove data URL prefix (e.g., data:image/jpeg;base64, or data:application/pdf;base64,)
-            file_data = file_data.split(',')[1]
-        
+            file_data = file_data.split(",")[1]
+
         # Decode base64 to bytes
         file_bytes = base64.b64decode(file_data)
         print(f"Received file data: {len(file_bytes)} bytes")
-        
+
         # Start timing
         import time
+
         start_time = time.time()
-        
+
         # Determine file type and process accordingly
         try:
             # Try to open as image first
@@ -362,6 +713,8 @@ def ocr_endpoint():
             print(f"Processing as image: {pil_image.format}, size: {pil_image.size}")
             ocr_results = process_image(file_bytes)
             file_type = "image"
+        except queue.Full:
+            return jsonify({"error": "OCR server is busy, please retry"}), 503
         except Exception as img_error:
             print(f"Not an image, trying as PDF. Image error: {img_error}")
             # If not an image, try as PDF
@@ -371,85 +724,347 @@ def ocr_endpoint():
                 file_type = "pdf"
             except Exception as pdf_error:
                 print(f"PDF processing failed: {pdf_error}")
-                return jsonify({
-                    "error": f"Unsupported file format. Must be an image (PNG, JPG, etc.) or PDF. Image error: {str(img_error)}, PDF error: {str(pdf_error)}"
-                }), 400
-        
+                return (
+                    jsonify(
+                        {
+                            "error": f"Unsupported file format. Must be an image (PNG, JPG, etc.) or PDF. Image error: {str(img_error)}, PDF error: {str(pdf_error)}"
+                        }
+                    ),
+                    400,
+                )
+
         total_time = time.time() - start_time
         print(f"Total processing time: {total_time:.2f} seconds")
         print(f"Final results count: {len(ocr_results)}")
-        
+
         response_data = {
             "success": True,
             "file_type": file_type,
             "results": ocr_results,
-            "processing_time": total_time
+            "processing_time": total_time,
         }
-        
+
         print(f"Sending response to frontend: {len(ocr_results)} results")
         return jsonify(response_data)
-        
+
+    except Exception as e:
+        print(f"OCR error: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+
+def read_upload_bytes():
+    """Return the uploaded file from a multipart, raw binary or base64 JSON body"""
+    if request.files:
+        upload = request.files.get("file") or next(iter(request.files.values()))
+        return upload.read()
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        file_data = data.get("file") or ""
+        if file_data.startswith("data:"):
+            file_data = file_data.split(",")[1]
+        return base64.b64decode(file_data)
+    return request.get_data(cache=False)
+
+
+def parse_page_range(spec, page_count):
+    """Parse a 1-based page spec such as "1-3,7,10-" into 0-based page indices"""
+    if not spec:
+        return list(range(page_count))
+    pages = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            start = int(start) if start.strip() else 1
+            end = int(end) if end.strip() else page_count
+        else:
+            start = end = int(part)
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range: {part}")
+        pages.extend(range(start - 1, min(end, page_count)))
+    return list(dict.fromkeys(pages))
+
+
+def iter_rendered_pdf_pages(
+    pdf_bytes, page_indices, num_workers=PDF_RENDER_WORKERS, prefetch=PDF_PREFETCH
+):
+    """Yield (page_index, bgr_image) in order while later pages render in the background.
+
+    Thin wrapper over ppocr.utils.utility.iter_pdf_pages, which keeps at most
+    ``prefetch`` rendered pages ahead of the consumer, so rasterizing page N+1
+    overlaps with OCR of page N without buffering the whole file.
+    """
+    page_indices = list(page_indices)
+    images = iter_pdf_pages(
+        pdf_bytes,
+        num_workers=max(1, num_workers),
+        prefetch=prefetch,
+        page_indices=page_indices,
+        zoom=PDF_RENDER_ZOOM,
+        max_side=PDF_RENDER_MAX_SIDE,
+    )
+    try:
+        for page_idx, image in zip(page_indices, images):
+            yield page_idx, image
+    finally:
+        # stops the render threads when the consumer stops early
+        images.close()
+
+
+def iter_pdf_page_results(pdf_bytes, page_indices=None):
+    """Yield (page_index, ocr_results, seconds) page by page, rendering from memory"""
+    if page_indices is None:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            page_indices = range(doc.page_count)
+    for page_idx, image in iter_rendered_pdf_pages(pdf_bytes, page_indices):
+        t0 = time.time()
+        if result_cache is not None:
+            # keyed on the rendered pixels, so pages shared between different
+            # documents are only recognized once
+            page_key = result_cache.make_key("page", str(image.shape), image)
+            page_results = result_cache.get_or_compute(
+                page_key, lambda: ocr_bgr_image(image)
+            )
+        else:
+            page_results = ocr_bgr_image(image)
+        for line in page_results:
+            line["page"] = page_idx + 1
+            line["text_type"] = PDF_TEXT_TYPE
+            line["model_settings"] = {}
+        yield page_idx, page_results, time.time() - t0
+
+
+@app.route("/ocr/pdf/stream", methods=["POST"])
+def ocr_pdf_stream_endpoint():
+    """Stream PDF OCR results page by page.
+
+    Accepts the same bodies as /ocr/upload (or base64 JSON like /ocr). Query
+    parameters: ``pages`` (1-based, e.g. ``1-3,7``) and ``format`` (``ndjson``,
+    the default, or ``sse``). Every page is emitted as soon as it is done,
+    followed by a final summary record.
+    """
+    if not ocr_ready():
+        return jsonify({"error": "OCR not initialized"}), 500
+    try:
+        pdf_bytes = read_upload_bytes()
+    except Exception as e:
+        return jsonify({"error": f"Invalid upload: {e}"}), 400
+    if not pdf_bytes:
+        return jsonify({"error": "No file data provided"}), 400
+    if sniff_file_type(pdf_bytes)[0] != "pdf":
+        return jsonify({"error": "Streaming is only supported for PDF files"}), 415
+
+    try:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            page_count = doc.page_count
+        page_indices = parse_page_range(request.args.get("pages", ""), page_count)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Could not open PDF: {e}"}), 400
+
+    use_sse = request.args.get("format", "ndjson").lower() == "sse"
+
+    def encode(record, event):
+        payload = json.dumps(record)
+        if use_sse:
+            return f"event: {event}\ndata: {payload}\n\n"
+        return payload + "\n"
+
+    def generate():
+        start_time = time.time()
+        total_results = 0
+        try:
+            for page_idx, page_results, seconds in iter_pdf_page_results(
+                pdf_bytes, page_indices
+            ):
+                total_results += len(page_results)
+                print(
+                    f"Streamed page {page_idx + 1}: {len(page_results)} text lines in {seconds:.2f} seconds"
+                )
+                yield encode(
+                    {
+                        "page": page_idx + 1,
+                        "results": page_results,
+                        "processing_time": seconds,
+                    },
+                    "page",
+                )
+        except Exception as e:
+            print(f"PDF streaming error: {e}")
+            print(traceback.format_exc())
+            yield encode({"error": str(e)}, "error")
+            return
+        yield encode(
+            {
+                "done": True,
+                "page_count": page_count,
+                "pages_processed": len(page_indices),
+                "total_results": total_results,
+                "processing_time": time.time() - start_time,
+            },
+            "done",
+        )
+
+    mimetype = "text/event-stream" if use_sse else "application/x-ndjson"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/ocr/upload", methods=["POST"])
+def ocr_upload_endpoint():
+    """OCR endpoint for binary uploads (multipart/form-data or application/octet-stream).
+
+    Skips the base64/JSON envelope of /ocr: the type is sniffed from the magic
+    bytes and images are decoded once, directly to BGR.
+    """
+    try:
+        if not ocr_ready():
+            return jsonify({"error": "OCR not initialized"}), 500
+
+        file_bytes = read_upload_bytes()
+        if not file_bytes:
+            return jsonify({"error": "No file data provided"}), 400
+        print(f"Received binary upload: {len(file_bytes)} bytes")
+
+        start_time = time.time()
+        file_type, fmt = sniff_file_type(file_bytes)
+        if file_type == "pdf":
+            ocr_results = process_pdf(file_bytes)
+        elif file_type == "image":
+            cache_key = None
+            ocr_results = None
+            if result_cache is not None:
+                cache_key = result_cache.make_key("image-upload", file_bytes)
+                ocr_results = result_cache.get(cache_key)
+            if ocr_results is None:
+                cv_image = decode_image_bgr(file_bytes, fmt)
+                if cv_image is None:
+                    # formats OpenCV cannot read (e.g. some GIF/TIFF variants)
+                    # and truncated files, which PIL decodes as far as it can
+                    try:
+                        ocr_results = process_image(file_bytes)
+                    except OSError as e:
+                        # PIL could not read it either
+                        return jsonify({"error": f"Could not decode image: {e}"}), 400
+                else:
+                    ocr_results = ocr_bgr_image(cv_image)
+                    if cache_key is not None:
+                        result_cache.put(cache_key, ocr_results)
+        else:
+            return (
+                jsonify(
+                    {
+                        "error": "Unsupported file format. Must be an image (PNG, JPG, BMP, TIFF, WEBP, GIF) or PDF."
+                    }
+                ),
+                415,
+            )
+
+        total_time = time.time() - start_time
+        print(f"Total processing time: {total_time:.2f} seconds")
+        return jsonify(
+            {
+                "success": True,
+                "file_type": file_type,
+                "results": ocr_results,
+                "processing_time": total_time,
+            }
+        )
+    except queue.Full:
+        return jsonify({"error": "OCR server is busy, please retry"}), 503
     except Exception as e:
         print(f"OCR error: {e}")
         print(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
-@app.route('/health', methods=['GET'])
+
+@app.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "ocr_initialized": ocr is not None
-    })
+    health = {"status": "healthy", "ocr_initialized": ocr_ready()}
+    if ocr_pool is not None:
+        health["worker_pool"] = ocr_pool.health()
+    if ocr_batcher is not None:
+        health["batching"] = ocr_batcher.stats()
+    if result_cache is not None:
+        health["cache"] = result_cache.stats()
+    return jsonify(health)
 
-@app.route('/test', methods=['GET'])
+
+@app.route("/test", methods=["GET"])
 def test():
     """Simple test endpoint"""
     from datetime import datetime
-    return jsonify({'message': 'Server is responding', 'timestamp': datetime.now().isoformat()})
 
-@app.route('/reinit', methods=['POST'])
+    return jsonify(
+        {"message": "Server is responding", "timestamp": datetime.now().isoformat()}
+    )
+
+
+@app.route("/reinit", methods=["POST"])
 def reinitialize_ocr():
     """Reinitialize OCR endpoint"""
     global ocr
     try:
+        if ocr_pool is not None:
+            ocr_pool.restart_workers()
+            return jsonify(
+                {"success": True, "message": "OCR workers are being restarted"}
+            )
         success = initialize_ocr()
         if success:
-            return jsonify({
-                "success": True,
-                "message": "OCR reinitialized successfully"
-            })
+            return jsonify(
+                {"success": True, "message": "OCR reinitialized successfully"}
+            )
         else:
-            return jsonify({
-                "success": False,
-                "message": "Failed to reinitialize OCR"
-            }), 500
+            return (
+                jsonify({"success": False, "message": "Failed to reinitialize OCR"}),
+                500,
+            )
     except Exception as e:
-        return jsonify({
-            "success": False,
-            "message": f"Error during reinitialization: {str(e)}"
-        }), 500
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": f"Error during reinitialization: {str(e)}",
+                }
+            ),
+            500,
+        )
 
-@app.route('/analyze-openai', methods=['POST'])
+
+@app.route("/analyze-openai", methods=["POST"])
 def analyze_with_openai():
     """Analyze extracted text with OpenAI for ICD-10 code extraction"""
     try:
         if not OPENAI_API_KEY:
-            return jsonify({
-                "success": False,
-                "error": "OpenAI API key not configured. Please set OPENAI_API_KEY environment variable."
-            }), 500
-        
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.",
+                    }
+                ),
+                500,
+            )
+
         data = request.get_json()
-        if not data or 'text' not in data:
+        if not data or "text" not in data:
             return jsonify({"error": "No text data provided"}), 400
-        
-        text = data['text']
+
+        text = data["text"]
         if not text or not text.strip():
             return jsonify({"error": "Empty text provided"}), 400
-        
+
         print(f"Analyzing text with OpenAI (length: {len(text)} characters)")
-        
+
         # Create the prompt for ICD-10 code extraction
         prompt = f"""
 You are a medical coding expert. Analyze the following medical text and extract all relevant ICD-10 codes with their full descriptions.
@@ -480,25 +1095,26 @@ Medical text to analyze:
 
 Please be thorough and accurate. Only include codes that are clearly mentioned or strongly implied in the text.
 """
-        
+
         # Call OpenAI API
-        client = openai.OpenAI(
-    api_key=OPENAI_API_KEY
-)
+        client = openai.OpenAI(api_key=OPENAI_API_KEY)
         response = client.chat.completions.create(
             model="gpt-4o",
             messages=[
-                {"role": "system", "content": "You are a medical coding expert specializing in ICD-10 code extraction."},
-                {"role": "user", "content": prompt}
+                {
+                    "role": "system",
+                    "content": "You are a medical coding expert specializing in ICD-10 code extraction.",
+                },
+                {"role": "user", "content": prompt},
             ],
             max_tokens=2000,
-            temperature=0.3
+            temperature=0.3,
         )
-        
+
         # Extract the response
         ai_response = response.choices[0].message.content.strip()
         print(f"OpenAI response received: {len(ai_response)} characters")
-        
+
         # Try to parse as JSON
         try:
             parsed_response = json.loads(ai_response)
@@ -508,48 +1124,58 @@ Please be thorough and accurate. Only include codes that are clearly mentioned o
                 "icd_codes": [],
                 "summary": ai_response,
                 "total_codes": 0,
-                "raw_response": ai_response
+                "raw_response": ai_response,
             }
-        
+
         # Fallback: enrich missing descriptions via NIH Clinical Tables lookup
         enriched = []
         for item in parsed_response.get("icd_codes", []):
             code = (item.get("code") or "").strip()
-            desc = (item.get("description") or item.get("desc") or item.get("title") or item.get("name") or "").strip()
+            desc = (
+                item.get("description")
+                or item.get("desc")
+                or item.get("title")
+                or item.get("name")
+                or ""
+            ).strip()
             if code and not desc:
                 desc = lookup_icd10_description(code)
             item["description"] = desc
             enriched.append(item)
         parsed_response["icd_codes"] = enriched
-        
-        return jsonify({
-            "success": True,
-            "analysis": parsed_response,
-            "text_length": len(text)
-        })
-        
+
+        return jsonify(
+            {"success": True, "analysis": parsed_response, "text_length": len(text)}
+        )
+
     except Exception as e:
         print(f"OpenAI analysis error: {e}")
         print(traceback.format_exc())
-        return jsonify({
-            "success": False,
-            "error": f"OpenAI analysis failed: {str(e)}"
-        }), 500
+        return (
+            jsonify({"success": False, "error": f"OpenAI analysis failed: {str(e)}"}),
+            500,
+        )
 
-@app.route('/', methods=['GET'])
+
+@app.route("/", methods=["GET"])
 def index():
     """Simple test endpoint"""
-    return jsonify({
-        "message": "PaddleOCR Server is running",
-        "ocr_initialized": ocr is not None,
-        "endpoints": {
-            "POST /ocr": "OCR endpoint - send base64 encoded image",
-            "GET /health": "Health check",
-            "POST /reinit": "Reinitialize OCR (if initialization failed)",
-            "GET /": "This message"
+    return jsonify(
+        {
+            "message": "PaddleOCR Server is running",
+            "ocr_initialized": ocr_ready(),
+            "endpoints": {
+                "POST /ocr": "OCR endpoint - send base64 encoded image",
+                "POST /ocr/upload": "OCR endpoint - send the raw file as multipart/form-data or application/octet-stream",
+                "POST /ocr/pdf/stream": "Page-by-page PDF OCR as NDJSON or SSE (?pages=1-3&format=sse)",
+                "GET /health": "Health check",
+                "POST /reinit": "Reinitialize OCR (if initialization failed)",
+                "GET /": "This message",
+            },
         }
-    })
+    )
+
 
-if __name__ == '__main__':
+if __name__ == "__main__":
     print("Starting PaddleOCR Server on port 8868...")
-    app.run(host='0.0.0.0', port=8868, debug=False)
+    app.run(host="0.0.0.0", port=8868, debug=False)
@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import paddle
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ppocr.utils.logging import get_logger
+from ppocr.utils.save_load import CheckpointWriter, save_model
+
+CONFIG = {"Architecture": {"model_type": "rec", "algorithm": "CRNN"}, "Global": {}}
+
+
+def make_model():
+    paddle.seed(0)
+    model = paddle.nn.Linear(8, 4)
+    optimizer = paddle.optimizer.Adam(parameters=model.parameters())
+    model(paddle.ones([2, 8])).sum().backward()
+    optimizer.step()
+    return model, optimizer
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_async_save_writes_the_same_files(tmp_path):
+    model, optimizer = make_model()
+    sync_dir, async_dir = str(tmp_path / "sync"), str(tmp_path / "async")
+    kwargs = dict(prefix="best_accuracy", is_best=True, epoch=3, best_model_dict={})
+    save_model(model, optimizer, sync_dir, get_logger(), CONFIG, **kwargs)
+    writer = CheckpointWriter()
+    save_model(
+        model, optimizer, async_dir, get_logger(), CONFIG, writer=writer, **kwargs
+    )
+    writer.close()
+
+    for suffix in [".pdparams", ".pdopt", ".states"]:
+        name = "best_accuracy" + suffix
+        assert read(os.path.join(sync_dir, name)) == read(os.path.join(async_dir, name))
+    for suffix in [".pdparams", ".pdopt"]:
+        assert os.path.samefile(
+            os.path.join(async_dir, "best_accuracy" + suffix),
+            os.path.join(async_dir, "best_model", "model" + suffix),
+        )
+    assert not [f for f in os.listdir(async_dir) if f.endswith(".tmp")]
+
+
+def test_snapshot_is_taken_before_training_goes_on(tmp_path):
+    model, optimizer = make_model()
+    expected = model.weight.numpy().copy()
+    release = threading.Event()
+    writer = CheckpointWriter(max_pending=2)
+    writer.submit(release.wait)
+    save_model(
+        model,
+        optimizer,
+        str(tmp_path),
+        get_logger(),
+        CONFIG,
+        prefix="latest",
+        writer=writer,
+    )
+    model.weight.set_value(np.zeros_like(expected))
+    release.set()
+    writer.close()
+    saved = paddle.load(str(tmp_path / "latest.pdparams"))
+    np.testing.assert_array_equal(saved["weight"].numpy(), expected)
+
+
+def test_saves_in_flight_are_bounded():
+    writer = CheckpointWriter(max_pending=1)
+    release = threading.Event()
+    writer.submit(release.wait)
+    second = threading.Thread(target=writer.submit, args=(lambda: None,))
+    second.start()
+    second.join(0.2)
+    assert second.is_alive()  # blocked while the first save is writing
+    release.set()
+    second.join(5)
+    assert not second.is_alive()
+    writer.close()
+
+
+def test_writer_errors_are_raised():
+    writer = CheckpointWriter()
+
+    def fail():
+        raise IOError("disk full")
+
+    writer.submit(fail)
+    with pytest.raises(IOError):
+        writer.wait()
+    writer.close()
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ppocr.postprocess.db_postprocess import DBPostProcess
+
+
+def make_prob_map(seed, rotated_frac, height=320, width=320):
+    # Word-like blobs laid out on text lines, a fraction of them rotated
+    rng = np.random.RandomState(seed)
+    pred = rng.uniform(0, 0.05, (height, width)).astype(np.float32)
+    y = 4
+    while y < height - 12:
+        line_h = rng.randint(5, 10)
+        x = rng.randint(2, 20)
+        while x < width - 10:
+            word_w = rng.randint(6, 70)
+            angle = rng.uniform(-20, 20) if rng.rand() < rotated_frac else 0.0
+            pts = cv2.boxPoints(
+                ((x + word_w / 2, y + line_h / 2), (word_w, line_h), angle)
+            ).astype(np.int32)
+            cv2.fillPoly(pred, [pts], float(rng.uniform(0.5, 1.0)))
+            x += word_w + rng.randint(5, 14)
+        y += line_h + rng.randint(6, 12)
+    return np.clip(pred, 0, 1)
+
+
+# The batched path must give exactly the boxes of the per-contour reference
+@pytest.mark.parametrize("score_mode", ["fast", "slow"])
+@pytest.mark.parametrize("rotated_frac", [0.0, 0.3, 1.0])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_boxes_from_bitmap_matches_per_contour(score_mode, rotated_frac, seed):
+    pred = make_prob_map(seed, rotated_frac)
+    post_process = DBPostProcess(
+        thresh=0.3, box_thresh=0.6, unclip_ratio=1.5, score_mode=score_mode
+    )
+    bitmap = pred > 0.3
+    dest_w, dest_h = np.float32(637.0), np.float32(641.0)
+
+    expected_boxes, expected_scores = post_process.boxes_from_bitmap_per_contour(
+        pred, bitmap, dest_w, dest_h
+    )
+    boxes, scores = post_process.boxes_from_bitmap(pred, bitmap, dest_w, dest_h)
+
+    assert len(expected_boxes) > 0
+    assert boxes.dtype == expected_boxes.dtype
+    np.testing.assert_array_equal(boxes, expected_boxes)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-9, atol=1e-12)
+
+
+def test_boxes_from_bitmap_empty():
+    post_process = DBPostProcess()
+    pred = np.zeros((64, 64), dtype=np.float32)
+    boxes, scores = post_process.boxes_from_bitmap(pred, pred > 0.3, 64, 64)
+    expected_boxes, expected_scores = post_process.boxes_from_bitmap_per_contour(
+        pred, pred > 0.3, 64, 64
+    )
+    assert boxes.shape == expected_boxes.shape == (0,)
+    assert scores == expected_scores == []
+
+
+def test_unclip_distances_match_unclip():
+    rng = np.random.RandomState(0)
+    boxes = np.array(
+        [
+            cv2.boxPoints(
+                (
+                    (rng.uniform(0, 500), rng.uniform(0, 500)),
+                    (rng.uniform(3, 200), rng.uniform(3, 30)),
+                    rng.uniform(-90, 90),
+                )
+            )
+            for _ in range(200)
+        ],
+        dtype=np.float32,
+    )
+    post_process = DBPostProcess()
+    distances = post_process.unclip_distances(boxes, 1.5)
+    for box, distance in zip(boxes, distances):
+        assert post_process._offset(box, distance) == post_process.unclip(box, 1.5)
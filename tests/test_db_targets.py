@@ -0,0 +1,71 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ppocr.data.imaug.make_border_map import MakeBorderMap
+from ppocr.data.imaug.make_shrink_map import MakeShrinkMap
+
+
+def make_data():
+    polys = [
+        [[10, 10], [200, 10], [200, 40], [10, 40]],
+        [[220, 12], [380, 20], [378, 50], [218, 42]],
+        [[10, 60], [150, 60], [150, 90], [10, 90]],
+        # crosses the right border
+        [[300, 70], [420, 70], [420, 100], [300, 100]],
+        [[170, 60], [260, 60], [260, 90], [170, 90]],
+        # too thin for min_text_size
+        [[20, 110], [120, 110], [120, 114], [20, 114]],
+    ]
+    return {
+        "image": np.zeros((128, 400, 3), dtype=np.uint8),
+        "polys": np.array(polys, dtype=np.float32),
+        "ignore_tags": np.array([False, False, False, False, True, False]),
+    }
+
+
+def apply(ops, data):
+    data = {k: v.copy() for k, v in data.items()}
+    for op in ops:
+        data = op(data)
+    return data
+
+
+def test_distance_transform_maps_match_per_polygon_maps():
+    data = make_data()
+    ref = apply([MakeBorderMap(), MakeShrinkMap()], data)
+    out = apply(
+        [
+            MakeBorderMap(use_distance_transform=True),
+            MakeShrinkMap(use_distance_transform=True),
+        ],
+        data,
+    )
+    diff = np.abs(out["threshold_map"] - ref["threshold_map"])
+    assert out["threshold_map"].dtype == np.float32
+    assert diff.mean() < 0.005 and np.percentile(diff, 99) < 0.05
+    assert np.mean(out["threshold_mask"] != ref["threshold_mask"]) < 0.01
+
+    inter = (out["shrink_map"] * ref["shrink_map"]).sum()
+    union = np.maximum(out["shrink_map"], ref["shrink_map"]).sum()
+    assert inter / union > 0.98
+    np.testing.assert_array_equal(out["shrink_mask"], ref["shrink_mask"])
+    np.testing.assert_array_equal(out["ignore_tags"], ref["ignore_tags"])
+
+
+def test_shrink_falls_back_to_larger_ratio():
+    # 9 pixels high: nothing is left at ratio 0.4, something at 0.8
+    data = {
+        "image": np.zeros((32, 120, 3), dtype=np.uint8),
+        "polys": np.array([[[5, 5], [100, 5], [100, 14], [5, 14]]], np.float32),
+        "ignore_tags": np.array([False]),
+    }
+    ref = apply([MakeShrinkMap()], data)
+    out = apply([MakeShrinkMap(use_distance_transform=True)], data)
+    assert not out["ignore_tags"][0]
+    assert ref["shrink_map"].sum() > 0
+    np.testing.assert_array_equal(out["shrink_map"], ref["shrink_map"])
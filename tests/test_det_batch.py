@@ -0,0 +1,94 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+import tools.infer.utility as utility
+from tools.infer.predict_det import TextDetector
+
+
+class FakePredictor(object):
+    """
+    Stands in for an ONNX session. Dark pixels of each image are text, so
+    every output depends only on its own sample, as with a real model.
+    """
+
+    def __init__(self, det_algorithm, fourier_degree=5):
+        self.det_algorithm = det_algorithm
+        self.fourier_degree = fourier_degree
+        self.batch_sizes = []
+
+    def run(self, output_names, input_dict):
+        (img,) = input_dict.values()
+        self.batch_sizes.append(img.shape[0])
+        text = (img.mean(axis=1, keepdims=True) < -1.0).astype(np.float32)
+        if self.det_algorithm == "DB":
+            return [text * 0.9]
+        k = self.fourier_degree
+        outputs = []
+        for stride in (8, 16, 32):
+            level = text[:, :, ::stride, ::stride]
+            out = np.zeros(
+                (img.shape[0], 4 + 4 * k + 2) + level.shape[2:], dtype=np.float32
+            )
+            if stride == 32:
+                # text region and center scores, and a circle of radius 1 cell
+                out[:, 1:2] = out[:, 3:4] = level * 0.9
+                out[:, 4 + k + 1] = 1.0
+            outputs.append(out)
+        return outputs
+
+
+def make_detector(monkeypatch, det_algorithm):
+    args = utility.init_args().parse_args([])
+    args.det_algorithm = det_algorithm
+    args.use_onnx = True
+    args.det_model_dir = "/nonexistent"
+    args.det_box_type = "poly" if det_algorithm == "FCE" else "quad"
+    predictor = FakePredictor(det_algorithm, args.fourier_degree)
+    input_tensor = types.SimpleNamespace(name="x", shape=["N", 3, "H", "W"])
+    monkeypatch.setattr(
+        utility,
+        "create_predictor",
+        lambda args, mode, logger: (predictor, input_tensor, None, None),
+    )
+    return TextDetector(args), predictor
+
+
+def make_image(height, width, seed):
+    rng = np.random.RandomState(seed)
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    for _ in range(3):
+        h, w = rng.randint(20, 40), rng.randint(60, width // 2)
+        top, left = rng.randint(0, height - h), rng.randint(0, width - w)
+        img[top : top + h, left : left + w] = 0
+    return img
+
+
+@pytest.mark.parametrize("det_algorithm", ["DB", "FCE"])
+def test_predict_batch_matches_predict(monkeypatch, det_algorithm):
+    detector, predictor = make_detector(monkeypatch, det_algorithm)
+    # three images of one size and two of another, interleaved
+    imgs = [
+        make_image(*size, seed)
+        for seed, size in enumerate(
+            [(320, 480), (320, 480), (480, 320), (320, 480), (480, 320)]
+        )
+    ]
+    expected = [detector.predict(img)[0] for img in imgs]
+    assert predictor.batch_sizes == [1] * 5
+    assert all(len(boxes) > 0 for boxes in expected)
+
+    predictor.batch_sizes = []
+    results, elapse = detector.predict_batch(imgs, batch_size=2)
+    assert elapse >= 0
+    # one batch of two and one of one for the first size, one of two for the other
+    assert sorted(predictor.batch_sizes) == [1, 2, 2]
+    assert len(results) == len(imgs)
+    for boxes, expected_boxes in zip(results, expected):
+        np.testing.assert_array_equal(boxes, expected_boxes)
@@ -0,0 +1,66 @@
+import os
+import sys
+
+import numpy as np
+import shapely
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ppocr.metrics.eval_det_iou import (
+    DetectionIoUEvaluator,
+    _convex_quads,
+    quad_intersection_area,
+)
+
+
+def rect(left, top, right, bottom):
+    return [[left, top], [right, top], [right, bottom], [left, bottom]]
+
+
+def test_quad_intersection_area_matches_shapely():
+    rng = np.random.RandomState(0)
+    centers = rng.uniform(0, 100, (500, 1, 2))
+    corners = np.array(rect(-20, -8, 20, 8), dtype=np.float64)
+    a = centers + corners + rng.uniform(-5, 5, (500, 4, 2))
+    b = centers + corners[:, ::-1] + rng.uniform(-15, 15, (500, 4, 2))
+    b[:50] = a[:50]
+    pols_a, pols_b = shapely.polygons(a), shapely.polygons(b)
+    convex_a, ccw_a = _convex_quads(a)
+    convex_b, ccw_b = _convex_quads(b)
+    keep = convex_a & convex_b & shapely.is_valid(pols_a) & shapely.is_valid(pols_b)
+    assert keep.sum() > 300
+    expected = shapely.area(shapely.intersection(pols_a[keep], pols_b[keep]))
+    area = quad_intersection_area(ccw_a[keep], ccw_b[keep])
+    np.testing.assert_allclose(area, expected, rtol=1e-7, atol=1e-7)
+
+
+def test_evaluate_image_matching():
+    gt = [
+        {"points": rect(0, 0, 10, 10), "ignore": False},
+        {"points": rect(20, 0, 30, 10), "ignore": False},
+        {"points": rect(40, 0, 50, 10), "ignore": True},
+    ]
+    pred = [
+        {"points": rect(1, 0, 10, 10)},
+        {"points": rect(0, 1, 10, 10)},  # second det of the first gt
+        {"points": rect(41, 0, 50, 10)},  # inside the don't care gt
+        # concave quad covering 30% of the second gt, goes through shapely
+        {"points": [[20, 0], [30, 5], [20, 10], [24, 5]]},
+    ]
+    result = DetectionIoUEvaluator().evaluate_image(gt, pred)
+    assert result == {"gtCare": 2, "detCare": 3, "detMatched": 1}
+
+
+def test_evaluate_images_in_pool():
+    rng = np.random.RandomState(1)
+    gts, preds = [], []
+    for _ in range(6):
+        boxes = rng.uniform(0, 100, (8, 1, 2)) + np.array(rect(0, 0, 20, 8))
+        gts.append([{"points": box, "ignore": False} for box in boxes])
+        noise = rng.normal(0, 1, boxes.shape)
+        preds.append([{"points": box} for box in boxes + noise])
+    evaluator = DetectionIoUEvaluator()
+    expected = evaluator.evaluate_images(gts, preds)
+    pooled = DetectionIoUEvaluator(num_workers=2).evaluate_images(gts, preds)
+    assert pooled == expected
@@ -0,0 +1,81 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ppocr.data.epoch_resample_sampler import EpochResampleBatchSampler
+from ppocr.data.simple_dataset import SimpleDataSet
+from ppocr.utils.logging import get_logger
+
+
+def make_dataset(tmp_path, resample_per_epoch=True):
+    label_files = []
+    for name, num_lines in (("a", 100), ("b", 40)):
+        path = tmp_path / "{}.txt".format(name)
+        path.write_text(
+            "".join("{}_{}.jpg\tlabel\n".format(name, i) for i in range(num_lines))
+        )
+        label_files.append(str(path))
+    config = {
+        "Global": {},
+        "Train": {
+            "dataset": {
+                "name": "SimpleDataSet",
+                "data_dir": str(tmp_path),
+                "label_file_list": label_files,
+                "ratio_list": [0.3, 1.0],
+                "transforms": [],
+                "resample_per_epoch": resample_per_epoch,
+            },
+            "loader": {"shuffle": True},
+        },
+    }
+    return SimpleDataSet(config, "Train", get_logger(), seed=7)
+
+
+def drawn_files(dataset, batches):
+    return [dataset.data_lines[i].split(b"_")[0] for batch in batches for i in batch]
+
+
+def test_dataset_keeps_all_lines(tmp_path):
+    dataset = make_dataset(tmp_path)
+    assert not dataset.need_reset
+    assert len(dataset) == 140
+    assert dataset.data_source_sizes == [100, 40]
+    assert not make_dataset(tmp_path, resample_per_epoch=False).resample_per_epoch
+    assert make_dataset(tmp_path, resample_per_epoch=False).need_reset
+
+
+def test_sampler_draws_ratio_of_each_file_per_epoch(tmp_path):
+    dataset = make_dataset(tmp_path)
+    sampler = EpochResampleBatchSampler(dataset, batch_size=16)
+    assert len(sampler) == 5  # 30 + 40 samples
+
+    first = list(sampler)
+    files = drawn_files(dataset, first)
+    assert files.count(b"a") == 30 and files.count(b"b") == 40
+    second = list(sampler)
+    assert sorted(sum(first, [])) != sorted(sum(second, []))
+
+    # seeded by the epoch: set_epoch replays a draw
+    sampler.set_epoch(0)
+    assert list(sampler) == first
+
+
+def test_sampler_splits_ranks(tmp_path):
+    dataset = make_dataset(tmp_path)
+    ranks = [
+        EpochResampleBatchSampler(dataset, batch_size=8, num_replicas=2, rank=r)
+        for r in range(2)
+    ]
+    for sampler in ranks:
+        sampler.set_epoch(3)
+    indices = [sum(list(sampler), []) for sampler in ranks]
+    assert len(indices[0]) == len(indices[1]) == 35
+    assert not set(indices[0]) & set(indices[1])
+    np.testing.assert_array_equal(
+        np.sort(indices[0] + indices[1]), np.sort(ranks[0].epoch_indices(3))
+    )
@@ -0,0 +1,82 @@
+import logging
+import os
+import pickle
+import sys
+
+import cv2
+import lmdb
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ppocr.data.lmdb_dataset import (
+    LMDBBatchIndex,
+    LMDBBatchPrefetchSampler,
+    LMDBDataSet,
+)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    for k, num in enumerate([7, 5]):
+        env = lmdb.open(str(tmp_path / "set{}".format(k)), map_size=1 << 24)
+        with env.begin(write=True) as txn:
+            for i in range(1, num + 1):
+                img = np.full((8, 16, 3), i, dtype=np.uint8)
+                txn.put(b"image-%09d" % i, cv2.imencode(".png", img)[1].tobytes())
+                txn.put(b"label-%09d" % i, "{}_{}".format(k, i).encode())
+            txn.put(b"num-samples", str(num).encode())
+        env.close()
+    config = {
+        "Global": {},
+        "Train": {
+            "dataset": {
+                "data_dir": str(tmp_path),
+                "prefetch_batch": True,
+                "transforms": [
+                    {"DecodeImage": {"img_mode": "BGR", "channel_first": False}},
+                    {"KeepKeys": {"keep_keys": ["image", "label"]}},
+                ],
+            },
+            "loader": {"batch_size_per_card": 4, "shuffle": False},
+        },
+    }
+    dataset = LMDBDataSet(config, "Train", logging.getLogger())
+    yield dataset
+    dataset.close()
+
+
+def test_compact_index(dataset):
+    assert dataset.data_idx_order_list.dtype == np.uint32
+    assert len(dataset) == 12
+    assert dataset.locate(6) == (0, 7)
+    assert dataset.locate(7) == (1, 1)
+    assert [dataset[i][1] for i in (0, 6, 7, 11)] == ["0_1", "0_7", "1_1", "1_5"]
+
+
+def test_read_samples_matches_single_reads(dataset):
+    idxs = [11, 2, 7, 2]
+    expected = [
+        dataset.get_lmdb_sample_info(dataset.get_txn(lmdb_idx), file_idx)
+        for lmdb_idx, file_idx in map(dataset.locate, idxs)
+    ]
+    assert dataset.read_samples(idxs) == expected
+
+
+def test_batch_prefetch(dataset):
+    sampler = LMDBBatchPrefetchSampler([[0, 8, 3], [5]])
+    first = next(iter(sampler))
+    assert first[1].batch == [0, 8, 3]
+    assert pickle.loads(pickle.dumps(first[1])).batch == [0, 8, 3]
+    assert dataset[first[0]][1] == "0_1"
+    assert sorted(dataset._prefetched) == [3, 8]
+    assert [dataset[idx][1] for idx in first[1:]] == ["1_2", "0_4"]
+    assert dataset[LMDBBatchIndex(5, [5])][1] == "0_6"
+
+
+def test_pickle_drops_handles(dataset):
+    dataset[0]
+    assert dataset._envs
+    assert pickle.loads(pickle.dumps(dataset))._envs == {}
@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ocr_result_cache import OCRResultCache
+
+
+def lines(text):
+    return [{"text": text, "confidence": 0.9, "bbox": [0, 0, 10, 10]}]
+
+
+def entry_size(text):
+    return len(json.dumps(lines(text)).encode("utf-8"))
+
+
+def test_keys():
+    cache = OCRResultCache({"lang": "en"})
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    key = cache.make_key("page", str(image.shape), image)
+    assert key.startswith("page:")
+    assert key == cache.make_key("page", str(image.shape), image.copy())
+    assert key != cache.make_key("page", str(image.shape), image + 1)
+    assert key != cache.make_key("image", str(image.shape), image)
+    # other pipeline parameters never share results
+    other = OCRResultCache({"lang": "ch"})
+    assert key != other.make_key("page", str(image.shape), image)
+
+
+def test_memory_hit_returns_a_copy():
+    cache = OCRResultCache({})
+    key = cache.make_key("image", b"a")
+    assert cache.get(key) is None
+    cache.put(key, lines("a"))
+    results = cache.get(key)
+    assert results == lines("a")
+    results[0]["page"] = 3
+    assert cache.get(key) == lines("a")
+    assert cache.get_or_compute(key, lambda: 1 / 0) == lines("a")
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (3, 0, 1)
+    assert stats["hit_rate"] == 0.75
+
+
+def test_memory_lru_eviction():
+    size = entry_size("a")
+    cache = OCRResultCache({}, max_memory_bytes=2 * size)
+    keys = [cache.make_key("image", name) for name in "abc"]
+    cache.put(keys[0], lines("a"))
+    cache.put(keys[1], lines("b"))
+    cache.get(keys[0])
+    cache.put(keys[2], lines("c"))
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == lines("a")
+    assert cache.get(keys[2]) == lines("c")
+    assert cache.stats()["memory_bytes"] == 2 * size
+    # results larger than the whole budget are not kept in memory
+    cache.put(keys[1], lines("b" * 3 * size))
+    assert cache.get(keys[1]) is None
+
+
+def test_disk_tier_survives_restart_and_is_promoted(tmp_path):
+    path = str(tmp_path / "cache" / "ocr.sqlite")
+    cache = OCRResultCache({}, disk_path=path)
+    key = cache.make_key("pdf", b"document")
+    cache.put(key, lines("a"))
+    assert cache.stats()["disk_entries"] == 1
+
+    restarted = OCRResultCache({}, disk_path=path)
+    assert restarted.stats()["disk_entries"] == 1
+    assert restarted.stats()["memory_entries"] == 0
+    assert restarted.get(key) == lines("a")
+    assert restarted.get(key) == lines("a")
+    stats = restarted.stats()
+    assert (stats["memory_hits"], stats["disk_hits"]) == (1, 1)
+    assert stats["memory_entries"] == 1
+
+
+def test_disk_eviction(tmp_path):
+    size = entry_size("a")
+    cache = OCRResultCache(
+        {},
+        max_memory_bytes=0,
+        disk_path=str(tmp_path / "ocr.sqlite"),
+        max_disk_bytes=int(2.5 * size),
+    )
+    keys = [cache.make_key("image", name) for name in "abc"]
+    for key, name in zip(keys, "abc"):
+        cache.put(key, lines(name))
+    stats = cache.stats()
+    assert stats["disk_bytes"] <= int(2.5 * size)
+    assert stats["disk_entries"] == 2
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == lines("c")
+
+
+def test_corrupted_row_is_a_miss(tmp_path):
+    path = str(tmp_path / "ocr.sqlite")
+    cache = OCRResultCache({}, disk_path=path)
+    key = cache.make_key("image", b"a")
+    cache.put(key, lines("a"))
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "UPDATE ocr_cache SET value = ? WHERE key = ?", (b'[{"text": "a"', key)
+        )
+
+    restarted = OCRResultCache({}, disk_path=path)
+    assert restarted.get(key) is None
+    stats = restarted.stats()
+    assert stats["misses"] == 1
+    assert stats["memory_entries"] == 0
+    assert (stats["disk_entries"], stats["disk_bytes"]) == (0, 0)
+    assert restarted.get_or_compute(key, lambda: lines("b")) == lines("b")
+    assert OCRResultCache({}, disk_path=path).get(key) == lines("b")
@@ -0,0 +1,290 @@
+import base64
+import importlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+pytest.importorskip("openai")
+fitz = pytest.importorskip("fitz")
+
+
+class FakePaddleOCR(object):
+    """Records how many calls run on the pipeline at the same time"""
+
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+    calls = 0
+
+    def __init__(self, **kwargs):
+        pass
+
+    def _enter(self):
+        cls = FakePaddleOCR
+        with cls.lock:
+            cls.active += 1
+            cls.calls += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(0.02)
+        with cls.lock:
+            cls.active -= 1
+
+    def _result(self):
+        return {"rec_texts": ["text"], "rec_scores": [0.9], "rec_boxes": [[0, 0, 1, 1]]}
+
+    def predict(self, image):
+        self._enter()
+        return [self._result()]
+
+    def predict_iter(self, inputs):
+        self._enter()
+        for _ in inputs:
+            yield self._result()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    paddleocr = types.ModuleType("paddleocr")
+    paddleocr.PaddleOCR = FakePaddleOCR
+    monkeypatch.setitem(sys.modules, "paddleocr", paddleocr)
+    monkeypatch.delitem(sys.modules, "simple_ocr_server", raising=False)
+    monkeypatch.setenv("OCR_BATCH_ENABLED", "1")
+    monkeypatch.setenv("OCR_CACHE_ENABLED", "0")
+    monkeypatch.setenv("OCR_WORKERS", "0")
+    module = importlib.import_module("simple_ocr_server")
+    FakePaddleOCR.active = FakePaddleOCR.max_active = FakePaddleOCR.calls = 0
+    yield module
+    sys.modules.pop("simple_ocr_server", None)
+
+
+def make_pdf(num_pages):
+    doc = fitz.open()
+    for page_idx in range(num_pages):
+        page = doc.new_page(width=200, height=100)
+        page.insert_text((20, 50), "page {}".format(page_idx + 1))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_pdf_and_image_requests_do_not_share_the_pipeline(server):
+    assert server.ocr_batcher is not None
+    pdf_bytes = make_pdf(4)
+    image = np.full((60, 200, 3), 255, dtype=np.uint8)
+    png_bytes = cv2.imencode(".png", image)[1].tobytes()
+
+    responses = {}
+
+    def post(name, data, repeat):
+        client = server.app.test_client()
+        body = {"file": base64.b64encode(data).decode("ascii")}
+        responses[name] = [client.post("/ocr", json=body) for _ in range(repeat)]
+
+    threads = [
+        threading.Thread(target=post, args=("pdf", pdf_bytes, 1)),
+        threading.Thread(target=post, args=("image", png_bytes, 6)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    pdf_response = responses["pdf"][0].get_json()
+    assert pdf_response["file_type"] == "pdf"
+    assert [line["page"] for line in pdf_response["results"]] == [1, 2, 3, 4]
+    for response in responses["image"]:
+        assert response.get_json()["file_type"] == "image"
+    assert FakePaddleOCR.calls >= 2
+    assert FakePaddleOCR.max_active == 1
+
+
+def encode(ext, height, width):
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    cv2.putText(image, "text", (10, height // 2), 0, 1.0, (0, 0, 0), 2)
+    return cv2.imencode(ext, image)[1].tobytes()
+
+
+def test_sniff_file_type(server):
+    png = encode(".png", 20, 30)
+    assert server.sniff_file_type(png) == ("image", "png")
+    assert server.sniff_file_type(encode(".jpg", 20, 30)) == ("image", "jpeg")
+    assert server.sniff_file_type(encode(".bmp", 20, 30)) == ("image", "bmp")
+    assert server.sniff_file_type(encode(".tiff", 20, 30)) == ("image", "tiff")
+    assert server.sniff_file_type(b"MM\x00*" + b"\x00" * 8) == ("image", "tiff")
+    assert server.sniff_file_type(b"GIF89a" + b"\x00" * 8) == ("image", "gif")
+    assert server.sniff_file_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == ("image", "webp")
+    assert server.sniff_file_type(make_pdf(1)) == ("pdf", "pdf")
+    assert server.sniff_file_type(b"\r\n%PDF-1.7") == ("pdf", "pdf")
+    assert server.sniff_file_type(bytearray(png)) == ("image", "png")
+    assert server.sniff_file_type(b"RIFF\x00\x00\x00\x00WAVEfmt ") == (None, None)
+    assert server.sniff_file_type(b"plain text") == (None, None)
+    assert server.sniff_file_type(b"") == (None, None)
+
+
+def test_decode_image_bgr_reduces_large_jpegs(server, monkeypatch):
+    flags = []
+    imdecode = cv2.imdecode
+
+    def record_imdecode(buf, flag):
+        flags.append(flag & ~cv2.IMREAD_IGNORE_ORIENTATION)
+        return imdecode(buf, flag)
+
+    monkeypatch.setattr(server.cv2, "imdecode", record_imdecode)
+    cases = [
+        # (height, width), IMREAD flag, decoded shape
+        ((3000, 4000), cv2.IMREAD_REDUCED_COLOR_2, (960, 1280, 3)),
+        ((2600, 10400), cv2.IMREAD_REDUCED_COLOR_8, (320, 1280, 3)),
+        ((1000, 2000), cv2.IMREAD_COLOR, (640, 1280, 3)),
+        ((400, 600), cv2.IMREAD_COLOR, (400, 600, 3)),
+    ]
+    for (height, width), flag, shape in cases:
+        jpeg = encode(".jpg", height, width)
+        assert server._jpeg_size(jpeg) == (width, height)
+        assert server.decode_image_bgr(jpeg, "jpeg").shape == shape
+        assert flags.pop() == flag
+    # only JPEGs are decoded reduced
+    png = encode(".png", 3000, 4000)
+    assert server.decode_image_bgr(png, "png").shape == (960, 1280, 3)
+    assert flags.pop() == cv2.IMREAD_COLOR
+    assert server.decode_image_bgr(b"\xff\xd8\xff\xe0 broken", "jpeg") is None
+
+
+def test_upload(server):
+    client = server.app.test_client()
+    png = encode(".png", 60, 200)
+
+    response = client.post(
+        "/ocr/upload",
+        data={"file": (io.BytesIO(png), "page.png")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["file_type"] == "image"
+    assert [line["text"] for line in body["results"]] == ["text"]
+
+    response = client.post(
+        "/ocr/upload", data=make_pdf(2), content_type="application/octet-stream"
+    )
+    assert response.status_code == 200
+    assert [line["page"] for line in response.get_json()["results"]] == [1, 2]
+
+    response = client.post("/ocr/upload", data=b"plain text")
+    assert response.status_code == 415
+    response = client.post("/ocr/upload", data=b"")
+    assert response.status_code == 400
+
+    # PIL recovers what it can of a truncated file, and rejects the rest
+    jpeg = encode(".jpg", 300, 400)
+    response = client.post("/ocr/upload", data=jpeg[: len(jpeg) // 2])
+    assert response.status_code == 200
+    assert response.get_json()["file_type"] == "image"
+    response = client.post("/ocr/upload", data=png[:20])
+    assert response.status_code == 400
+    assert "Could not decode image" in response.get_json()["error"]
+
+
+def post_stream(server, query, data=None):
+    client = server.app.test_client()
+    return client.post(
+        "/ocr/pdf/stream" + query,
+        data=make_pdf(4) if data is None else data,
+        content_type="application/octet-stream",
+    )
+
+
+def test_pdf_stream_ndjson(server):
+    response = post_stream(server, "?pages=2-3,1")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    records = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [record.get("page") for record in records] == [2, 3, 1, None]
+    for record in records[:-1]:
+        assert record["results"] == [
+            {
+                "text": "text",
+                "confidence": 0.9,
+                "bbox": [0, 0, 1, 1],
+                "page": record["page"],
+                "text_type": "general",
+                "model_settings": {},
+            }
+        ]
+    assert records[-1]["done"] is True
+    assert records[-1]["page_count"] == 4
+    assert records[-1]["pages_processed"] == 3
+    assert records[-1]["total_results"] == 3
+
+
+def test_pdf_stream_sse(server):
+    response = post_stream(server, "?format=sse&pages=3-")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = response.data.decode().split("\n\n")
+    assert events.pop() == ""
+    parsed = []
+    for event in events:
+        name, data = event.split("\n")
+        assert name.startswith("event: ") and data.startswith("data: ")
+        parsed.append((name[len("event: ") :], json.loads(data[len("data: ") :])))
+    assert [name for name, _ in parsed] == ["page", "page", "done"]
+    assert [record["page"] for _, record in parsed[:2]] == [3, 4]
+    assert parsed[2][1]["pages_processed"] == 2
+
+
+def test_pdf_stream_rejects_bad_requests(server):
+    assert post_stream(server, "?pages=0-2").status_code == 400
+    assert post_stream(server, "?pages=3-1").status_code == 400
+    assert post_stream(server, "?pages=x").status_code == 400
+    assert post_stream(server, "", data=encode(".png", 20, 30)).status_code == 415
+    assert post_stream(server, "", data=b"").status_code == 400
+    assert post_stream(server, "", data=b"%PDF-1.7 broken").status_code == 400
+
+
+def test_pdf_stream_error_mid_stream(server, monkeypatch):
+    ocr_bgr_image = server.ocr_bgr_image
+    calls = []
+
+    def failing_ocr(image):
+        calls.append(image.shape)
+        if len(calls) == 2:
+            raise RuntimeError("pipeline failed")
+        return ocr_bgr_image(image)
+
+    monkeypatch.setattr(server, "ocr_bgr_image", failing_ocr)
+    response = post_stream(server, "")
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert records[0]["page"] == 1
+    assert records[1] == {"error": "pipeline failed"}
+    assert len(records) == 2
+    assert len(calls) == 2
+
+
+def test_pdf_pages_are_rendered_in_memory_in_every_mode(server, monkeypatch):
+    client = server.app.test_client()
+    pdf_bytes = make_pdf(3)
+    expected = None
+    for batcher in (server.ocr_batcher, None):
+        monkeypatch.setattr(server, "ocr_batcher", batcher)
+        response = client.post(
+            "/ocr/upload", data=pdf_bytes, content_type="application/octet-stream"
+        )
+        results = response.get_json()["results"]
+        assert [line["page"] for line in results] == [1, 2, 3]
+        assert all(line["text_type"] == "general" for line in results)
+        assert expected is None or results == expected
+        expected = results
@@ -0,0 +1,98 @@
+import multiprocessing as mp
+import os
+import sys
+import time
+import types
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ocr_worker_pool import IDLE, OCRWorkerPool, _split_cores
+
+pytestmark = pytest.mark.skipif(
+    "fork" not in mp.get_all_start_methods(), reason="the stub OCR needs fork"
+)
+
+
+class StubOCR(object):
+    """
+    Echoes its inputs. "crash" kills the worker, "crash-once:<path>" kills it
+    unless <path> exists (and creates it), "error" raises.
+    """
+
+    def __init__(self, cpu_threads, **kwargs):
+        self.cpu_threads = cpu_threads
+
+    def predict_iter(self, inputs):
+        if inputs == "crash":
+            os._exit(3)
+        if isinstance(inputs, str) and inputs.startswith("crash-once:"):
+            path = inputs.split(":", 1)[1]
+            if not os.path.exists(path):
+                open(path, "w").close()
+                os._exit(3)
+        if inputs == "error":
+            raise ValueError("bad image")
+        for item in inputs if isinstance(inputs, list) else [inputs]:
+            yield types.SimpleNamespace(json={"input": item, "pid": os.getpid()})
+
+
+@pytest.fixture
+def pool():
+    pool = OCRWorkerPool(
+        2,
+        {},
+        max_attempts=2,
+        start_method="fork",
+        monitor_interval=0.05,
+        ocr_factory=StubOCR,
+    ).start(timeout=30)
+    yield pool
+    pool.close()
+
+
+def test_split_cores():
+    assert _split_cores(3, range(8)) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert _split_cores(4, [0, 1]) == [[0, 1]] * 4
+
+
+def test_predict(pool):
+    results = pool.predict(["a", "b"], timeout=30)
+    assert [r["input"] for r in results] == ["a", "b"]
+    assert pool.is_ready()
+    with pytest.raises(RuntimeError, match="bad image"):
+        pool.predict("error", timeout=30)
+    assert pool.predict("c", timeout=30)[0]["input"] == "c"
+
+
+def test_crashed_job_is_requeued(pool, tmp_path):
+    marker = str(tmp_path / "crashed")
+    results = pool.predict("crash-once:" + marker, timeout=30)
+    assert os.path.exists(marker)
+    assert results[0]["input"] == "crash-once:" + marker
+    assert sum(w["restarts"] for w in pool.health()["workers"]) == 1
+
+
+def test_job_fails_after_max_attempts(pool):
+    with pytest.raises(RuntimeError, match="crashed"):
+        pool.predict("crash", timeout=30)
+    # the crashed workers are replaced and serve the next jobs
+    assert pool.predict("d", timeout=30)[0]["input"] == "d"
+    health = pool.health()
+    assert health["queued_jobs"] == 0
+    assert sum(w["restarts"] for w in health["workers"]) >= 1
+
+
+def test_restart_workers(pool):
+    pids = {w["pid"] for w in pool.health()["workers"]}
+    pool.restart_workers()
+    results = [pool.predict(str(i), timeout=30)[0] for i in range(4)]
+    assert {r["pid"] for r in results}.isdisjoint(pids)
+    # the restart is not charged to the workers or their jobs
+    assert all(w["last_error"] is None for w in pool.health()["workers"])
+    deadline = time.monotonic() + 30
+    while not all(w["state"] == IDLE for w in pool.health()["workers"]):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
@@ -0,0 +1,168 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+onnx = pytest.importorskip("onnx")
+ort = pytest.importorskip("onnxruntime")
+
+import tools.infer.utility as utility
+from tools.infer.onnx_backend import (
+    OnnxPredictor,
+    build_session_options,
+    create_onnx_session,
+)
+
+PROVIDERS = ["CPUExecutionProvider"]
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    """y = relu(conv1x1(x)), z = 2 * x, on (N, 3, H, W) inputs of any size"""
+    from onnx import TensorProto, helper
+
+    rng = np.random.RandomState(0)
+    weight = helper.make_tensor(
+        "w", TensorProto.FLOAT, [2, 3, 1, 1], rng.randn(6).astype(np.float32)
+    )
+    two = helper.make_tensor("two", TensorProto.FLOAT, [], [2.0])
+    graph = helper.make_graph(
+        [
+            helper.make_node("Conv", ["x", "w"], ["conv"]),
+            helper.make_node("Relu", ["conv"], ["y"]),
+            helper.make_node("Mul", ["x", "two"], ["z"]),
+        ],
+        "tiny",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, ["N", 3, "H", "W"])],
+        [
+            helper.make_tensor_value_info("y", TensorProto.FLOAT, ["N", 2, "H", "W"]),
+            helper.make_tensor_value_info("z", TensorProto.FLOAT, ["N", 3, "H", "W"]),
+        ],
+        initializer=[weight, two],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    path = str(tmp_path / "tiny.onnx")
+    onnx.save(model, path)
+    return path
+
+
+def make_args(**kwargs):
+    args = utility.init_args().parse_args([])
+    for key, value in kwargs.items():
+        setattr(args, key, value)
+    return args
+
+
+def feeds(shape, num):
+    rng = np.random.RandomState(1)
+    return [{"x": rng.randn(*shape).astype(np.float32)} for _ in range(num)]
+
+
+def test_build_session_options():
+    args = make_args(
+        onnx_intra_op_threads=2,
+        onnx_inter_op_threads=1,
+        onnx_execution_mode="parallel",
+        onnx_graph_opt_level="basic",
+        onnx_mem_arena=False,
+    )
+    options = build_session_options(args)
+    assert options.intra_op_num_threads == 2
+    assert options.inter_op_num_threads == 1
+    assert options.execution_mode == ort.ExecutionMode.ORT_PARALLEL
+    assert (
+        options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    )
+    assert not options.enable_cpu_mem_arena
+
+
+def test_caller_session_options_win(model_path, tmp_path):
+    custom = ort.SessionOptions()
+    custom.intra_op_num_threads = 3
+    cache_dir = str(tmp_path / "cache")
+    args = make_args(
+        onnx_sess_options=custom, onnx_intra_op_threads=1, onnx_cache_dir=cache_dir
+    )
+    assert build_session_options(args) is custom
+    sess = create_onnx_session(args, model_path, PROVIDERS)
+    assert sess.get_session_options().intra_op_num_threads == 3
+    # the caller's options are used as they are, so nothing is cached
+    assert not os.path.exists(cache_dir)
+
+
+def test_optimized_model_cache(model_path, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    args = make_args(onnx_cache_dir=cache_dir, onnx_graph_opt_level="extended")
+    expected = ort.InferenceSession(model_path, providers=PROVIDERS)
+    feed = feeds((1, 3, 8, 8), 1)[0]
+
+    sess = create_onnx_session(args, model_path, PROVIDERS)
+    cached = os.listdir(cache_dir)
+    assert len(cached) == 1
+    assert cached[0].startswith("tiny-") and cached[0].endswith(".onnx")
+    cache_path = os.path.join(cache_dir, cached[0])
+    for out, ref in zip(sess.run(None, feed), expected.run(None, feed)):
+        np.testing.assert_allclose(out, ref, rtol=1e-6)
+
+    loaded = []
+    session_class = ort.InferenceSession
+
+    def record_session(path, **kwargs):
+        loaded.append((path, kwargs["sess_options"].graph_optimization_level))
+        return session_class(path, **kwargs)
+
+    monkeypatch.setattr(ort, "InferenceSession", record_session)
+    sess = create_onnx_session(args, model_path, PROVIDERS)
+    assert loaded == [(cache_path, ort.GraphOptimizationLevel.ORT_DISABLE_ALL)]
+    for out, ref in zip(sess.run(None, feed), expected.run(None, feed)):
+        np.testing.assert_allclose(out, ref, rtol=1e-6)
+
+    # another optimization level, or a changed model file, is a new entry
+    create_onnx_session(
+        make_args(onnx_cache_dir=cache_dir, onnx_graph_opt_level="basic"),
+        model_path,
+        PROVIDERS,
+    )
+    assert len(os.listdir(cache_dir)) == 2
+    stat = os.stat(model_path)
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    create_onnx_session(args, model_path, PROVIDERS)
+    assert len(os.listdir(cache_dir)) == 3
+    assert loaded[-1][0] == model_path
+
+
+def test_io_binding_ring(model_path):
+    sess = ort.InferenceSession(model_path, providers=PROVIDERS)
+    predictor = OnnxPredictor(sess, io_binding=True, num_buffers=3)
+    assert predictor.get_inputs()[0].name == "x"
+    inputs = feeds((2, 3, 8, 8), 6)
+    expected = [sess.run(None, feed) for feed in inputs]
+    results = [predictor.run(None, feed) for feed in inputs]
+
+    # the first call is allocated by onnxruntime, later ones cycle through
+    # the three buffer sets: each output survives two further calls
+    assert results[1][0] is results[4][0] and results[2][1] is results[5][1]
+    for i in (0, 3, 4, 5):
+        for out, ref in zip(results[i], expected[i]):
+            np.testing.assert_allclose(out, ref, rtol=1e-6)
+    np.testing.assert_allclose(results[1][0], expected[4][0], rtol=1e-6)
+
+    # other input shapes get their own ring, and subsets of the outputs too
+    other = feeds((1, 3, 16, 4), 1)[0]
+    np.testing.assert_allclose(
+        predictor.run(None, other)[1], sess.run(None, other)[1], rtol=1e-6
+    )
+    (z,) = predictor.run(["z"], inputs[0])
+    np.testing.assert_allclose(z, expected[0][1], rtol=1e-6)
+    for out, ref in zip(results[5], expected[5]):
+        np.testing.assert_allclose(out, ref, rtol=1e-6)
+
+    predictor.warmup([(1, 3, 8, 8)], repeat=2)
+    plain = OnnxPredictor(sess)
+    for out, ref in zip(plain.run(None, inputs[0]), expected[0]):
+        np.testing.assert_array_equal(out, ref)
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from tools.infer.predict_system import sorted_boxes
+from tools.infer.utility import merge_fragmented
+
+
+def rect(left, top, right, bottom):
+    return [[left, top], [right, top], [right, bottom], [left, bottom]]
+
+
+def test_sorted_boxes_groups_lines():
+    # second line starts left of the first, words within a line are jittered
+    boxes = np.array(
+        [
+            rect(300, 52, 400, 70),
+            rect(10, 12, 100, 30),
+            rect(200, 8, 290, 28),
+            rect(5, 50, 120, 70),
+            rect(110, 15, 190, 30),
+        ],
+        dtype=np.float32,
+    )
+    result = sorted_boxes(boxes)
+    assert [int(box[0][0]) for box in result] == [10, 110, 200, 5, 300]
+
+
+def test_sorted_boxes_empty():
+    assert sorted_boxes(np.zeros((0, 4, 2), dtype=np.float32)) == []
+
+
+def test_merge_fragmented_joins_slice_pieces():
+    boxes = np.array(
+        [
+            rect(0, 10, 100, 30),
+            rect(500, 10, 600, 30),
+            rect(102, 12, 200, 31),
+            rect(203, 9, 250, 30),
+        ],
+        dtype=np.float32,
+    )
+    merged = merge_fragmented(boxes, x_threshold=10, y_threshold=10)
+    assert merged.dtype == np.float32
+    np.testing.assert_array_equal(
+        merged, np.array([rect(0, 9, 250, 31), rect(500, 10, 600, 30)])
+    )
+
+
+def test_merge_fragmented_keeps_far_boxes():
+    boxes = np.array(
+        [rect(0, 10, 100, 30), rect(150, 10, 200, 30), rect(0, 60, 100, 80)],
+        dtype=np.float32,
+    )
+    np.testing.assert_array_equal(merge_fragmented(boxes), boxes)
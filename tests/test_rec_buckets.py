@@ -0,0 +1,88 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from tools.infer.predict_rec import TextRecognizer
+
+
+def make_recognizer(bucket_widths, rec_batch_num=3):
+    recognizer = TextRecognizer.__new__(TextRecognizer)
+    recognizer.rec_algorithm = "SVTR_LCNet"
+    recognizer.rec_image_shape = [3, 48, 320]
+    recognizer.rec_batch_num = rec_batch_num
+    recognizer.use_onnx = False
+    recognizer.bucket_widths = bucket_widths
+    recognizer._bucket_buffers = {}
+    recognizer.bucket_stats = {}
+    return recognizer
+
+
+def test_plan_batches_without_buckets():
+    recognizer = make_recognizer([])
+    ratios = sorted(np.random.RandomState(0).uniform(0.5, 40, 8).tolist())
+    assert recognizer.plan_batches(ratios) == [(0, 3, None), (3, 6, None), (6, 8, None)]
+    assert recognizer.plan_batches([]) == []
+
+
+def test_plan_batches_never_mix_buckets():
+    recognizer = make_recognizer([320, 480, 640])
+    # crop widths at height 48: five fit 320, two fit 480, one 640, two wider
+    widths = [40, 100, 200, 300, 320, 321, 480, 500, 641, 2000]
+    ratios = [w / 48.0 for w in widths]
+    expected = [320] * 5 + [480] * 2 + [640, None, None]
+    assert [recognizer.get_bucket_width(r) for r in ratios] == expected
+    assert recognizer.plan_batches(ratios) == [
+        (0, 3, 320),
+        (3, 5, 320),
+        (5, 7, 480),
+        (7, 8, 640),
+        (8, 10, None),
+    ]
+
+    rng = np.random.RandomState(1)
+    for _ in range(20):
+        ratios = sorted(rng.uniform(0.2, 50, rng.randint(1, 30)).tolist())
+        batches = recognizer.plan_batches(ratios)
+        assert batches[0][0] == 0 and batches[-1][1] == len(ratios)
+        for (beg, end, bucket_w), (next_beg, _, _) in zip(batches, batches[1:]):
+            assert end == next_beg
+        for beg, end, bucket_w in batches:
+            assert 0 < end - beg <= recognizer.rec_batch_num
+            assert {recognizer.get_bucket_width(r) for r in ratios[beg:end]} == {
+                bucket_w
+            }
+
+
+def test_resize_norm_img_into_matches_resize_norm_img():
+    recognizer = make_recognizer([320, 640])
+    rng = np.random.RandomState(2)
+    for h, w in [(48, 20), (30, 200), (64, 317), (20, 200), (48, 640), (10, 900)]:
+        img = rng.randint(0, 256, (h, w, 3)).astype(np.uint8)
+        for bucket_w in (320, 640):
+            expected = recognizer.resize_norm_img(img, bucket_w / 48.0)
+            out = np.full((3, 48, bucket_w), np.nan, dtype=np.float32)
+            resized_w = recognizer.resize_norm_img_into(img, out)
+            np.testing.assert_array_equal(out, expected)
+            assert resized_w == min(bucket_w, int(np.ceil(48 * w / h)))
+            assert not out[:, :, resized_w:].any()
+
+
+def test_bucket_buffers_are_reused():
+    recognizer = make_recognizer([320, 640])
+    buf = recognizer.get_bucket_buffer(320, 2)
+    assert buf.shape == (2, 3, 48, 320) and buf.dtype == np.float32
+    full = recognizer.get_bucket_buffer(320, 3)
+    assert full.shape == (3, 3, 48, 320)
+    assert np.shares_memory(buf, full)
+    other = recognizer.get_bucket_buffer(640, 1)
+    assert other.shape == (1, 3, 48, 640)
+    assert not np.shares_memory(other, full)
+    # a larger batch (e.g. after rec_batch_num changed) grows the buffer
+    grown = recognizer.get_bucket_buffer(320, 5)
+    assert grown.shape == (5, 3, 48, 320)
+    assert np.shares_memory(grown, recognizer.get_bucket_buffer(320, 1))
+    assert sorted(recognizer._bucket_buffers) == [320, 640]
@@ -0,0 +1,166 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ppocr.postprocess import build_post_process
+from ppocr.postprocess.rec_postprocess import CTCLabelDecode
+
+
+def make_ctc_output(seed, num_classes, batch_size=8, seq_len=40):
+    # Softmax-like scores where the blank wins most steps, as for real text
+    rng = np.random.RandomState(seed)
+    logits = rng.randn(batch_size, seq_len, num_classes).astype(np.float32)
+    logits[:, :, 0] += rng.uniform(0, 3, (batch_size, seq_len)).astype(np.float32)
+    logits[0] = -10.0
+    logits[0, :, 0] = 10.0  # one all-blank sample
+    preds = np.exp(logits)
+    return preds / preds.sum(axis=2, keepdims=True)
+
+
+def loop_decode(post_process, preds, **kwargs):
+    # Lists of rows take the per-sample loop
+    preds_idx = preds.argmax(axis=2)
+    preds_prob = preds.max(axis=2)
+    return post_process.decode(
+        list(preds_idx), list(preds_prob), is_remove_duplicate=True, **kwargs
+    )
+
+
+def assert_same_results(results, expected):
+    assert len(results) == len(expected)
+    for (text, score, *rest), (exp_text, exp_score, *exp_rest) in zip(
+        results, expected
+    ):
+        assert text == exp_text
+        assert isinstance(score, float)
+        assert score == pytest.approx(exp_score, rel=1e-6, abs=1e-7)
+        assert rest == exp_rest
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_ctc_decode_matches_loop(seed):
+    post_process = CTCLabelDecode()
+    preds = make_ctc_output(seed, len(post_process.character))
+    assert_same_results(post_process(preds), loop_decode(post_process, preds))
+
+
+def test_ctc_decode_word_box_matches_loop():
+    post_process = CTCLabelDecode()
+    preds = make_ctc_output(3, len(post_process.character))
+    results = post_process.decode(
+        preds.argmax(axis=2),
+        preds.max(axis=2),
+        is_remove_duplicate=True,
+        return_word_box=True,
+    )
+    expected = loop_decode(post_process, preds, return_word_box=True)
+    assert_same_results(results, expected)
+
+
+def test_ctc_decode_multichar_tokens_and_no_prob():
+    # Dict entries longer than one character fall back to joining strings
+    post_process = CTCLabelDecode()
+    post_process.character = post_process.character + ["<sep>"]
+    preds = make_ctc_output(4, len(post_process.character))
+    preds_idx = preds.argmax(axis=2)
+    preds_idx[1, 5] = len(post_process.character) - 1
+    results = post_process.decode(preds_idx, is_remove_duplicate=True)
+    expected = post_process.decode(list(preds_idx), is_remove_duplicate=True)
+    assert "<sep>" in results[1][0]
+    assert_same_results(results, expected)
+
+
+def test_ctc_decode_reverse():
+    post_process = CTCLabelDecode(use_space_char=True)
+    post_process.reverse = True
+    preds = make_ctc_output(5, len(post_process.character))
+    assert_same_results(post_process(preds), loop_decode(post_process, preds))
+
+
+def test_inherited_decode_uses_batch_path():
+    # Subclasses inheriting decode take decode_batch with their own tokens
+    class EndTokenDecode(CTCLabelDecode):
+        def get_ignored_tokens(self):
+            return [0, len(self.character) - 1]
+
+    post_process = EndTokenDecode()
+    preds = make_ctc_output(6, len(post_process.character))
+    preds_idx = preds.argmax(axis=2)
+    preds_idx[2, 10:14] = len(post_process.character) - 1
+    calls = []
+    decode_batch = post_process.decode_batch
+    post_process.decode_batch = lambda *args: calls.append(1) or decode_batch(*args)
+    results = post_process.decode(preds_idx, preds.max(axis=2), True)
+    assert calls == [1]
+    expected = post_process.decode(
+        list(preds_idx), list(preds.max(axis=2)), is_remove_duplicate=True
+    )
+    assert_same_results(results, expected)
+
+
+def make_peaked_output(post_process, texts, seq_len=40, confusions=None):
+    # Blank everywhere except one frame per character; confusions maps
+    # (sample, char position) to a look-alike and its share of the frame
+    probs = np.full((len(texts), seq_len, len(post_process.character)), 1e-4)
+    probs[:, :, 0] = 1.0
+    for b, text in enumerate(texts):
+        for j, char in enumerate(text):
+            t = 3 + 3 * j
+            probs[b, t, 0] = 0.01
+            probs[b, t, post_process.character.index(char)] = 1.0
+            if confusions and (b, j) in confusions:
+                other, share = confusions[(b, j)]
+                probs[b, t, post_process.character.index(other)] = share
+    probs /= probs.sum(axis=2, keepdims=True)
+    return probs.astype(np.float32)
+
+
+def test_beam_search_matches_greedy_on_peaked_output():
+    greedy = CTCLabelDecode()
+    beam = build_post_process({"name": "CTCBeamSearchLabelDecode", "beam_width": 5})
+    preds = make_peaked_output(greedy, ["ab12", "hello", "aab", ""])
+    assert_same_results(beam(preds), greedy(preds))
+
+    kwargs = {"wh_ratio_list": [1.0, 1.0, 0.5, 1.0], "max_wh_ratio": 2.0}
+    assert_same_results(
+        beam(preds, return_word_box=True, **kwargs),
+        greedy(preds, return_word_box=True, **kwargs),
+    )
+
+
+def test_beam_search_lexicon_and_lm(tmp_path):
+    greedy = CTCLabelDecode()
+    # "hello" with an "a" almost as likely as the "e"
+    preds = make_peaked_output(greedy, ["hello"], confusions={(0, 1): ("a", 0.9)})
+    assert greedy(preds)[0][0] == "hello"
+
+    lexicon = tmp_path / "lexicon.txt"
+    lexicon.write_text("hallo\nab12\n")
+    beam = build_post_process(
+        {"name": "CTCBeamSearchLabelDecode", "lexicon_path": str(lexicon)}
+    )
+    assert beam(preds)[0][0] == "hallo"
+
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("hallo\n" * 20 + "help\n")
+    beam = build_post_process(
+        {
+            "name": "CTCBeamSearchLabelDecode",
+            "lm_corpus_path": str(corpus),
+            "lm_weight": 1.0,
+            "num_workers": 2,
+        }
+    )
+    assert beam(preds)[0][0] == "hallo"
+
+    # nothing in the lexicon fits, fall back to the best path
+    lexicon.write_text("zzz\n")
+    beam = build_post_process(
+        {"name": "CTCBeamSearchLabelDecode", "lexicon_path": str(lexicon)}
+    )
+    assert_same_results(beam(preds), greedy(preds))
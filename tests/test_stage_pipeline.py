@@ -0,0 +1,151 @@
+import os
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from tools.infer.predict_system import TextSystem
+from tools.infer.stage_pipeline import StagePipeline
+
+
+def pipeline_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("pipeline-")]
+
+
+def sleepy(func, seed):
+    rng = np.random.RandomState(seed)
+    delays = rng.uniform(0, 0.004, 1000).tolist()
+
+    def run(x):
+        time.sleep(delays.pop())
+        return func(x)
+
+    return run
+
+
+def test_outputs_in_input_order():
+    pipeline = StagePipeline(
+        [
+            ("a", sleepy(lambda x: x + 1, 0)),
+            ("b", sleepy(lambda x: x * 2, 1)),
+            ("c", sleepy(lambda x: (x, -x), 2)),
+        ],
+        queue_size=2,
+    )
+    assert list(pipeline.run(range(50))) == [
+        ((x + 1) * 2, -(x + 1) * 2) for x in range(50)
+    ]
+    stats = pipeline.stats_dict()
+    assert list(stats) == ["a", "b", "c"]
+    assert all(s["items"] == 50 for s in stats.values())
+    assert pipeline_threads() == []
+
+
+def test_source_error_reaches_consumer():
+    def items():
+        yield from range(3)
+        raise ValueError("bad input")
+
+    pipeline = StagePipeline([("a", lambda x: x), ("b", lambda x: x * 10)])
+    outputs = []
+    with pytest.raises(ValueError, match="bad input"):
+        for x in pipeline.run(items()):
+            outputs.append(x)
+    assert outputs == [0, 10, 20]
+    assert pipeline_threads() == []
+
+
+def test_middle_stage_error_reaches_consumer():
+    def middle(x):
+        if x == 5:
+            raise RuntimeError("stage failed")
+        return x
+
+    pipeline = StagePipeline(
+        [("a", lambda x: x), ("b", middle), ("c", lambda x: x + 100)]
+    )
+    outputs = []
+    with pytest.raises(RuntimeError, match="stage failed"):
+        for x in pipeline.run(range(20)):
+            outputs.append(x)
+    assert outputs == list(range(100, 105))
+    assert pipeline_threads() == []
+
+
+def test_early_close_joins_workers():
+    def endless():
+        i = 0
+        while True:
+            yield i
+            i += 1
+
+    pipeline = StagePipeline(
+        [("a", lambda x: x), ("b", lambda x: x), ("c", lambda x: x)], queue_size=1
+    )
+    results = pipeline.run(endless())
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    assert len(pipeline_threads()) == 3
+    results.close()
+    assert pipeline_threads() == []
+
+
+class FakeDetector(object):
+    def __call__(self, img):
+        time.sleep(0.002)
+        value = int(img[0, 0, 0])
+        if value % 4 == 3:
+            return None, 0.0
+        boxes = [
+            [[2, top], [30, top], [30, top + 7], [2, top + 7]]
+            for top in range(2, 2 + 10 * (value % 4), 10)
+        ]
+        return np.array(boxes, dtype=np.float32).reshape(-1, 4, 2), 0.0
+
+
+class FakeRecognizer(object):
+    rec_image_shape = [3, 48, 320]
+
+    def __call__(self, img_crop_list):
+        time.sleep(0.002)
+        return [(str(crop.shape), 0.9) for crop in img_crop_list], 0.0
+
+
+def make_text_system():
+    text_sys = TextSystem.__new__(TextSystem)
+    text_sys.text_detector = FakeDetector()
+    text_sys.text_recognizer = FakeRecognizer()
+    text_sys.use_angle_cls = False
+    text_sys.drop_score = 0.5
+    text_sys.args = types.SimpleNamespace(
+        crop_to_rec_height=False,
+        det_box_type="quad",
+        crop_axis_tol=0,
+        save_crop_res=False,
+    )
+    text_sys.crop_image_res_index = 0
+    text_sys.pipeline = None
+    return text_sys
+
+
+def test_predict_pipelined_matches_call():
+    text_sys = make_text_system()
+    imgs = [np.full((40, 32, 3), value, dtype=np.uint8) for value in range(12)]
+    imgs[5] = None
+    expected = [text_sys(img)[:2] for img in imgs]
+    results = list(text_sys.predict_pipelined(imgs))
+    assert len(results) == len(imgs)
+    for (boxes, rec_res, time_dict), (exp_boxes, exp_rec_res) in zip(results, expected):
+        assert rec_res == exp_rec_res
+        if exp_boxes is None:
+            assert boxes is None
+        else:
+            np.testing.assert_array_equal(boxes, exp_boxes)
+        assert time_dict["all"] >= 0
+    assert set(text_sys.pipeline_stats()) == {"det", "cls", "rec"}
+    assert pipeline_threads() == []
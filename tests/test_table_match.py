@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+import ppstructure.table.matcher as matcher
+from ppstructure.table.matcher import TableMatch, compute_iou, distance
+
+
+def reference_match(dt_boxes, pred_bboxes):
+    # scalar loop of the original implementation
+    matched = {}
+    for i, box in enumerate(dt_boxes):
+        costs = []
+        for cell in pred_bboxes:
+            rect = [min(cell[0::2]), min(cell[1::2]), max(cell[0::2]), max(cell[1::2])]
+            costs.append((1.0 - compute_iou(box, rect), distance(box, rect)))
+        matched.setdefault(costs.index(min(costs)), []).append(i)
+    return matched
+
+
+@pytest.fixture
+def table():
+    rng = np.random.RandomState(0)
+    xs = np.cumsum(rng.randint(40, 120, 11))
+    ys = np.cumsum(rng.randint(20, 40, 21))
+    cells = np.array(
+        [
+            [xs[c], ys[r], xs[c + 1], ys[r], xs[c + 1], ys[r + 1], xs[c], ys[r + 1]]
+            for r in range(20)
+            for c in range(10)
+        ],
+        dtype=np.float32,
+    )
+    cells += rng.normal(0, 3, cells.shape).astype(np.float32)
+    # duplicated cells, ties go to the first one
+    cells = np.concatenate([cells, cells[:20]])
+    picked = cells[rng.randint(0, len(cells), 300)]
+    dt_boxes = np.stack(
+        [
+            picked[:, 0::2].min(axis=1) + rng.uniform(0, 10, 300),
+            picked[:, 1::2].min(axis=1) + rng.uniform(0, 5, 300),
+            picked[:, 0::2].max(axis=1) - rng.uniform(0, 10, 300),
+            picked[:, 1::2].max(axis=1) - rng.uniform(0, 5, 300),
+        ],
+        axis=1,
+    ).astype(np.float32)
+    # boxes outside every cell
+    dt_boxes = np.concatenate(
+        [dt_boxes, np.float32([[-100, -100, -50, -90], [5000, 0, 5050, 10]])]
+    )
+    return dt_boxes, cells
+
+
+def test_match_result_matches_scalar_loop(table):
+    dt_boxes, cells = table
+    assert TableMatch().match_result(dt_boxes, cells) == reference_match(
+        dt_boxes, cells
+    )
+
+
+def test_match_result_grid(table, monkeypatch):
+    dt_boxes, cells = table
+    expected = reference_match(dt_boxes, cells)
+    monkeypatch.setattr(matcher, "GRID_MIN_PAIRS", 0)
+    assert TableMatch().match_result(dt_boxes, cells) == expected
+    assert TableMatch().match_result(list(dt_boxes), cells) == expected
+
+
+def test_match_result_empty(table):
+    _, cells = table
+    assert TableMatch().match_result([], cells) == {}
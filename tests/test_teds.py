@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+pytest.importorskip("apted")
+pytest.importorskip("lxml")
+
+from ppstructure.table.table_metric import TEDS
+
+TRUE = (
+    "<html><body><table><thead><tr><td>name</td><td>value</td></tr></thead>"
+    "<tbody><tr><td>a</td><td>1</td></tr>"
+    '<tr><td colspan="2">total</td></tr></tbody></table></body></html>'
+)
+PREDS = [
+    TRUE,
+    TRUE.replace("total", "tota"),
+    TRUE.replace('<td colspan="2">total</td>', "<td>total</td><td></td>"),
+    "<html><body><table><tr><td>x</td></tr></table></body></html>",
+    "<html><body><p>no table</p></body></html>",
+    "",
+]
+# scores of the plain APTED evaluation
+EXPECTED = [1.0, 0.98, 0.8181818181818181, 0.09999999999999998, 0.0, 0.0]
+
+
+@pytest.fixture(params=[1, 2])
+def teds(request, tmp_path):
+    return TEDS(n_jobs=request.param, cache_dir=str(tmp_path))
+
+
+def test_batch_evaluate_html(teds):
+    scores = teds.batch_evaluate_html(PREDS, [TRUE] * len(PREDS))
+    assert scores == pytest.approx(EXPECTED, abs=1e-12)
+    assert teds.stats["tables"] == len(PREDS)
+    assert teds.stats["identical"] == 1
+
+
+def test_batch_evaluate_keeps_keys(teds):
+    pred_json = {str(i): pred for i, pred in enumerate(PREDS)}
+    true_json = {str(i): {"html": TRUE} for i in range(len(PREDS))}
+    scores = teds.batch_evaluate(pred_json, true_json)
+    assert [scores[str(i)] for i in range(len(PREDS))] == pytest.approx(EXPECTED)
+
+
+def test_min_score_only_changes_low_scores():
+    scores = TEDS(min_score=0.5).batch_evaluate_html(PREDS, [TRUE] * len(PREDS))
+    assert scores[:3] == pytest.approx(EXPECTED[:3])
+    assert EXPECTED[3] <= scores[3] < 0.5
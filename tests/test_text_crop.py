@@ -0,0 +1,73 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from tools.infer.utility import (
+    get_axis_aligned_rect,
+    get_minarea_rect_crop,
+    get_rotate_crop_image,
+    get_text_crop,
+)
+
+
+@pytest.fixture
+def image():
+    rng = np.random.RandomState(0)
+    return rng.randint(0, 255, (300, 400, 3)).astype(np.uint8)
+
+
+def rect(left, top, width, height):
+    return np.float32(
+        [
+            [left, top],
+            [left + width, top],
+            [left + width, top + height],
+            [left, top + height],
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "box",
+    [
+        rect(10, 20, 120, 30),
+        rect(0, 0, 400, 300),
+        rect(50, 40, 20, 90),  # vertical, rotated by 90 degrees
+    ],
+)
+def test_axis_aligned_crop_is_a_view(image, box):
+    expected = get_rotate_crop_image(image, box.copy())
+    crop = get_text_crop(image, box)
+    assert np.shares_memory(crop, image)
+    assert crop.shape == expected.shape
+    assert np.array_equal(crop, expected)
+
+
+def test_rotated_crop_matches_warp(image):
+    box = np.float32([[30, 60], [200, 40], [204, 80], [34, 100]])
+    assert get_axis_aligned_rect(box, image.shape) is None
+    expected = get_rotate_crop_image(image, box.copy())
+    assert np.array_equal(get_text_crop(image, box), expected)
+
+
+def test_poly_box_matches_minarea_crop(image):
+    poly = np.float32([[30, 60], [120, 50], [200, 40], [204, 80], [110, 92], [34, 100]])
+    expected = get_minarea_rect_crop(image, poly)
+    crop = get_text_crop(image, poly, box_type="poly")
+    assert np.array_equal(crop, expected)
+
+
+def test_axis_aligned_rect_rejects_out_of_image(image):
+    assert get_axis_aligned_rect(rect(350, 20, 60, 30), image.shape) is None
+    assert get_axis_aligned_rect(rect(10.5, 20, 60, 30), image.shape) is None
+    assert get_axis_aligned_rect(rect(10.5, 20, 60, 30), image.shape, tol=0.5)
+
+
+def test_crop_to_target_height(image):
+    crop = get_text_crop(image, rect(10, 20, 120, 30), target_height=48)
+    assert crop.shape == (48, 192, 3)
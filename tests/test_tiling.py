@@ -0,0 +1,69 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from tools.infer.tiling import TileBoxMerger, tile_grid
+
+
+def rect(left, top, right, bottom):
+    return np.array(
+        [[left, top], [right, top], [right, bottom], [left, bottom]], dtype=np.float32
+    )
+
+
+def test_tile_grid_covers_image_with_equal_tiles():
+    tiles = tile_grid(1000, 2500, 960, 960, overlap=100)
+    assert {(x1 - x0, y1 - y0) for x0, y0, x1, y1 in tiles} == {(960, 960)}
+    assert max(t[2] for t in tiles) == 2500 and max(t[3] for t in tiles) == 1000
+    xs = sorted({t[0] for t in tiles})
+    assert all(b - a <= 860 for a, b in zip(xs, xs[1:]))
+
+
+def test_tile_grid_small_image():
+    assert tile_grid(300, 400, 960, 960, overlap=100) == [(0, 0, 400, 300)]
+
+
+def test_tile_grid_caps_overlap_at_half_a_tile():
+    # an overlap past the tile size used to shrink the stride to one pixel
+    tiles = tile_grid(5000, 100, 75, 100, overlap=128)
+    assert len(tiles) == len(tile_grid(5000, 100, 75, 100, overlap=37)) == 131
+    # TextDetector.__call__ slicing a tall page with the default overlap
+    tiles = tile_grid(20000, 120, 90, 120, overlap=128)
+    assert len(tiles) <= 2 * 20000 // 90 + 1
+    for length in (500, 1000, 3333):
+        for tile in (40, 96, 333):
+            for overlap in (0, 10, tile - 1, tile, 5 * tile):
+                starts = sorted(
+                    {t[0] for t in tile_grid(10, length, 10, tile, overlap)}
+                )
+                assert len(starts) <= -(-(length - tile) // (tile - tile // 2)) + 1
+                assert starts[-1] + tile == length
+                assert all(b - a <= tile for a, b in zip(starts, starts[1:]))
+
+
+def test_merger_drops_boxes_cut_by_an_inner_border():
+    # two tiles side by side, sharing x in [800, 1000]
+    tiles = [(0, 0, 1000, 500), (800, 0, 1800, 500)]
+    merger = TileBoxMerger(tiles, (500, 1800))
+    word = rect(900, 100, 980, 130)
+    # the left tile sees it whole, the right one too; a piece is cut at x=1000
+    merger.add([word, rect(950, 200, 1000, 230)], tiles[0])
+    merger.add([word + 1, rect(950, 200, 1100, 230)], tiles[1])
+    result = merger.result()
+    assert len(result) == 2
+    np.testing.assert_array_equal(result[0], word)
+    np.testing.assert_array_equal(result[1], rect(950, 200, 1100, 230))
+
+
+def test_merger_joins_fragments_of_long_text():
+    tiles = [(0, 0, 1000, 500), (800, 0, 1800, 500)]
+    merger = TileBoxMerger(tiles, (500, 1800))
+    merger.add([rect(500, 100, 1000, 130)], tiles[0])
+    merger.add([rect(800, 102, 1500, 131)], tiles[1])
+    result = merger.result()
+    assert len(result) == 1
+    np.testing.assert_array_equal(result[0], rect(500, 100, 1500, 131))
@@ -0,0 +1,85 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import paddle
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ppocr.utils.stats import DeviceTrainingStats, TrainingStats
+
+
+def make_steps(num_steps):
+    rng = np.random.RandomState(0)
+    steps = []
+    for _ in range(num_steps):
+        steps.append(
+            {
+                "loss": paddle.to_tensor(rng.rand(), dtype="float32"),
+                "loss_ctc": paddle.to_tensor(rng.rand(3), dtype="float32"),
+                "lr": float(rng.rand()),
+            }
+        )
+    return steps
+
+
+def test_same_stats_as_host_stats():
+    host = TrainingStats(5, ["lr"])
+    device = DeviceTrainingStats(5, ["lr"])
+    for step, stats in enumerate(make_steps(12)):
+        host.update(
+            {
+                k: float(v) if v.shape == [] else v.numpy().mean()
+                for k, v in stats.items()
+                if isinstance(v, paddle.Tensor)
+            }
+        )
+        host.update({"lr": stats["lr"]})
+        device.update(stats, step=step)
+        assert len(device.pending) == step + 1
+    stats, expected = device.get(), host.get()
+    assert stats.keys() == expected.keys()
+    np.testing.assert_allclose(list(stats.values()), list(expected.values()))
+    assert device.log() == host.log()
+    assert device.pending == []
+
+
+def test_flush_history_per_step():
+    host = TrainingStats(3, ["lr"])
+    device = DeviceTrainingStats(3, ["lr"])
+    expected = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for step, stats in enumerate(make_steps(6), 1):
+            metric = {"acc": step / 10}
+            host.update(metric)
+            device.update(executor.submit(dict, metric), step=step)
+            host.update(
+                {
+                    k: v if k == "lr" else float(np.mean(v.numpy()))
+                    for k, v in stats.items()
+                }
+            )
+            device.update(stats, step=step)
+            expected.append((step, host.get()))
+        history = device.flush(history=True)
+    assert [step for step, _ in history] == list(range(1, 7))
+    for (_, stats), (_, expected_stats) in zip(history, expected):
+        assert stats.keys() == expected_stats.keys()
+        np.testing.assert_allclose(
+            list(stats.values()), list(expected_stats.values()), atol=1e-6
+        )
+    assert device.flush(history=True) == []
+
+
+def test_flush_raises_metric_errors():
+    def fail():
+        raise ValueError("metric failed")
+
+    device = DeviceTrainingStats(3, ["lr"])
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        device.update(executor.submit(fail), step=1)
+        with pytest.raises(ValueError, match="metric failed"):
+            device.get()
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from ppocr.data.imaug.text_image_aug.warp_mls import WarpMLS
+
+
+def corners(w, h):
+    return [[0, 0], [w, 0], [w, h], [0, h]]
+
+
+def sample(src, nx, ny):
+    # bilinear sampling the way WarpMLS did it before cv2.remap
+    x0, y0 = np.floor(nx).astype(int), np.floor(ny).astype(int)
+    x1, y1 = np.ceil(nx).astype(int), np.ceil(ny).astype(int)
+    fx, fy = (nx - x0)[..., None], (ny - y0)[..., None]
+    out = (src[y0, x0] * (1 - fx) + src[y0, x1] * fx) * (1 - fy) + (
+        src[y1, x0] * (1 - fx) + src[y1, x1] * fx
+    ) * fy
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def test_translation_gives_constant_displacement():
+    dst = corners(250, 40) + [[120, 20]]
+    src = [[x + 5, y - 2] for x, y in dst]
+    trans = WarpMLS(None, src, dst, 250, 40)
+    trans.calc_delta()
+    nodes = np.ix_(trans.grid_nodes(40), trans.grid_nodes(250))
+    # the MLS sums run in float32
+    np.testing.assert_allclose(trans.rdx[nodes], 5, atol=1e-2)
+    np.testing.assert_allclose(trans.rdy[nodes], -2, atol=1e-2)
+
+
+def test_node_on_control_point_takes_its_source():
+    dst = [[0, 0], [30, 10], [100, 39]]
+    src = [[3, 2], [33, 11], [90, 35]]
+    trans = WarpMLS(None, src, dst, 150, 40)
+    trans.calc_delta()
+    assert trans.rdx[0, 0] == 3 and trans.rdy[0, 0] == 2
+    # the last point is not taken as is, the others give the MLS
+    assert trans.rdx[39, 100] != -10
+
+
+def test_gen_img_matches_bilinear_sampling():
+    rng = np.random.RandomState(0)
+    img = rng.randint(0, 256, (48, 320, 3)).astype(np.uint8)
+    dst = corners(320, 48) + [[160, 0], [160, 48]]
+    src = [[x + rng.uniform(-6, 6), y + rng.uniform(-6, 6)] for x, y in dst]
+    trans = WarpMLS(img, src, dst, 320, 48)
+    out = trans.generate()
+
+    dx, dy = trans.displacement()
+    nx = np.clip(np.arange(320)[None, :] + dx, 0, 319)
+    ny = np.clip(np.arange(48)[:, None] + dy, 0, 47)
+    expected = sample(img.astype(np.float64), nx, ny)
+    diff = np.abs(out.astype(int) - expected)
+    # cv2.remap quantizes the sub-pixel offsets
+    assert diff.max() <= 1
+    assert (diff > 0).mean() < 0.01
@@ -0,0 +1,214 @@
+# Copyright (c) 2025 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+ONNX Runtime sessions for the det, cls and rec predictors.
+
+create_onnx_session builds the session from the --onnx_* args: thread counts
+and affinities, graph optimization level, memory arena, and a directory of
+optimized models so the graph optimizations run once per model. The session
+is wrapped in OnnxPredictor, which keeps the InferenceSession.run interface
+and can bind outputs to buffers reused across calls.
+"""
+
+import hashlib
+import os
+import platform
+
+import numpy as np
+
+from ppocr.utils.logging import get_logger
+
+logger = get_logger()
+
+GRAPH_OPT_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+_NUMPY_TYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(int64)": np.int64,
+    "tensor(int32)": np.int32,
+    "tensor(bool)": np.bool_,
+}
+
+
+def build_session_options(args):
+    import onnxruntime as ort
+
+    if args.onnx_sess_options:
+        # a SessionOptions built by the caller wins over the --onnx_* args
+        return args.onnx_sess_options
+    sess_options = ort.SessionOptions()
+    if args.onnx_intra_op_threads > 0:
+        sess_options.intra_op_num_threads = args.onnx_intra_op_threads
+    if args.onnx_inter_op_threads > 0:
+        sess_options.inter_op_num_threads = args.onnx_inter_op_threads
+    if args.onnx_execution_mode == "parallel":
+        sess_options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    else:
+        sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    sess_options.graph_optimization_level = getattr(
+        ort.GraphOptimizationLevel, GRAPH_OPT_LEVELS[args.onnx_graph_opt_level]
+    )
+    sess_options.enable_cpu_mem_arena = args.onnx_mem_arena
+    if args.onnx_thread_affinities:
+        # e.g. "1;2;3" or "1-2;3-4", one entry per intra-op thread but the first
+        sess_options.add_session_config_entry(
+            "session.intra_op_thread_affinities", args.onnx_thread_affinities
+        )
+    sess_options.add_session_config_entry(
+        "session.intra_op.allow_spinning", "1" if args.onnx_allow_spinning else "0"
+    )
+    return sess_options
+
+
+def _optimized_model_path(cache_dir, model_file_path, sess_options, providers):
+    import onnxruntime as ort
+
+    stat = os.stat(model_file_path)
+    key = "|".join(
+        str(v)
+        for v in (
+            os.path.realpath(model_file_path),
+            stat.st_size,
+            stat.st_mtime_ns,
+            ort.__version__,
+            # optimized graphs may use instructions of the cpu they were built on
+            platform.machine(),
+            platform.processor(),
+            sess_options.graph_optimization_level,
+            providers,
+        )
+    )
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+    name = os.path.splitext(os.path.basename(model_file_path))[0]
+    return os.path.join(cache_dir, "{}-{}.onnx".format(name, digest))
+
+
+def create_onnx_session(args, model_file_path, providers):
+    """
+    InferenceSession for model_file_path configured from args. With
+    args.onnx_cache_dir the optimized graph is saved there on the first load
+    and loaded as is afterwards; the cache key covers the model file, the
+    onnxruntime version, the machine, the optimization level and the
+    providers. Only CPU-only sessions are cached, optimized graphs of other
+    providers may hold nodes that cannot be serialized.
+    """
+    import onnxruntime as ort
+
+    sess_options = build_session_options(args)
+    cache_dir = args.onnx_cache_dir
+    cpu_only = all(
+        (p[0] if isinstance(p, tuple) else p) == "CPUExecutionProvider"
+        for p in providers
+    )
+    if not cache_dir or not cpu_only or args.onnx_sess_options:
+        return ort.InferenceSession(
+            model_file_path, providers=providers, sess_options=sess_options
+        )
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = _optimized_model_path(
+        cache_dir, model_file_path, sess_options, providers
+    )
+    if os.path.exists(cache_path):
+        sess_options.graph_optimization_level = (
+            ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        )
+        logger.debug("load optimized onnx model from {}".format(cache_path))
+        return ort.InferenceSession(
+            cache_path, providers=providers, sess_options=sess_options
+        )
+    tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+    sess_options.optimized_model_filepath = tmp_path
+    sess = ort.InferenceSession(
+        model_file_path, providers=providers, sess_options=sess_options
+    )
+    if os.path.exists(tmp_path):
+        # atomic, so concurrent processes never load a partial file
+        os.replace(tmp_path, cache_path)
+        logger.debug("optimized onnx model saved to {}".format(cache_path))
+    return sess
+
+
+class OnnxPredictor(object):
+    """
+    InferenceSession wrapper with the same run(output_names, input_feed).
+
+    With io_binding, outputs are written into preallocated buffers keyed by
+    the input shapes, so steady-state calls allocate nothing. A ring of
+    num_buffers buffer sets is kept per shape: an output array stays valid
+    until num_buffers - 1 further calls with the same input shapes, which
+    covers the batches in flight in TextDetector.predict_tiled. Other
+    attributes are those of the session.
+    """
+
+    def __init__(self, sess, io_binding=False, num_buffers=4):
+        self.sess = sess
+        self.io_binding = io_binding
+        self.num_buffers = max(1, int(num_buffers))
+        self.output_names = [o.name for o in sess.get_outputs()]
+        self._buffers = {}
+
+    def __getattr__(self, name):
+        return getattr(self.sess, name)
+
+    def run(self, output_names, input_feed, run_options=None):
+        if not self.io_binding:
+            return self.sess.run(output_names, input_feed, run_options)
+        names = output_names or self.output_names
+        key = (tuple(names),) + tuple(
+            (name, value.shape, value.dtype.str) for name, value in input_feed.items()
+        )
+        ring = self._buffers.get(key)
+        binding = self.sess.io_binding()
+        for name, value in input_feed.items():
+            binding.bind_cpu_input(name, np.ascontiguousarray(value))
+        if ring is None:
+            # first call with these shapes: let onnxruntime allocate, then
+            # keep buffers of the output shapes for the next calls
+            for name in names:
+                binding.bind_output(name, "cpu")
+            self.sess.run_with_iobinding(binding, run_options)
+            outputs = binding.copy_outputs_to_cpu()
+            self._buffers[key] = {
+                "next": 0,
+                "buffers": [
+                    [np.empty_like(out) for out in outputs]
+                    for _ in range(self.num_buffers)
+                ],
+            }
+            return outputs
+        outputs = ring["buffers"][ring["next"]]
+        ring["next"] = (ring["next"] + 1) % self.num_buffers
+        for name, out in zip(names, outputs):
+            binding.bind_output(
+                name, "cpu", 0, out.dtype, list(out.shape), out.ctypes.data
+            )
+        self.sess.run_with_iobinding(binding, run_options)
+        return outputs
+
+    def warmup(self, shapes, repeat=1):
+        """Run on zeros of each input shape, (N, C, H, W) tuples"""
+        inp = self.sess.get_inputs()[0]
+        dtype = _NUMPY_TYPES.get(inp.type, np.float32)
+        for shape in shapes:
+            feed = {inp.name: np.zeros(shape, dtype=dtype)}
+            for _ in range(repeat):
+                self.run(None, feed)
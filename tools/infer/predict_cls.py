@@ -21,7 +21,6 @@ sys.path.insert(0, os.path.abspath(os.path.join(__dir__, "../..")))
 os.environ["FLAGS_allocator_strategy"] = "auto_growth"
 
 import cv2
-import copy
 import numpy as np
 import math
 import time
@@ -60,6 +59,8 @@ class TextClassifier(object):
             _,
         ) = utility.create_predictor(args, "cls", logger)
         self.use_onnx = args.use_onnx
+        if self.use_onnx and args.onnx_warmup:
+            self.predictor.warmup([tuple([self.cls_batch_num] + self.cls_image_shape)])
 
     def resize_norm_img(self, img):
         imgC, imgH, imgW = self.cls_image_shape
@@ -84,7 +85,8 @@ class TextClassifier(object):
         return padding_im
 
     def __call__(self, img_list):
-        img_list = copy.deepcopy(img_list)
+        # rotated crops replace their entry, the arrays are never modified
+        img_list = list(img_list)
         img_num = len(img_list)
         # Calculate the aspect ratio of all text bars
         width_list = []
@@ -31,6 +31,10 @@ from ppocr.utils.utility import get_image_file_list, check_and_read
 from ppocr.data import create_operators, transform
 from ppocr.postprocess import build_post_process
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.infer.stage_pipeline import StagePipeline
+from tools.infer.tiling import TileBoxMerger, tile_grid
 
 
 class TextDetector(object):
@@ -178,6 +182,25 @@ class TextDetector(object):
                 warmup=2,
                 logger=logger,
             )
+        if self.use_onnx and args.onnx_warmup:
+            self.predictor.warmup(self.onnx_warmup_shapes())
+
+    def onnx_warmup_shapes(self):
+        """input shapes of a batch of tiles and of A4 pages at 300 dpi"""
+        shapes = []
+        tile = self.args.det_tile_size
+        for (h, w), batch_size in [
+            ((tile, tile), self.args.det_batch_num),
+            ((3508, 2480), 1),
+            ((2480, 3508), 1),
+        ]:
+            data = transform(
+                {"image": np.zeros((h, w, 3), dtype=np.uint8)}, self.preprocess_op
+            )
+            shape = (batch_size,) + data[0].shape
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
 
     def order_points_clockwise(self, pts):
         rect = np.zeros((4, 2), dtype="float32")
@@ -238,25 +261,8 @@ class TextDetector(object):
         dt_boxes = np.array(dt_boxes_new)
         return dt_boxes
 
-    def predict(self, img):
-        ori_im = img.copy()
-        data = {"image": img}
-
-        st = time.time()
-
-        if self.args.benchmark:
-            self.autolog.times.start()
-
-        data = transform(data, self.preprocess_op)
-        img, shape_list = data
-        if img is None:
-            return None, 0
-        img = np.expand_dims(img, axis=0)
-        shape_list = np.expand_dims(shape_list, axis=0)
-        img = img.copy()
-
-        if self.args.benchmark:
-            self.autolog.times.stamp()
+    def run_predictor(self, img):
+        """one forward pass over a (N, C, H, W) batch, returns the preds dict"""
         if self.use_onnx:
             input_dict = {}
             input_dict[self.input_tensor.name] = img
@@ -290,122 +296,205 @@ class TextDetector(object):
             preds["score"] = outputs[1]
         else:
             raise NotImplementedError
+        return preds
+
+    def postprocess_batch(self, preds, shape_list):
+        """run the postprocess, returns one result dict per sample"""
+        if self.det_algorithm == "FCE" and len(shape_list) > 1:
+            # FCEPostProcess only decodes the first sample of a batch
+            results = []
+            for i in range(len(shape_list)):
+                sample_preds = {k: v[i : i + 1] for k, v in preds.items()}
+                results.extend(self.postprocess_op(sample_preds, shape_list[i : i + 1]))
+            return results
+        return self.postprocess_op(preds, shape_list)
+
+    def filter_boxes(self, dt_boxes, image_shape):
+        if self.args.det_box_type == "poly":
+            return self.filter_tag_det_res_only_clip(dt_boxes, image_shape)
+        return self.filter_tag_det_res(dt_boxes, image_shape)
 
-        post_result = self.postprocess_op(preds, shape_list)
-        dt_boxes = post_result[0]["points"]
+    def predict(self, img):
+        ori_im = img.copy()
+        data = {"image": img}
 
-        if self.args.det_box_type == "poly":
-            dt_boxes = self.filter_tag_det_res_only_clip(dt_boxes, ori_im.shape)
-        else:
-            dt_boxes = self.filter_tag_det_res(dt_boxes, ori_im.shape)
+        st = time.time()
+
+        if self.args.benchmark:
+            self.autolog.times.start()
+
+        data = transform(data, self.preprocess_op)
+        img, shape_list = data
+        if img is None:
+            return None, 0
+        img = np.expand_dims(img, axis=0)
+        shape_list = np.expand_dims(shape_list, axis=0)
+        img = img.copy()
+
+        if self.args.benchmark:
+            self.autolog.times.stamp()
+        preds = self.run_predictor(img)
+
+        post_result = self.postprocess_batch(preds, shape_list)
+        dt_boxes = self.filter_boxes(post_result[0]["points"], ori_im.shape)
 
         if self.args.benchmark:
             self.autolog.times.end(stamp=True)
         et = time.time()
         return dt_boxes, et - st
 
+    def predict_batch(self, img_list, batch_size=None):
+        """
+        Detect text in several images with one forward pass per batch.
+
+        Images are preprocessed one by one and grouped by their resized
+        shape, so every batch holds inputs of exactly the shape predict()
+        would have fed for them and no padding changes the results. Images
+        that share a shape (pages of one PDF, frames, scans of one size) are
+        batched together, up to batch_size (args.det_batch_num by default).
+
+        Returns the list of dt_boxes, in the order of img_list (None for
+        images the preprocess rejected), and the total elapse.
+        """
+        if batch_size is None:
+            batch_size = self.args.det_batch_num
+        batch_size = max(1, int(batch_size))
+        st = time.time()
+        results = [None] * len(img_list)
+        groups = {}
+        for idx, img in enumerate(img_list):
+            data = transform({"image": img}, self.preprocess_op)
+            norm_img, shape = data
+            if norm_img is None:
+                continue
+            groups.setdefault(norm_img.shape, []).append((idx, norm_img, shape))
+
+        for items in groups.values():
+            for beg in range(0, len(items), batch_size):
+                batch = items[beg : beg + batch_size]
+                if self.args.benchmark:
+                    self.autolog.times.start()
+                norm_img_batch = np.stack([item[1] for item in batch])
+                shape_list = np.stack([item[2] for item in batch])
+                if self.args.benchmark:
+                    self.autolog.times.stamp()
+                preds = self.run_predictor(norm_img_batch)
+                post_result = self.postprocess_batch(preds, shape_list)
+                for (idx, _, _), res in zip(batch, post_result):
+                    results[idx] = self.filter_boxes(res["points"], img_list[idx].shape)
+                if self.args.benchmark:
+                    self.autolog.times.end(stamp=True)
+        return results, time.time() - st
+
+    def predict_tiled(
+        self, img, tile_size=None, overlap=None, batch_size=None, num_workers=None
+    ):
+        """
+        Detect text in an image too large for one forward pass.
+
+        The image is covered by overlapping tiles of tile_size (height, width)
+        (args.det_tile_size squared by default) that share overlap pixels
+        (args.det_tile_overlap). Tiles are streamed through three threads,
+        preprocessing (on num_workers threads, args.det_tile_workers),
+        inference in batches of batch_size (args.det_batch_num) and
+        postprocessing, with bounded queues in between, and their boxes go
+        straight into a TileBoxMerger, which drops the duplicates of the
+        overlaps. Per-stage utilization of the last call is in tile_stats.
+
+        Returns dt_boxes in image coordinates and the elapse.
+        """
+        st = time.time()
+        if tile_size is None:
+            tile_size = (self.args.det_tile_size, self.args.det_tile_size)
+        tile_height, tile_width = [max(1, int(v)) for v in tile_size]
+        if overlap is None:
+            overlap = self.args.det_tile_overlap
+        if batch_size is None:
+            batch_size = self.args.det_batch_num
+        if num_workers is None:
+            num_workers = self.args.det_tile_workers
+        batch_size = max(1, int(batch_size))
+
+        tiles = tile_grid(img.shape[0], img.shape[1], tile_height, tile_width, overlap)
+        merger = TileBoxMerger(tiles, img.shape)
+        pool = ThreadPoolExecutor(num_workers) if num_workers > 1 else None
+
+        def preprocess_tile(tile):
+            x0, y0, x1, y1 = tile
+            return transform({"image": img[y0:y1, x0:x1]}, self.preprocess_op)
+
+        def preprocess(batch):
+            if pool is not None:
+                datas = list(pool.map(preprocess_tile, batch))
+            else:
+                datas = [preprocess_tile(tile) for tile in batch]
+            # tiles share a size, the grouping only matters for small images
+            groups = {}
+            for tile, (norm_img, shape) in zip(batch, datas):
+                if norm_img is not None:
+                    groups.setdefault(norm_img.shape, []).append(
+                        (tile, norm_img, shape)
+                    )
+            return [
+                (
+                    [item[0] for item in items],
+                    np.stack([item[1] for item in items]),
+                    np.stack([item[2] for item in items]),
+                )
+                for items in groups.values()
+            ]
+
+        def forward(groups):
+            return [
+                (tiles, self.run_predictor(norm_img_batch), shape_list)
+                for tiles, norm_img_batch, shape_list in groups
+            ]
+
+        def postprocess(groups):
+            results = []
+            for tiles, preds, shape_list in groups:
+                post_result = self.postprocess_batch(preds, shape_list)
+                for tile, res in zip(tiles, post_result):
+                    x0, y0, x1, y1 = tile
+                    boxes = self.filter_boxes(res["points"], (y1 - y0, x1 - x0))
+                    offset = np.array([x0, y0], dtype=np.float32)
+                    results.append(([box + offset for box in boxes], tile))
+            return results
+
+        pipeline = StagePipeline(
+            [("pre", preprocess), ("det", forward), ("post", postprocess)]
+        )
+        batches = (
+            tiles[beg : beg + batch_size] for beg in range(0, len(tiles), batch_size)
+        )
+        try:
+            for results in pipeline.run(batches):
+                for boxes, tile in results:
+                    merger.add(boxes, tile)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.tile_stats = pipeline.stats_dict()
+        return merger.result(), time.time() - st
+
     def __call__(self, img, use_slice=False):
         # For image like poster with one side much greater than the other side,
-        # splitting recursively and processing with overlap to enhance performance.
-        MIN_BOUND_DISTANCE = 50
-        dt_boxes = np.zeros((0, 4, 2), dtype=np.float32)
-        elapse = 0
+        # detect on overlapping tiles as wide (or as high) as the image.
         if (
             img.shape[0] / img.shape[1] > 2
             and img.shape[0] > self.args.det_limit_side_len
             and use_slice
         ):
-            start_h = 0
-            end_h = 0
-            while end_h <= img.shape[0]:
-                end_h = start_h + img.shape[1] * 3 // 4
-                subimg = img[start_h:end_h, :]
-                if len(subimg) == 0:
-                    break
-                sub_dt_boxes, sub_elapse = self.predict(subimg)
-                offset = start_h
-                # To prevent text blocks from being cut off, roll back a certain buffer area.
-                if (
-                    len(sub_dt_boxes) == 0
-                    or img.shape[1] - max([x[-1][1] for x in sub_dt_boxes])
-                    > MIN_BOUND_DISTANCE
-                ):
-                    start_h = end_h
-                else:
-                    sorted_indices = np.argsort(sub_dt_boxes[:, 2, 1])
-                    sub_dt_boxes = sub_dt_boxes[sorted_indices]
-                    bottom_line = (
-                        0
-                        if len(sub_dt_boxes) <= 1
-                        else int(np.max(sub_dt_boxes[:-1, 2, 1]))
-                    )
-                    if bottom_line > 0:
-                        start_h += bottom_line
-                        sub_dt_boxes = sub_dt_boxes[
-                            sub_dt_boxes[:, 2, 1] <= bottom_line
-                        ]
-                    else:
-                        start_h = end_h
-                if len(sub_dt_boxes) > 0:
-                    if dt_boxes.shape[0] == 0:
-                        dt_boxes = sub_dt_boxes + np.array(
-                            [0, offset], dtype=np.float32
-                        )
-                    else:
-                        dt_boxes = np.append(
-                            dt_boxes,
-                            sub_dt_boxes + np.array([0, offset], dtype=np.float32),
-                            axis=0,
-                        )
-                elapse += sub_elapse
+            tile_size = (img.shape[1] * 3 // 4, img.shape[1])
+            return self.predict_tiled(img, tile_size)
         elif (
             img.shape[1] / img.shape[0] > 3
             and img.shape[1] > self.args.det_limit_side_len * 3
             and use_slice
         ):
-            start_w = 0
-            end_w = 0
-            while end_w <= img.shape[1]:
-                end_w = start_w + img.shape[0] * 3 // 4
-                subimg = img[:, start_w:end_w]
-                if len(subimg) == 0:
-                    break
-                sub_dt_boxes, sub_elapse = self.predict(subimg)
-                offset = start_w
-                if (
-                    len(sub_dt_boxes) == 0
-                    or img.shape[0] - max([x[-1][0] for x in sub_dt_boxes])
-                    > MIN_BOUND_DISTANCE
-                ):
-                    start_w = end_w
-                else:
-                    sorted_indices = np.argsort(sub_dt_boxes[:, 2, 0])
-                    sub_dt_boxes = sub_dt_boxes[sorted_indices]
-                    right_line = (
-                        0
-                        if len(sub_dt_boxes) <= 1
-                        else int(np.max(sub_dt_boxes[:-1, 1, 0]))
-                    )
-                    if right_line > 0:
-                        start_w += right_line
-                        sub_dt_boxes = sub_dt_boxes[sub_dt_boxes[:, 1, 0] <= right_line]
-                    else:
-                        start_w = end_w
-                if len(sub_dt_boxes) > 0:
-                    if dt_boxes.shape[0] == 0:
-                        dt_boxes = sub_dt_boxes + np.array(
-                            [offset, 0], dtype=np.float32
-                        )
-                    else:
-                        dt_boxes = np.append(
-                            dt_boxes,
-                            sub_dt_boxes + np.array([offset, 0], dtype=np.float32),
-                            axis=0,
-                        )
-                elapse += sub_elapse
-        else:
-            dt_boxes, elapse = self.predict(img)
-        return dt_boxes, elapse
+            tile_size = (img.shape[0], img.shape[0] * 3 // 4)
+            return self.predict_tiled(img, tile_size)
+        return self.predict(img)
 
 
 if __name__ == "__main__":
@@ -446,10 +535,18 @@ if __name__ == "__main__":
             if page_num > len(img) or page_num == 0:
                 page_num = len(img)
             imgs = img[:page_num]
+        batch_boxes = None
+        if len(imgs) > 1 and args.det_batch_num > 1:
+            # pages of one document share a shape, detect them in batches
+            batch_boxes, batch_elapse = text_detector.predict_batch(imgs)
         for index, img in enumerate(imgs):
             st = time.time()
-            dt_boxes, _ = text_detector(img)
-            elapse = time.time() - st
+            if batch_boxes is not None:
+                dt_boxes = batch_boxes[index]
+                elapse = batch_elapse / len(imgs)
+            else:
+                dt_boxes, _ = text_detector(img)
+                elapse = time.time() - st
             total_time += elapse
             if len(imgs) > 1:
                 save_pred = (
@@ -37,6 +37,28 @@ logger = get_logger()
 
 
 class TextRecognizer(object):
+    # algorithms whose input width does not follow the crops
+    FIXED_WIDTH_ALGORITHMS = [
+        "SAR",
+        "SRN",
+        "SVTR",
+        "SATRN",
+        "ParseQ",
+        "CPPD",
+        "CPPDPadding",
+        "VisionLAN",
+        "PREN",
+        "SPIN",
+        "ABINet",
+        "RobustScanner",
+        "CAN",
+        "LaTeXOCR",
+        "NRTR",
+        "ViTSTR",
+        "RFL",
+        "RARE",
+    ]
+
     def __init__(self, args, logger=None):
         if os.path.exists(f"{args.rec_model_dir}/inference.yml"):
             model_config = utility.load_config(f"{args.rec_model_dir}/inference.yml")
@@ -67,6 +89,7 @@ class TextRecognizer(object):
 
         if logger is None:
             logger = get_logger()
+        self.logger = logger
         self.rec_image_shape = [int(v) for v in args.rec_image_shape.split(",")]
         self.rec_batch_num = args.rec_batch_num
         self.rec_algorithm = args.rec_algorithm
@@ -171,6 +194,22 @@ class TextRecognizer(object):
                 "character_dict_path": args.rec_char_dict_path,
                 "use_space_char": args.use_space_char,
             }
+        if (
+            postprocess_params["name"] == "CTCLabelDecode"
+            and args.rec_ctc_decode == "beam_search"
+        ):
+            postprocess_params.update(
+                {
+                    "name": "CTCBeamSearchLabelDecode",
+                    "beam_width": args.rec_beam_width,
+                    "beam_topk": args.rec_beam_topk,
+                    "lexicon_path": args.rec_lexicon_path,
+                    "lm_corpus_path": args.rec_lm_corpus_path,
+                    "lm_order": args.rec_lm_order,
+                    "lm_weight": args.rec_lm_weight,
+                    "num_workers": args.rec_beam_workers,
+                }
+            )
         self.postprocess_op = build_post_process(postprocess_params)
         self.postprocess_params = postprocess_params
         (
@@ -202,6 +241,33 @@ class TextRecognizer(object):
             )
         self.return_word_box = args.return_word_box
 
+        # width buckets for the models whose input width follows the crops
+        self.bucket_widths = []
+        fixed_width = self.rec_algorithm in self.FIXED_WIDTH_ALGORITHMS
+        if self.use_onnx:
+            w = self.input_tensor.shape[3:][0]
+            fixed_width = fixed_width or (isinstance(w, int) and w > 0)
+        if args.rec_bucket_widths and not fixed_width:
+            imgW = self.rec_image_shape[2]
+            widths = [int(v) for v in str(args.rec_bucket_widths).split(",")]
+            self.bucket_widths = sorted(set([imgW] + [w for w in widths if w > imgW]))
+        self._bucket_buffers = {}
+        self.bucket_stats = {}
+        if self.use_onnx and args.onnx_warmup:
+            self.predictor.warmup(self.onnx_warmup_shapes())
+
+    def onnx_warmup_shapes(self):
+        """full batches of every width bucket"""
+        imgC, imgH, imgW = self.rec_image_shape
+        if self.use_onnx:
+            w = self.input_tensor.shape[3:][0]
+            if isinstance(w, int) and w > 0:
+                imgW = w
+        return [
+            (self.rec_batch_num, imgC, imgH, width)
+            for width in (self.bucket_widths or [imgW])
+        ]
+
     def resize_norm_img(self, img, max_wh_ratio):
         imgC, imgH, imgW = self.rec_image_shape
         if self.rec_algorithm == "NRTR" or self.rec_algorithm == "ViTSTR":
@@ -257,6 +323,107 @@ class TextRecognizer(object):
         padding_im[:, :, 0:resized_w] = resized_image
         return padding_im
 
+    def resize_norm_img_into(self, img, out):
+        """resize_norm_img writing into out, a (C, H, W) slice of a batch buffer"""
+        imgC, imgH, imgW = out.shape
+        assert imgC == img.shape[2]
+        h, w = img.shape[:2]
+        ratio = w / float(h)
+        resized_w = min(imgW, int(math.ceil(imgH * ratio)))
+        resized_image = cv2.resize(img, (resized_w, imgH))
+        target = out[:, :, 0:resized_w]
+        np.divide(resized_image.transpose((2, 0, 1)), 255, out=target, dtype=np.float32)
+        target -= 0.5
+        target /= 0.5
+        out[:, :, resized_w:] = 0
+        return resized_w
+
+    def get_bucket_width(self, wh_ratio):
+        """smallest bucket the crop fits in, None past the largest one"""
+        imgH = self.rec_image_shape[1]
+        width = int(math.ceil(imgH * wh_ratio))
+        for bucket_w in self.bucket_widths:
+            if width <= bucket_w:
+                return bucket_w
+        return None
+
+    def plan_batches(self, sorted_ratios):
+        """
+        Split crops sorted by aspect ratio into (begin, end, bucket_width)
+        batches. Batches never mix width buckets, so every input shape is one
+        of the bucket widths; crops wider than the largest bucket keep the old
+        behaviour (bucket_width None, padded to the batch's widest crop).
+        """
+        batch_num = self.rec_batch_num
+        if not self.bucket_widths:
+            return [
+                (beg, min(len(sorted_ratios), beg + batch_num), None)
+                for beg in range(0, len(sorted_ratios), batch_num)
+            ]
+        batches = []
+        beg = 0
+        while beg < len(sorted_ratios):
+            bucket_w = self.get_bucket_width(sorted_ratios[beg])
+            end = beg + 1
+            while (
+                end < len(sorted_ratios)
+                and end - beg < batch_num
+                and self.get_bucket_width(sorted_ratios[end]) == bucket_w
+            ):
+                end += 1
+            batches.append((beg, end, bucket_w))
+            beg = end
+        return batches
+
+    def get_bucket_buffer(self, bucket_w, batch_size):
+        imgC, imgH = self.rec_image_shape[:2]
+        buf = self._bucket_buffers.get(bucket_w)
+        if buf is None or buf.shape[0] < batch_size:
+            buf = np.empty(
+                (max(batch_size, self.rec_batch_num), imgC, imgH, bucket_w),
+                dtype=np.float32,
+            )
+            self._bucket_buffers[bucket_w] = buf
+        return buf[:batch_size]
+
+    def update_bucket_stats(self, width, num_crops, valid_pixels, elapse):
+        stats = self.bucket_stats.setdefault(
+            width,
+            {"batches": 0, "crops": 0, "pixels": 0, "padded_pixels": 0, "time": 0.0},
+        )
+        pixels = num_crops * self.rec_image_shape[1] * width
+        stats["batches"] += 1
+        stats["crops"] += num_crops
+        stats["pixels"] += pixels
+        stats["padded_pixels"] += pixels - valid_pixels
+        stats["time"] += elapse
+
+    def report_bucket_stats(self):
+        """log the padded pixel ratio and the throughput of each input width"""
+        if not self.bucket_stats:
+            return
+        logger = self.logger
+        total = sum(s["pixels"] for s in self.bucket_stats.values())
+        padded = sum(s["padded_pixels"] for s in self.bucket_stats.values())
+        logger.info("----------------------- Rec buckets ----------------------")
+        logger.info(
+            "padded pixel ratio: {:.4f}, input widths: {}".format(
+                padded / max(total, 1), len(self.bucket_stats)
+            )
+        )
+        for width in sorted(self.bucket_stats):
+            stats = self.bucket_stats[width]
+            logger.info(
+                "width {}: batches {}, crops {}, padded ratio {:.4f}, "
+                "{:.2f} crops/s".format(
+                    width,
+                    stats["batches"],
+                    stats["crops"],
+                    stats["padded_pixels"] / max(stats["pixels"], 1),
+                    stats["crops"] / max(stats["time"], 1e-9),
+                )
+            )
+
     def resize_norm_img_vl(self, img, image_shape):
         imgC, imgH, imgW = image_shape
         img = img[:, :, ::-1]  # bgr2rgb
@@ -575,12 +742,12 @@ class TextRecognizer(object):
         # Sorting can speed up the recognition process
         indices = np.argsort(np.array(width_list))
         rec_res = [["", 0.0]] * img_num
-        batch_num = self.rec_batch_num
+        sorted_ratios = [width_list[i] for i in indices]
         st = time.time()
         if self.benchmark:
             self.autolog.times.start()
-        for beg_img_no in range(0, img_num, batch_num):
-            end_img_no = min(img_num, beg_img_no + batch_num)
+        for beg_img_no, end_img_no, bucket_w in self.plan_batches(sorted_ratios):
+            batch_st = time.time()
             norm_img_batch = []
             if self.rec_algorithm == "SRN":
                 encoder_word_pos_list = []
@@ -597,6 +764,13 @@ class TextRecognizer(object):
                 wh_ratio = w * 1.0 / h
                 max_wh_ratio = max(max_wh_ratio, wh_ratio)
                 wh_ratio_list.append(wh_ratio)
+            valid_pixels = 0
+            if bucket_w is not None:
+                # normalize straight into the bucket's reusable input buffer
+                max_wh_ratio = bucket_w / imgH
+                norm_img_batch = self.get_bucket_buffer(
+                    bucket_w, end_img_no - beg_img_no
+                )
             for ino in range(beg_img_no, end_img_no):
                 if self.rec_algorithm == "SAR":
                     norm_img, _, _, valid_ratio = self.resize_norm_img_sar(
@@ -672,14 +846,22 @@ class TextRecognizer(object):
                     norm_img = self.norm_img_latexocr(img_list[indices[ino]])
                     norm_img = norm_img[np.newaxis, :]
                     norm_img_batch.append(norm_img)
+                elif bucket_w is not None:
+                    resized_w = self.resize_norm_img_into(
+                        img_list[indices[ino]], norm_img_batch[ino - beg_img_no]
+                    )
+                    valid_pixels += resized_w * imgH
                 else:
                     norm_img = self.resize_norm_img(
                         img_list[indices[ino]], max_wh_ratio
                     )
                     norm_img = norm_img[np.newaxis, :]
                     norm_img_batch.append(norm_img)
-            norm_img_batch = np.concatenate(norm_img_batch)
-            norm_img_batch = norm_img_batch.copy()
+                    wh_ratio = wh_ratio_list[ino - beg_img_no]
+                    resized_w = min(norm_img.shape[3], math.ceil(imgH * wh_ratio))
+                    valid_pixels += resized_w * imgH
+            if bucket_w is None:
+                norm_img_batch = np.concatenate(norm_img_batch)
             if self.benchmark:
                 self.autolog.times.stamp()
 
@@ -828,7 +1010,10 @@ class TextRecognizer(object):
                         preds = outputs
                     else:
                         preds = outputs[0]
-            if self.postprocess_params["name"] == "CTCLabelDecode":
+            if self.postprocess_params["name"] in [
+                "CTCLabelDecode",
+                "CTCBeamSearchLabelDecode",
+            ]:
                 rec_result = self.postprocess_op(
                     preds,
                     return_word_box=self.return_word_box,
@@ -842,6 +1027,13 @@ class TextRecognizer(object):
                 rec_result = self.postprocess_op(preds)
             for rno in range(len(rec_result)):
                 rec_res[indices[beg_img_no + rno]] = rec_result[rno]
+            if self.benchmark and self.rec_algorithm not in self.FIXED_WIDTH_ALGORITHMS:
+                self.update_bucket_stats(
+                    norm_img_batch.shape[3],
+                    end_img_no - beg_img_no,
+                    valid_pixels,
+                    time.time() - batch_st,
+                )
             if self.benchmark:
                 self.autolog.times.end(stamp=True)
         return rec_res, time.time() - st
@@ -896,6 +1088,7 @@ def main(args):
         )
     if args.benchmark:
         text_recognizer.autolog.report()
+        text_recognizer.report_bucket_stats()
 
 
 if __name__ == "__main__":
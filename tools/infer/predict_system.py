@@ -22,9 +22,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(__dir__, "../..")))
 os.environ["FLAGS_allocator_strategy"] = "auto_growth"
 
 import cv2
-import copy
 import numpy as np
 import json
+import collections
 import time
 import logging
 from PIL import Image
@@ -32,13 +32,17 @@ import tools.infer.utility as utility
 import tools.infer.predict_rec as predict_rec
 import tools.infer.predict_det as predict_det
 import tools.infer.predict_cls as predict_cls
-from ppocr.utils.utility import get_image_file_list, check_and_read
+from ppocr.utils.utility import (
+    get_image_file_list,
+    check_and_read,
+    get_pdf_page_count,
+    iter_pdf_pages,
+)
 from ppocr.utils.logging import get_logger
+from tools.infer.stage_pipeline import StagePipeline
 from tools.infer.utility import (
     draw_ocr_box_txt,
-    get_rotate_crop_image,
-    get_minarea_rect_crop,
-    slice_generator,
+    get_text_crop,
     merge_fragmented,
 )
 
@@ -59,6 +63,7 @@ class TextSystem(object):
 
         self.args = args
         self.crop_image_res_index = 0
+        self.pipeline = None
 
     def draw_crop_rec_res(self, output_dir, img_crop_list, rec_res):
         os.makedirs(output_dir, exist_ok=True)
@@ -81,30 +86,32 @@ class TextSystem(object):
             return None, None, time_dict
 
         start = time.time()
-        ori_im = img.copy()
+        state = self.detect_stage(img, slice, time_dict)
+        state = self.cls_stage(state, cls)
+        filter_boxes, filter_rec_res, time_dict = self.rec_stage(state)
+        time_dict["all"] = time.time() - start
+        return filter_boxes, filter_rec_res, time_dict
+
+    def detect_stage(self, img, slice={}, time_dict=None):
+        """detection, returns the state passed on to cls_stage"""
+        if time_dict is None:
+            time_dict = {"det": 0, "rec": 0, "cls": 0, "all": 0}
+        # crops are taken straight from img, nothing below modifies it
+        ori_im = img
         if slice:
-            slice_gen = slice_generator(
+            dt_boxes, elapse = self.text_detector.predict_tiled(
                 img,
-                horizontal_stride=slice["horizontal_stride"],
-                vertical_stride=slice["vertical_stride"],
-            )
-            elapsed = []
-            dt_slice_boxes = []
-            for slice_crop, v_start, h_start in slice_gen:
-                dt_boxes, elapse = self.text_detector(slice_crop, use_slice=True)
-                if dt_boxes.size:
-                    dt_boxes[:, :, 0] += h_start
-                    dt_boxes[:, :, 1] += v_start
-                    dt_slice_boxes.append(dt_boxes)
-                    elapsed.append(elapse)
-            dt_boxes = np.concatenate(dt_slice_boxes)
-
-            dt_boxes = merge_fragmented(
-                boxes=dt_boxes,
-                x_threshold=slice["merge_x_thres"],
-                y_threshold=slice["merge_y_thres"],
+                tile_size=(slice["vertical_stride"], slice["horizontal_stride"]),
+                # slices did not overlap before the key existed
+                overlap=slice.get("overlap", 0),
             )
-            elapse = sum(elapsed)
+            # text longer than the overlap comes back in pieces
+            if len(dt_boxes):
+                dt_boxes = merge_fragmented(
+                    boxes=dt_boxes,
+                    x_threshold=slice["merge_x_thres"],
+                    y_threshold=slice["merge_y_thres"],
+                )
         else:
             dt_boxes, elapse = self.text_detector(img)
 
@@ -112,23 +119,32 @@ class TextSystem(object):
 
         if dt_boxes is None:
             logger.debug("no dt_boxes found, elapsed : {}".format(elapse))
-            end = time.time()
-            time_dict["all"] = end - start
-            return None, None, time_dict
         else:
             logger.debug(
                 "dt_boxes num : {}, elapsed : {}".format(len(dt_boxes), elapse)
             )
+        return ori_im, dt_boxes, time_dict
+
+    def cls_stage(self, state, cls=True):
+        """cropping and angle classification of the detected boxes"""
+        ori_im, dt_boxes, time_dict = state
+        if dt_boxes is None:
+            return None, None, time_dict
         img_crop_list = []
 
         dt_boxes = sorted_boxes(dt_boxes)
 
-        for bno in range(len(dt_boxes)):
-            tmp_box = copy.deepcopy(dt_boxes[bno])
-            if self.args.det_box_type == "quad":
-                img_crop = get_rotate_crop_image(ori_im, tmp_box)
-            else:
-                img_crop = get_minarea_rect_crop(ori_im, tmp_box)
+        target_height = None
+        if self.args.crop_to_rec_height:
+            target_height = self.text_recognizer.rec_image_shape[1]
+        for box in dt_boxes:
+            img_crop = get_text_crop(
+                ori_im,
+                box,
+                self.args.det_box_type,
+                target_height=target_height,
+                axis_tol=self.args.crop_axis_tol,
+            )
             img_crop_list.append(img_crop)
         if self.use_angle_cls and cls:
             img_crop_list, angle_list, elapse = self.text_classifier(img_crop_list)
@@ -140,6 +156,13 @@ class TextSystem(object):
             logger.debug(
                 f"rec crops num: {len(img_crop_list)}, time and memory cost may be large."
             )
+        return dt_boxes, img_crop_list, time_dict
+
+    def rec_stage(self, state):
+        """recognition and drop_score filtering"""
+        dt_boxes, img_crop_list, time_dict = state
+        if dt_boxes is None:
+            return None, None, time_dict
 
         rec_res, elapse = self.text_recognizer(img_crop_list)
         time_dict["rec"] = elapse
@@ -152,10 +175,48 @@ class TextSystem(object):
             if score >= self.drop_score:
                 filter_boxes.append(box)
                 filter_rec_res.append(rec_result)
-        end = time.time()
-        time_dict["all"] = end - start
         return filter_boxes, filter_rec_res, time_dict
 
+    def predict_pipelined(self, imgs, cls=True, slice={}, queue_size=2):
+        """
+        Run det, cls and rec of successive images concurrently, one thread
+        per stage, so image k+1 is detected while image k is recognized.
+        Yields (dt_boxes, rec_res, time_dict) in the order of imgs, the same
+        results __call__ gives; time_dict["all"] is the image's latency
+        through the pipeline. Per-stage utilization is available from
+        pipeline_stats() afterwards.
+        """
+
+        def det(img):
+            time_dict = {"det": 0, "rec": 0, "cls": 0, "all": 0}
+            start = time.time()
+            if img is None:
+                logger.debug("no valid image provided")
+                return start, (None, None, time_dict)
+            return start, self.detect_stage(img, slice, time_dict)
+
+        def cls_(item):
+            start, state = item
+            if state[0] is None:
+                return start, (None, None, state[2])
+            return start, self.cls_stage(state, cls)
+
+        def rec(item):
+            start, state = item
+            filter_boxes, filter_rec_res, time_dict = self.rec_stage(state)
+            time_dict["all"] = time.time() - start
+            return filter_boxes, filter_rec_res, time_dict
+
+        self.pipeline = StagePipeline(
+            [("det", det), ("cls", cls_), ("rec", rec)], queue_size=queue_size
+        )
+        return self.pipeline.run(imgs)
+
+    def pipeline_stats(self):
+        if self.pipeline is None:
+            return {}
+        return self.pipeline.stats_dict()
+
 
 def sorted_boxes(dt_boxes):
     """
@@ -164,22 +225,59 @@ def sorted_boxes(dt_boxes):
         dt_boxes(array):detected text boxes with shape [4, 2]
     return:
         sorted boxes(array) with shape [4, 2]
+
+    Boxes are taken by their top-left corner in (y, x) order and grouped into
+    lines: a box starts a new line unless it is less than 10 pixels below the
+    first box of the current line. Lines are then ordered left to right, so
+    the cost is O(n log n) however dense the page is.
     """
-    num_boxes = dt_boxes.shape[0]
-    sorted_boxes = sorted(dt_boxes, key=lambda x: (x[0][1], x[0][0]))
-    _boxes = list(sorted_boxes)
-
-    for i in range(num_boxes - 1):
-        for j in range(i, -1, -1):
-            if abs(_boxes[j + 1][0][1] - _boxes[j][0][1]) < 10 and (
-                _boxes[j + 1][0][0] < _boxes[j][0][0]
-            ):
-                tmp = _boxes[j]
-                _boxes[j] = _boxes[j + 1]
-                _boxes[j + 1] = tmp
-            else:
-                break
-    return _boxes
+    num_boxes = len(dt_boxes)
+    if num_boxes == 0:
+        return []
+    corners = np.array([box[0] for box in dt_boxes], dtype=np.float64)
+    order = np.lexsort((corners[:, 0], corners[:, 1]))
+    ys = corners[order, 1].tolist()
+    line_ids = np.empty(num_boxes, dtype=np.int64)
+    line, line_y = 0, ys[0]
+    for i, y in enumerate(ys):
+        if y - line_y >= 10:
+            line, line_y = line + 1, y
+        line_ids[i] = line
+    # stable, so boxes with the same x keep their top to bottom order
+    order = order[np.lexsort((corners[order, 0], line_ids))]
+    return [dt_boxes[i] for i in order]
+
+
+def iter_inputs(image_file_list, args):
+    """
+    Yield (idx, image_file, page index, multi_page, flag_gif, flag_pdf, img)
+    for every image and pdf page in image_file_list.
+    """
+    for idx, image_file in enumerate(image_file_list):
+        if os.path.basename(image_file)[-3:].lower() == "pdf":
+            # pages are rendered in the background while earlier ones are OCRed
+            flag_gif, flag_pdf = False, True
+            page_num = get_pdf_page_count(image_file)
+            if 0 < args.page_num < page_num:
+                page_num = args.page_num
+            multi_page = page_num > 1
+            imgs = iter_pdf_pages(
+                image_file,
+                page_num=page_num,
+                num_workers=args.pdf_render_workers,
+                prefetch=args.pdf_prefetch,
+            )
+        else:
+            img, flag_gif, flag_pdf = check_and_read(image_file)
+            if not flag_gif:
+                img = cv2.imread(image_file)
+            if img is None:
+                logger.debug("error in loading image:{}".format(image_file))
+                continue
+            multi_page = False
+            imgs = [img]
+        for index, img in enumerate(imgs):
+            yield idx, image_file, index, multi_page, flag_gif, flag_pdf, img
 
 
 def main(args):
@@ -208,98 +306,120 @@ def main(args):
     cpu_mem, gpu_mem, gpu_util = 0, 0, 0
     _st = time.time()
     count = 0
-    for idx, image_file in enumerate(image_file_list):
-        img, flag_gif, flag_pdf = check_and_read(image_file)
-        if not flag_gif and not flag_pdf:
-            img = cv2.imread(image_file)
-        if not flag_pdf:
-            if img is None:
-                logger.debug("error in loading image:{}".format(image_file))
-                continue
-            imgs = [img]
+    inputs = iter_inputs(image_file_list, args)
+    if args.use_pipeline:
+        # det of the next image overlaps cls/rec of the current one
+        metas = collections.deque()
+
+        def pipeline_imgs():
+            for meta in inputs:
+                metas.append(meta)
+                yield meta[-1]
+
+        def results():
+            for dt_boxes, rec_res, time_dict in text_sys.predict_pipelined(
+                pipeline_imgs(), queue_size=args.pipeline_queue_size
+            ):
+                yield metas.popleft() + (dt_boxes, rec_res, time_dict["all"])
+
+    else:
+
+        def results():
+            for meta in inputs:
+                starttime = time.time()
+                dt_boxes, rec_res, time_dict = text_sys(meta[-1])
+                yield meta + (dt_boxes, rec_res, time.time() - starttime)
+
+    for (
+        idx,
+        image_file,
+        index,
+        multi_page,
+        flag_gif,
+        flag_pdf,
+        img,
+        dt_boxes,
+        rec_res,
+        elapse,
+    ) in results():
+        total_time += elapse
+        if multi_page:
+            logger.debug(
+                str(idx)
+                + "_"
+                + str(index)
+                + "  Predict time of %s: %.3fs" % (image_file, elapse)
+            )
         else:
-            page_num = args.page_num
-            if page_num > len(img) or page_num == 0:
-                page_num = len(img)
-            imgs = img[:page_num]
-        for index, img in enumerate(imgs):
-            starttime = time.time()
-            dt_boxes, rec_res, time_dict = text_sys(img)
-            elapse = time.time() - starttime
-            total_time += elapse
-            if len(imgs) > 1:
-                logger.debug(
-                    str(idx)
-                    + "_"
-                    + str(index)
-                    + "  Predict time of %s: %.3fs" % (image_file, elapse)
-                )
-            else:
-                logger.debug(
-                    str(idx) + "  Predict time of %s: %.3fs" % (image_file, elapse)
-                )
-            for text, score in rec_res:
-                logger.debug("{}, {:.3f}".format(text, score))
-
-            res = [
-                {
-                    "transcription": rec_res[i][0],
-                    "points": np.array(dt_boxes[i]).astype(np.int32).tolist(),
-                }
-                for i in range(len(dt_boxes))
-            ]
-            if len(imgs) > 1:
-                save_pred = (
-                    os.path.basename(image_file)
-                    + "_"
-                    + str(index)
-                    + "\t"
-                    + json.dumps(res, ensure_ascii=False)
-                    + "\n"
-                )
+            logger.debug(
+                str(idx) + "  Predict time of %s: %.3fs" % (image_file, elapse)
+            )
+        for text, score in rec_res:
+            logger.debug("{}, {:.3f}".format(text, score))
+
+        res = [
+            {
+                "transcription": rec_res[i][0],
+                "points": np.array(dt_boxes[i]).astype(np.int32).tolist(),
+            }
+            for i in range(len(dt_boxes))
+        ]
+        if multi_page:
+            save_pred = (
+                os.path.basename(image_file)
+                + "_"
+                + str(index)
+                + "\t"
+                + json.dumps(res, ensure_ascii=False)
+                + "\n"
+            )
+        else:
+            save_pred = (
+                os.path.basename(image_file)
+                + "\t"
+                + json.dumps(res, ensure_ascii=False)
+                + "\n"
+            )
+        save_results.append(save_pred)
+
+        if is_visualize:
+            image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            boxes = dt_boxes
+            txts = [rec_res[i][0] for i in range(len(rec_res))]
+            scores = [rec_res[i][1] for i in range(len(rec_res))]
+
+            draw_img = draw_ocr_box_txt(
+                image,
+                boxes,
+                txts,
+                scores,
+                drop_score=drop_score,
+                font_path=font_path,
+            )
+            if flag_gif:
+                save_file = image_file[:-3] + "png"
+            elif flag_pdf:
+                save_file = image_file.replace(".pdf", "_" + str(index) + ".png")
             else:
-                save_pred = (
-                    os.path.basename(image_file)
-                    + "\t"
-                    + json.dumps(res, ensure_ascii=False)
-                    + "\n"
-                )
-            save_results.append(save_pred)
-
-            if is_visualize:
-                image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-                boxes = dt_boxes
-                txts = [rec_res[i][0] for i in range(len(rec_res))]
-                scores = [rec_res[i][1] for i in range(len(rec_res))]
-
-                draw_img = draw_ocr_box_txt(
-                    image,
-                    boxes,
-                    txts,
-                    scores,
-                    drop_score=drop_score,
-                    font_path=font_path,
-                )
-                if flag_gif:
-                    save_file = image_file[:-3] + "png"
-                elif flag_pdf:
-                    save_file = image_file.replace(".pdf", "_" + str(index) + ".png")
-                else:
-                    save_file = image_file
-                cv2.imwrite(
-                    os.path.join(draw_img_save_dir, os.path.basename(save_file)),
-                    draw_img[:, :, ::-1],
-                )
-                logger.debug(
-                    "The visualized image saved in {}".format(
-                        os.path.join(draw_img_save_dir, os.path.basename(save_file))
-                    )
+                save_file = image_file
+            cv2.imwrite(
+                os.path.join(draw_img_save_dir, os.path.basename(save_file)),
+                draw_img[:, :, ::-1],
+            )
+            logger.debug(
+                "The visualized image saved in {}".format(
+                    os.path.join(draw_img_save_dir, os.path.basename(save_file))
                 )
+            )
 
     logger.info("The predict total time is {}".format(time.time() - _st))
     if args.benchmark:
         text_sys.text_detector.autolog.report()
         text_sys.text_recognizer.autolog.report()
+        text_sys.text_recognizer.report_bucket_stats()
+    if args.use_pipeline:
+        for name, stats in text_sys.pipeline_stats().items():
+            logger.info("pipeline stage {}: {}".format(name, stats))
 
     with open(
         os.path.join(draw_img_save_dir, "system_results.txt"), "w", encoding="utf-8"
@@ -0,0 +1,164 @@
+# Copyright (c) 2025 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Linear stage pipeline: one worker thread per stage, stages connected by
+bounded queues, results yielded in input order.
+"""
+
+import queue
+import threading
+import time
+
+_END = object()
+
+
+class _Failure(object):
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class StageStats(object):
+    """Busy and blocked time of one stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.wait_input = 0.0
+        self.wait_output = 0.0
+        self.start = None
+        self.stop = None
+
+    def as_dict(self):
+        wall = 0.0
+        if self.start is not None:
+            wall = (self.stop or time.time()) - self.start
+        return {
+            "items": self.items,
+            "busy": round(self.busy, 4),
+            "wait_input": round(self.wait_input, 4),
+            "wait_output": round(self.wait_output, 4),
+            "utilization": round(self.busy / wall, 4) if wall > 0 else 0.0,
+        }
+
+
+class StagePipeline(object):
+    """
+    Run items through stages concurrently.
+
+    Args:
+        stages (list): (name, func) pairs; func maps the output of the
+            previous stage to the input of the next one.
+        queue_size (int): capacity of the queue in front of every stage after
+            the first, bounds the number of items in flight.
+
+    Stage utilization is busy time over the stage's wall time; the stage
+    closest to 1.0 is the bottleneck, the others mostly wait on it.
+    """
+
+    def __init__(self, stages, queue_size=2):
+        self.stages = list(stages)
+        self.queue_size = max(1, int(queue_size))
+        self.stats = [StageStats(name) for name, _ in self.stages]
+
+    def _put(self, q, item, stop, stats):
+        t0 = time.time()
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.wait_output += time.time() - t0
+
+    def _source(self, items, func, out_q, stop, stats):
+        stats.start = time.time()
+        try:
+            iterator = iter(items)
+            while not stop.is_set():
+                t0 = time.time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.wait_input += time.time() - t0
+                t0 = time.time()
+                result = func(item)
+                stats.busy += time.time() - t0
+                stats.items += 1
+                self._put(out_q, result, stop, stats)
+        except Exception as e:
+            self._put(out_q, _Failure(e), stop, stats)
+        finally:
+            self._put(out_q, _END, stop, stats)
+            stats.stop = time.time()
+
+    def _worker(self, func, in_q, out_q, stop, stats):
+        stats.start = time.time()
+        while not stop.is_set():
+            t0 = time.time()
+            try:
+                item = in_q.get(timeout=0.1)
+            except queue.Empty:
+                stats.wait_input += time.time() - t0
+                continue
+            stats.wait_input += time.time() - t0
+            if item is _END or isinstance(item, _Failure):
+                self._put(out_q, item, stop, stats)
+                break
+            t0 = time.time()
+            try:
+                result = func(item)
+            except Exception as e:
+                result = _Failure(e)
+            stats.busy += time.time() - t0
+            stats.items += 1
+            self._put(out_q, result, stop, stats)
+        stats.stop = time.time()
+
+    def run(self, items):
+        """Yield the output of the last stage for every item, in order"""
+        self.stats = [StageStats(name) for name, _ in self.stages]
+        stop = threading.Event()
+        queues = [queue.Queue(self.queue_size) for _ in self.stages]
+        threads = []
+        for i, (name, func) in enumerate(self.stages):
+            if i == 0:
+                target, args = self._source, (items, func, queues[0])
+            else:
+                target, args = self._worker, (func, queues[i - 1], queues[i])
+            thread = threading.Thread(
+                target=target,
+                args=args + (stop, self.stats[i]),
+                name="pipeline-{}".format(name),
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.exc
+                yield item
+        finally:
+            # also reached when the consumer stops iterating early
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def stats_dict(self):
+        return {stats.name: stats.as_dict() for stats in self.stats}
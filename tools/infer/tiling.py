@@ -0,0 +1,208 @@
+# Copyright (c) 2025 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tiling of oversized images for text detection.
+
+tile_grid covers an image with overlapping tiles of one size, so tiles can
+be batched. TileBoxMerger collects the boxes detected in every tile as they
+come and removes the duplicates the overlaps produce.
+"""
+
+import bisect
+
+import numpy as np
+
+
+def _tile_starts(length, tile, overlap):
+    if length <= tile:
+        return [0]
+    # past half a tile every pixel would be covered by three tiles or more
+    overlap = max(0, min(overlap, tile // 2))
+    stride = tile - overlap
+    starts = list(range(0, length - tile, stride))
+    # the last tile ends at the border, overlapping its neighbour a bit more
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(height, width, tile_height, tile_width, overlap=0):
+    """
+    (x0, y0, x1, y1) of tiles covering a height x width image. Neighbouring
+    tiles share at least overlap pixels, which is capped at half a tile; all
+    tiles have the same size, unless the image is smaller than a tile along
+    an axis.
+    """
+    xs = _tile_starts(width, tile_width, overlap)
+    ys = _tile_starts(height, tile_height, overlap)
+    return [
+        (x0, y0, min(x0 + tile_width, width), min(y0 + tile_height, height))
+        for y0 in ys
+        for x0 in xs
+    ]
+
+
+class TileBoxMerger(object):
+    """
+    Streaming deduplication of the boxes of overlapping tiles.
+
+    A box touching an inner tile border (within edge_margin pixels) is cut.
+    It is dropped when another tile of the grid holds it whole, since that
+    tile reports it; otherwise it is a fragment of text longer than the
+    overlap and is joined, as an axis-aligned rectangle, with the fragments
+    it overlaps on the same line (vertical overlap of at least line_thresh of
+    the shorter box). Otherwise boxes whose intersection covers dup_thresh of
+    the smaller one are duplicates, the larger is kept.
+
+    Kept boxes are found through a grid index with cells of cell_size pixels,
+    so each added box is only compared with its neighbours, and only the kept
+    boxes are held in memory.
+    """
+
+    def __init__(
+        self,
+        tiles,
+        image_shape,
+        edge_margin=4,
+        dup_thresh=0.7,
+        line_thresh=0.7,
+        cell_size=128,
+    ):
+        self.height, self.width = image_shape[0:2]
+        self.edge_margin = edge_margin
+        self.dup_thresh = dup_thresh
+        self.line_thresh = line_thresh
+        self.cell_size = cell_size
+        self.tile_xs = sorted({(t[0], t[2]) for t in tiles})
+        self.tile_ys = sorted({(t[1], t[3]) for t in tiles})
+        self.boxes = {}
+        self.rects = {}
+        self.fragments = {}
+        self.grid = {}
+        self.next_id = 0
+
+    def _covered(self, lo, hi, spans, size):
+        # whether one of the tile spans holds [lo, hi] away from inner borders
+        pos = bisect.bisect_right(spans, (lo, size))
+        for start, end in spans[max(0, pos - 2) : pos]:
+            inner_lo = start + (self.edge_margin if start > 0 else 0)
+            inner_hi = end - (self.edge_margin if end < size else 0)
+            if inner_lo <= lo and hi <= inner_hi:
+                return True
+        return False
+
+    def _cells(self, rect):
+        c = self.cell_size
+        for gx in range(int(rect[0] // c), int(rect[2] // c) + 1):
+            for gy in range(int(rect[1] // c), int(rect[3] // c) + 1):
+                yield gx, gy
+
+    def _insert(self, box, rect, fragment):
+        box_id = self.next_id
+        self.next_id += 1
+        self.boxes[box_id] = box
+        self.rects[box_id] = rect
+        self.fragments[box_id] = fragment
+        for cell in self._cells(rect):
+            self.grid.setdefault(cell, set()).add(box_id)
+        return box_id
+
+    def _remove(self, box_id):
+        rect = self.rects.pop(box_id)
+        del self.boxes[box_id]
+        del self.fragments[box_id]
+        for cell in self._cells(rect):
+            self.grid[cell].discard(box_id)
+
+    def _neighbours(self, rect):
+        ids = set()
+        for cell in self._cells(rect):
+            ids.update(self.grid.get(cell, ()))
+        return ids
+
+    def add(self, boxes, tile):
+        """Add the boxes (page coordinates) detected in tile (x0, y0, x1, y1)"""
+        x0, y0, x1, y1 = tile
+        m = self.edge_margin
+        for box in boxes:
+            rect = (
+                float(box[:, 0].min()),
+                float(box[:, 1].min()),
+                float(box[:, 0].max()),
+                float(box[:, 1].max()),
+            )
+            cut = (
+                (x0 > 0 and rect[0] <= x0 + m)
+                or (y0 > 0 and rect[1] <= y0 + m)
+                or (x1 < self.width and rect[2] >= x1 - m)
+                or (y1 < self.height and rect[3] >= y1 - m)
+            )
+            if cut and (
+                self._covered(rect[0], rect[2], self.tile_xs, self.width)
+                and self._covered(rect[1], rect[3], self.tile_ys, self.height)
+            ):
+                continue
+            self._add_box(np.asarray(box, dtype=np.float32), rect, cut)
+
+    def _add_box(self, box, rect, fragment):
+        area = (rect[2] - rect[0]) * (rect[3] - rect[1])
+        changed = True
+        while changed:
+            changed = False
+            for other in self._neighbours(rect):
+                o = self.rects[other]
+                iw = min(rect[2], o[2]) - max(rect[0], o[0])
+                ih = min(rect[3], o[3]) - max(rect[1], o[1])
+                if iw <= 0 or ih <= 0:
+                    continue
+                o_area = (o[2] - o[0]) * (o[3] - o[1])
+                if fragment and self.fragments[other]:
+                    min_h = min(rect[3] - rect[1], o[3] - o[1])
+                    if ih < self.line_thresh * min_h:
+                        continue
+                    # pieces of one line, keep their union
+                    rect = (
+                        min(rect[0], o[0]),
+                        min(rect[1], o[1]),
+                        max(rect[2], o[2]),
+                        max(rect[3], o[3]),
+                    )
+                    box = np.array(
+                        [
+                            [rect[0], rect[1]],
+                            [rect[2], rect[1]],
+                            [rect[2], rect[3]],
+                            [rect[0], rect[3]],
+                        ],
+                        dtype=np.float32,
+                    )
+                    area = (rect[2] - rect[0]) * (rect[3] - rect[1])
+                    fragment = True
+                elif iw * ih < self.dup_thresh * min(area, o_area):
+                    continue
+                elif o_area >= area:
+                    # duplicate of a box already kept
+                    return
+                self._remove(other)
+                changed = True
+                break
+        self._insert(box, rect, fragment)
+
+    def result(self):
+        """Kept boxes in insertion order, a list if their shapes differ (polys)"""
+        if not self.boxes:
+            return np.zeros((0, 4, 2), dtype=np.float32)
+        boxes = [self.boxes[i] for i in sorted(self.boxes)]
+        if len({box.shape for box in boxes}) > 1:
+            return boxes
+        return np.stack(boxes)
@@ -25,6 +25,7 @@ from paddle import inference
 import random
 import yaml
 from ppocr.utils.logging import get_logger
+from tools.infer.onnx_backend import OnnxPredictor, create_onnx_session
 
 
 def str2bool(v):
@@ -58,11 +59,23 @@ def init_args():
     # params for text detector
     parser.add_argument("--image_dir", type=str)
     parser.add_argument("--page_num", type=int, default=0)
+    parser.add_argument("--pdf_render_workers", type=int, default=1)
+    parser.add_argument("--pdf_prefetch", type=int, default=4)
     parser.add_argument("--det_algorithm", type=str, default="DB")
     parser.add_argument("--det_model_dir", type=str)
     parser.add_argument("--det_limit_side_len", type=float, default=960)
     parser.add_argument("--det_limit_type", type=str, default="max")
     parser.add_argument("--det_box_type", type=str, default="quad")
+    # max images per forward pass in TextDetector.predict_batch
+    parser.add_argument("--det_batch_num", type=int, default=4)
+    # tiled detection of oversized images, see TextDetector.predict_tiled
+    parser.add_argument("--det_tile_size", type=int, default=960)
+    parser.add_argument("--det_tile_overlap", type=int, default=128)
+    parser.add_argument("--det_tile_workers", type=int, default=2)
+    # crop text boxes straight to the rec input height; axis tolerance in
+    # pixels under which quads are cropped by slicing instead of warping
+    parser.add_argument("--crop_to_rec_height", type=str2bool, default=False)
+    parser.add_argument("--crop_axis_tol", type=float, default=0.0)
 
     # DB params
     parser.add_argument("--det_db_thresh", type=float, default=0.3)
@@ -99,11 +112,24 @@ def init_args():
     parser.add_argument("--rec_image_inverse", type=str2bool, default=True)
     parser.add_argument("--rec_image_shape", type=str, default="3, 48, 320")
     parser.add_argument("--rec_batch_num", type=int, default=6)
+    # input widths recognition batches are padded to (e.g.
+    # "320,400,480,640,800,960,1280,1600"); empty pads each batch to its
+    # widest crop
+    parser.add_argument("--rec_bucket_widths", type=str, default="")
     parser.add_argument("--max_text_length", type=int, default=25)
     parser.add_argument(
         "--rec_char_dict_path", type=str, default="./ppocr/utils/ppocr_keys_v1.txt"
     )
     parser.add_argument("--use_space_char", type=str2bool, default=True)
+    # ctc decoding: "greedy" or "beam_search"
+    parser.add_argument("--rec_ctc_decode", type=str, default="greedy")
+    parser.add_argument("--rec_beam_width", type=int, default=10)
+    parser.add_argument("--rec_beam_topk", type=int, default=10)
+    parser.add_argument("--rec_lexicon_path", type=str, default=None)
+    parser.add_argument("--rec_lm_corpus_path", type=str, default=None)
+    parser.add_argument("--rec_lm_order", type=int, default=3)
+    parser.add_argument("--rec_lm_weight", type=float, default=0.5)
+    parser.add_argument("--rec_beam_workers", type=int, default=0)
     parser.add_argument("--vis_font_path", type=str, default="./doc/fonts/simfang.ttf")
     parser.add_argument("--drop_score", type=float, default=0.5)
 
@@ -149,6 +175,10 @@ def init_args():
     parser.add_argument("--total_process_num", type=int, default=1)
     parser.add_argument("--process_id", type=int, default=0)
 
+    # overlap det/cls/rec of successive images, one thread per stage
+    parser.add_argument("--use_pipeline", type=str2bool, default=False)
+    parser.add_argument("--pipeline_queue_size", type=int, default=2)
+
     parser.add_argument("--benchmark", type=str2bool, default=False)
     parser.add_argument("--save_log_path", type=str, default="./log_output/")
 
@@ -156,6 +186,17 @@ def init_args():
     parser.add_argument("--use_onnx", type=str2bool, default=False)
     parser.add_argument("--onnx_providers", nargs="+", type=str, default=False)
     parser.add_argument("--onnx_sess_options", type=list, default=False)
+    # onnxruntime session tuning, see tools/infer/onnx_backend.py
+    parser.add_argument("--onnx_intra_op_threads", type=int, default=0)
+    parser.add_argument("--onnx_inter_op_threads", type=int, default=0)
+    parser.add_argument("--onnx_execution_mode", type=str, default="sequential")
+    parser.add_argument("--onnx_thread_affinities", type=str, default="")
+    parser.add_argument("--onnx_allow_spinning", type=str2bool, default=True)
+    parser.add_argument("--onnx_graph_opt_level", type=str, default="all")
+    parser.add_argument("--onnx_mem_arena", type=str2bool, default=True)
+    parser.add_argument("--onnx_cache_dir", type=str, default=None)
+    parser.add_argument("--onnx_io_binding", type=str2bool, default=False)
+    parser.add_argument("--onnx_warmup", type=str2bool, default=False)
 
     # extended function
     parser.add_argument(
@@ -197,37 +238,25 @@ def create_predictor(args, mode, logger):
         logger.info("not find {} model file path {}".format(mode, model_dir))
         sys.exit(0)
     if args.use_onnx:
-        import onnxruntime as ort
-
         model_file_path = model_dir
         if not os.path.exists(model_file_path):
             raise ValueError("not find model file path {}".format(model_file_path))
 
-        sess_options = args.onnx_sess_options or None
-
         if args.onnx_providers and len(args.onnx_providers) > 0:
-            sess = ort.InferenceSession(
-                model_file_path,
-                providers=args.onnx_providers,
-                sess_options=sess_options,
-            )
+            providers = args.onnx_providers
         elif args.use_gpu:
-            sess = ort.InferenceSession(
-                model_file_path,
-                providers=[
-                    (
-                        "CUDAExecutionProvider",
-                        {"device_id": args.gpu_id, "cudnn_conv_algo_search": "DEFAULT"},
-                    )
-                ],
-                sess_options=sess_options,
-            )
+            providers = [
+                (
+                    "CUDAExecutionProvider",
+                    {"device_id": args.gpu_id, "cudnn_conv_algo_search": "DEFAULT"},
+                )
+            ]
         else:
-            sess = ort.InferenceSession(
-                model_file_path,
-                providers=["CPUExecutionProvider"],
-                sess_options=sess_options,
-            )
+            providers = ["CPUExecutionProvider"]
+        sess = OnnxPredictor(
+            create_onnx_session(args, model_file_path, providers),
+            io_binding=args.onnx_io_binding,
+        )
         inputs = sess.get_inputs()
         return (
             sess,
@@ -853,6 +882,21 @@ def draw_boxes(image, boxes, scores=None, drop_score=0.5):
     return image
 
 
+def get_crop_size(points):
+    """width and height get_rotate_crop_image gives the crop of points"""
+    img_crop_width = int(
+        max(
+            np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])
+        )
+    )
+    img_crop_height = int(
+        max(
+            np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])
+        )
+    )
+    return img_crop_width, img_crop_height
+
+
 def get_rotate_crop_image(img, points):
     """
     img_height, img_width = img.shape[0:2]
@@ -865,16 +909,7 @@ def get_rotate_crop_image(img, points):
     points[:, 1] = points[:, 1] - top
     """
     assert len(points) == 4, "shape of points must be 4*2"
-    img_crop_width = int(
-        max(
-            np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])
-        )
-    )
-    img_crop_height = int(
-        max(
-            np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])
-        )
-    )
+    img_crop_width, img_crop_height = get_crop_size(points)
     pts_std = np.float32(
         [
             [0, 0],
@@ -897,7 +932,7 @@ def get_rotate_crop_image(img, points):
     return dst_img
 
 
-def get_minarea_rect_crop(img, points):
+def get_minarea_rect(points):
     bounding_box = cv2.minAreaRect(np.array(points).astype(np.int32))
     points = sorted(list(cv2.boxPoints(bounding_box)), key=lambda x: x[0])
 
@@ -916,48 +951,94 @@ def get_minarea_rect_crop(img, points):
         index_c = 2
 
     box = [points[index_a], points[index_b], points[index_c], points[index_d]]
-    crop_img = get_rotate_crop_image(img, np.array(box))
-    return crop_img
-
+    return np.array(box)
 
-def slice_generator(image, horizontal_stride, vertical_stride, maximum_slices=500):
-    if not isinstance(image, np.ndarray):
-        image = np.array(image)
 
-    image_h, image_w = image.shape[:2]
-    vertical_num_slices = (image_h + vertical_stride - 1) // vertical_stride
-    horizontal_num_slices = (image_w + horizontal_stride - 1) // horizontal_stride
-
-    assert (
-        vertical_num_slices > 0
-    ), f"Invalid number ({vertical_num_slices}) of vertical slices"
+def get_minarea_rect_crop(img, points):
+    return get_rotate_crop_image(img, get_minarea_rect(points))
 
-    assert (
-        horizontal_num_slices > 0
-    ), f"Invalid number ({horizontal_num_slices}) of horizontal slices"
 
-    if vertical_num_slices >= maximum_slices:
-        recommended_vertical_stride = max(1, image_h // maximum_slices) + 1
-        assert (
-            False
-        ), f"Too computationally expensive with {vertical_num_slices} slices, try a higher vertical stride (recommended minimum: {recommended_vertical_stride})"
+def get_axis_aligned_rect(points, img_shape, tol=0.0):
+    """
+    (left, top, width, height) of the slice of the image equivalent to the
+    crop of points, or None if the quad is rotated or leaves the image.
 
-    if horizontal_num_slices >= maximum_slices:
-        recommended_horizontal_stride = max(1, image_w // maximum_slices) + 1
-        assert (
-            False
-        ), f"Too computationally expensive with {horizontal_num_slices} slices, try a higher horizontal stride (recommended minimum: {recommended_horizontal_stride})"
+    With tol == 0 only clockwise rectangles with integer corners qualify; their
+    warped crop is exactly the slice. A positive tol also accepts quads whose
+    corners are within tol pixels of such a rectangle.
+    """
+    points = np.asarray(points)
+    if points.shape != (4, 2):
+        return None
+    xs, ys = points[:, 0], points[:, 1]
+    if tol > 0:
+        rounded = np.round(points)
+        if np.abs(points - rounded).max() > tol:
+            return None
+        xs, ys = rounded[:, 0], rounded[:, 1]
+        if (
+            abs(ys[0] - ys[1]) > tol
+            or abs(ys[2] - ys[3]) > tol
+            or abs(xs[0] - xs[3]) > tol
+            or abs(xs[1] - xs[2]) > tol
+        ):
+            return None
+        left, top = int(min(xs[0], xs[3])), int(min(ys[0], ys[1]))
+        right, bottom = int(max(xs[1], xs[2])), int(max(ys[2], ys[3]))
+    else:
+        if (
+            ys[0] != ys[1]
+            or ys[2] != ys[3]
+            or xs[0] != xs[3]
+            or xs[1] != xs[2]
+            or not np.array_equal(points, np.round(points))
+        ):
+            return None
+        left, top, right, bottom = int(xs[0]), int(ys[0]), int(xs[1]), int(ys[2])
+    width, height = right - left, bottom - top
+    if (
+        width <= 0
+        or height <= 0
+        or left < 0
+        or top < 0
+        or right > img_shape[1]
+        or bottom > img_shape[0]
+    ):
+        return None
+    return left, top, width, height
 
-    for v_slice_idx in range(vertical_num_slices):
-        v_start = max(0, (v_slice_idx * vertical_stride))
-        v_end = min(((v_slice_idx + 1) * vertical_stride), image_h)
-        vertical_slice = image[v_start:v_end, :]
-        for h_slice_idx in range(horizontal_num_slices):
-            h_start = max(0, (h_slice_idx * horizontal_stride))
-            h_end = min(((h_slice_idx + 1) * horizontal_stride), image_w)
-            horizontal_slice = vertical_slice[:, h_start:h_end]
 
-            yield (horizontal_slice, v_start, h_start)
+def get_text_crop(img, points, box_type="quad", target_height=None, axis_tol=0.0):
+    """
+    Crop of a detected box, without copying the image where possible.
+
+    Axis-aligned boxes (see get_axis_aligned_rect) are returned as a view of
+    img, other boxes are warped by get_rotate_crop_image, box_type "poly"
+    boxes being first replaced by their minimum area rectangle. Crops may
+    share memory with img, so neither should be modified in place while the
+    other is in use. With target_height the crop is resized to that height,
+    keeping its aspect ratio, as the recognizer would.
+    """
+    if box_type != "quad":
+        points = get_minarea_rect(points)
+    rect = get_axis_aligned_rect(points, img.shape, axis_tol)
+    if rect is None:
+        crop = get_rotate_crop_image(img, np.asarray(points, dtype=np.float32))
+    else:
+        left, top, width, height = rect
+        crop = img[top : top + height, left : left + width]
+        if axis_tol > 0:
+            # the crop size the warp would have produced
+            crop_size = get_crop_size(np.asarray(points, dtype=np.float32))
+            if crop_size != (width, height) and min(crop_size) > 0:
+                crop = cv2.resize(crop, crop_size)
+        if crop.shape[0] * 1.0 / crop.shape[1] >= 1.5:
+            crop = np.rot90(crop)
+    height, width = crop.shape[0:2]
+    if target_height is not None and height != target_height:
+        out_width = max(1, int(math.ceil(width * target_height / height)))
+        crop = cv2.resize(crop, (out_width, target_height))
+    return crop
 
 
 def calculate_box_extents(box):
@@ -991,31 +1072,87 @@ def merge_boxes(box1, box2, x_threshold, y_threshold):
         return None
 
 
-def merge_fragmented(boxes, x_threshold=10, y_threshold=10):
-    merged_boxes = []
-    visited = set()
+def _merge_fragmented_pass(boxes, x_threshold, y_threshold):
+    # plain floats: the differences of nearby coordinates tested below are
+    # exact in float32 as well, so this agrees with numpy scalar arithmetic
+    min_x, max_x = boxes[:, 0, 0].tolist(), boxes[:, 1, 0].tolist()
+    min_y, max_y = boxes[:, 0, 1].tolist(), boxes[:, 2, 1].tolist()
+    # grid over (left, top) with cells the size of the thresholds: the boxes
+    # that can join a growing box lie in the 3x3 cells around its right end
+    cell_x, cell_y = max(x_threshold, 1), max(y_threshold, 1)
+    grid = {}
+    for idx, key in enumerate(
+        zip(
+            np.floor(np.array(min_x) / cell_x).astype(np.int64).tolist(),
+            np.floor(np.array(min_y) / cell_y).astype(np.int64).tolist(),
+        )
+    ):
+        grid.setdefault(key, []).append(idx)
 
-    for i, box1 in enumerate(boxes):
-        if i in visited:
+    visited = np.zeros(len(boxes), dtype=bool)
+    merged_boxes = []
+    for i in range(len(boxes)):
+        if visited[i]:
             continue
-
-        merged_box = [point[:] for point in box1]
-
-        for j, box2 in enumerate(boxes[i + 1 :], start=i + 1):
-            if j not in visited:
-                merged_result = merge_boxes(
-                    merged_box, box2, x_threshold=x_threshold, y_threshold=y_threshold
-                )
-                if merged_result:
-                    merged_box = merged_result
-                    visited.add(j)
-
+        merged_box = boxes[i]
+        m_min_x, m_max_x, m_min_y, m_max_y = min_x[i], max_x[i], min_y[i], max_y[i]
+        last = i
+        while True:
+            # next box after the last merged one that merges, as a scan of
+            # boxes[last + 1:] in order would find it
+            gx0 = math.floor((m_max_x - x_threshold) / cell_x)
+            gx1 = math.floor((m_max_x + x_threshold) / cell_x)
+            gy0 = math.floor((m_min_y - y_threshold) / cell_y)
+            gy1 = math.floor((m_min_y + y_threshold) / cell_y)
+            found = None
+            for gx in range(gx0, gx1 + 1):
+                for gy in range(gy0, gy1 + 1):
+                    for j in grid.get((gx, gy), ()):
+                        if j <= last or visited[j]:
+                            continue
+                        if found is not None and j > found:
+                            continue
+                        if (
+                            abs(m_min_y - min_y[j]) <= y_threshold
+                            and abs(m_max_y - max_y[j]) <= y_threshold
+                            and abs(m_max_x - min_x[j]) <= x_threshold
+                        ):
+                            found = j
+            if found is None:
+                break
+            j = found
+            m_min_x, m_max_x = min(m_min_x, min_x[j]), max(m_max_x, max_x[j])
+            m_min_y, m_max_y = min(m_min_y, min_y[j]), max(m_max_y, max_y[j])
+            merged_box = None
+            visited[j] = True
+            last = j
+        if merged_box is None:
+            merged_box = [
+                [m_min_x, m_min_y],
+                [m_max_x, m_min_y],
+                [m_max_x, m_max_y],
+                [m_min_x, m_max_y],
+            ]
         merged_boxes.append(merged_box)
+    return np.array(merged_boxes, dtype=boxes.dtype)
 
-    if len(merged_boxes) == len(boxes):
-        return np.array(merged_boxes)
-    else:
-        return merge_fragmented(merged_boxes, x_threshold, y_threshold)
+
+def merge_fragmented(boxes, x_threshold=10, y_threshold=10):
+    """
+    Merge boxes split across slice borders. Boxes are visited in order and
+    each one absorbs, in order, the later boxes whose top and bottom are within
+    y_threshold of it and whose left edge is within x_threshold of its right
+    edge; passes repeat until nothing merges. Candidates are looked up in a
+    grid index, so a pass is linear in the number of boxes on typical pages.
+    """
+    boxes = np.array(boxes)
+    if len(boxes) == 0:
+        return boxes
+    while True:
+        merged_boxes = _merge_fragmented_pass(boxes, x_threshold, y_threshold)
+        if len(merged_boxes) == len(boxes):
+            return merged_boxes
+        boxes = merged_boxes
 
 
 def check_gpu(use_gpu):
@@ -23,16 +23,18 @@ import platform
 import yaml
 import time
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 import paddle
 import paddle.distributed as dist
 from tqdm import tqdm
 import cv2
 import numpy as np
 import copy
+import collections
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 
-from ppocr.utils.stats import TrainingStats
-from ppocr.utils.save_load import save_model
+from ppocr.utils.stats import DeviceTrainingStats
+from ppocr.utils.save_load import CheckpointWriter, save_model
 from ppocr.utils.utility import print_dict, AverageMeter
 from ppocr.utils.logging import get_logger
 from ppocr.utils.loggers import WandbLogger, Loggers
@@ -240,10 +242,15 @@ def train(
     save_model_dir = config["Global"]["save_model_dir"]
     if not os.path.exists(save_model_dir):
         os.makedirs(save_model_dir)
+    checkpoint_writer = None
+    if config["Global"].get("async_checkpoint", False) and dist.get_rank() == 0:
+        checkpoint_writer = CheckpointWriter(
+            max_pending=config["Global"].get("max_pending_checkpoints", 1)
+        )
     main_indicator = eval_class.main_indicator
     best_model_dict = {main_indicator: 0}
     best_model_dict.update(pre_best_model_dict)
-    train_stats = TrainingStats(log_smooth_window, ["lr"])
+    train_stats = DeviceTrainingStats(log_smooth_window, ["lr"])
     model_average = False
     model.train()
 
@@ -282,6 +289,72 @@ def train(
 
     algorithm = config["Architecture"]["algorithm"]
 
+    def train_metric(preds, batch, idx, model_type):
+        batch = [item.numpy() for item in batch]
+        if model_type in ["kie", "sr"]:
+            eval_class(preds, batch)
+        elif model_type in ["table"]:
+            post_result = post_process_class(preds, batch)
+            eval_class(post_result, batch)
+        elif algorithm in ["CAN"]:
+            eval_class(preds[0], batch[2:], epoch_reset=(idx == 0))
+        elif algorithm in ["LaTeXOCR"]:
+            post_result = post_process_class(preds, batch[1], mode="train")
+            eval_class(post_result[0], post_result[1], epoch_reset=(idx == 0))
+        elif algorithm in ["UniMERNet"]:
+            post_result = post_process_class(preds[0], batch[1], mode="train")
+            eval_class(post_result[0], post_result[1], epoch_reset=(idx == 0))
+        elif algorithm in [
+            "PP-FormulaNet-S",
+            "PP-FormulaNet-L",
+            "PP-FormulaNet_plus-S",
+            "PP-FormulaNet_plus-M",
+            "PP-FormulaNet_plus-L",
+        ]:
+            post_result = post_process_class(preds[0], batch[1], mode="train")
+            eval_class(post_result[0], post_result[1], epoch_reset=(idx == 0))
+        else:
+            if config["Loss"]["name"] in [
+                "MultiLoss",
+                "MultiLoss_v2",
+            ]:  # for multi head loss
+                post_result = post_process_class(
+                    preds["ctc"], batch[1]
+                )  # for CTC head out
+            elif config["Loss"]["name"] in ["VLLoss"]:
+                post_result = post_process_class(preds, batch[1], batch[-1])
+            else:
+                post_result = post_process_class(preds, batch[1])
+            eval_class(post_result, batch)
+        return eval_class.get_metric()
+
+    # model_type passed to eval once the training metric has been computed
+    train_metric_model_types = {
+        "CAN": "can",
+        "LaTeXOCR": "latexocr",
+        "UniMERNet": "unimernet",
+        "PP-FormulaNet-S": "pp_formulanet",
+        "PP-FormulaNet-L": "pp_formulanet",
+        "PP-FormulaNet_plus-S": "pp_formulanet",
+        "PP-FormulaNet_plus-M": "pp_formulanet",
+        "PP-FormulaNet_plus-L": "pp_formulanet",
+    }
+    # one worker keeps the updates of eval_class in step order
+    metric_executor = None
+    metric_jobs = collections.deque()
+    if cal_metric_during_train and config["Global"].get("async_train_metric", True):
+        metric_executor = ThreadPoolExecutor(max_workers=1)
+
+    def flush_train_stats():
+        # read back the stats of the steps since the last flush, they are
+        # logged step by step as if they had been logged at every step
+        history = train_stats.flush(
+            history=log_writer is not None and dist.get_rank() == 0
+        )
+        for step, stats in history:
+            log_writer.log_metrics(metrics=stats, prefix="TRAIN", step=step)
+        metric_jobs.clear()
+
     start_epoch = (
         best_model_dict["start_epoch"] if "start_epoch" in best_model_dict else 1
     )
@@ -299,7 +372,10 @@ def train(
     )
 
     for epoch in range(start_epoch, epoch_num + 1):
-        if train_dataloader.dataset.need_reset:
+        if getattr(train_dataloader.dataset, "resample_per_epoch", False):
+            # draw this epoch's samples without rebuilding the dataloader
+            train_dataloader.batch_sampler.set_epoch(epoch)
+        elif train_dataloader.dataset.need_reset:
             train_dataloader = build_dataloader(
                 config, "Train", device, logger, seed=epoch
             )
@@ -380,48 +456,19 @@ def train(
             if (
                 cal_metric_during_train and epoch % calc_epoch_interval == 0
             ):  # only rec and cls need
-                batch = [item.numpy() for item in batch]
-                if model_type in ["kie", "sr"]:
-                    eval_class(preds, batch)
-                elif model_type in ["table"]:
-                    post_result = post_process_class(preds, batch)
-                    eval_class(post_result, batch)
-                elif algorithm in ["CAN"]:
-                    model_type = "can"
-                    eval_class(preds[0], batch[2:], epoch_reset=(idx == 0))
-                elif algorithm in ["LaTeXOCR"]:
-                    model_type = "latexocr"
-                    post_result = post_process_class(preds, batch[1], mode="train")
-                    eval_class(post_result[0], post_result[1], epoch_reset=(idx == 0))
-                elif algorithm in ["UniMERNet"]:
-                    model_type = "unimernet"
-                    post_result = post_process_class(preds[0], batch[1], mode="train")
-                    eval_class(post_result[0], post_result[1], epoch_reset=(idx == 0))
-                elif algorithm in [
-                    "PP-FormulaNet-S",
-                    "PP-FormulaNet-L",
-                    "PP-FormulaNet_plus-S",
-                    "PP-FormulaNet_plus-M",
-                    "PP-FormulaNet_plus-L",
-                ]:
-                    model_type = "pp_formulanet"
-                    post_result = post_process_class(preds[0], batch[1], mode="train")
-                    eval_class(post_result[0], post_result[1], epoch_reset=(idx == 0))
+                if metric_executor is None:
+                    metric = train_metric(preds, batch, idx, model_type)
                 else:
-                    if config["Loss"]["name"] in [
-                        "MultiLoss",
-                        "MultiLoss_v2",
-                    ]:  # for multi head loss
-                        post_result = post_process_class(
-                            preds["ctc"], batch[1]
-                        )  # for CTC head out
-                    elif config["Loss"]["name"] in ["VLLoss"]:
-                        post_result = post_process_class(preds, batch[1], batch[-1])
-                    else:
-                        post_result = post_process_class(preds, batch[1])
-                    eval_class(post_result, batch)
-                metric = eval_class.get_metric()
-                train_stats.update(metric)
+                    metric = metric_executor.submit(
+                        train_metric, preds, batch, idx, model_type
+                    )
+                    # bound the predictions kept alive by the queued jobs
+                    metric_jobs.append(metric)
+                    if len(metric_jobs) > 2:
+                        metric_jobs.popleft().result()
+                if model_type not in ["kie", "sr", "table"]:
+                    model_type = train_metric_model_types.get(algorithm, model_type)
+                train_stats.update(metric, step=global_step + 1)
 
             train_batch_time = time.time() - reader_start
             train_batch_cost += train_batch_time
@@ -432,22 +479,15 @@ def train(
             if not isinstance(lr_scheduler, float):
                 lr_scheduler.step()
 
-            # logger and visualdl
-            stats = {
-                k: float(v) if v.shape == [] else v.numpy().mean()
-                for k, v in loss.items()
-            }
+            # logger and visualdl, the losses are read back at log time
+            stats = dict(loss)
             stats["lr"] = lr
-            train_stats.update(stats)
-
-            if log_writer is not None and dist.get_rank() == 0:
-                log_writer.log_metrics(
-                    metrics=train_stats.get(), prefix="TRAIN", step=global_step
-                )
+            train_stats.update(stats, step=global_step)
 
             if (global_step > 0 and global_step % print_batch_step == 0) or (
                 idx >= len(train_dataloader) - 1
             ):
+                flush_train_stats()
                 logs = train_stats.log()
 
                 eta_sec = (
@@ -487,6 +527,8 @@ def train(
                 and (global_step - start_eval_step) % eval_batch_step == 0
                 and dist.get_rank() == 0
             ):
+                # the training metric jobs share eval_class with eval
+                flush_train_stats()
                 if model_average:
                     Model_Average = paddle.incubate.ModelAverage(
                         0.15,
@@ -549,6 +591,7 @@ def train(
                         best_model_dict=best_model_dict,
                         epoch=epoch,
                         global_step=global_step,
+                        writer=checkpoint_writer,
                     )
                 best_str = "best metric, {}".format(
                     ", ".join(
@@ -568,6 +611,9 @@ def train(
                         step=global_step,
                     )
 
+                    if checkpoint_writer is not None:
+                        # the model files are uploaded, they must be written
+                        checkpoint_writer.wait()
                     log_writer.log_model(
                         is_best=True, prefix="best_accuracy", metadata=best_model_dict
                     )
@@ -597,9 +643,12 @@ def train(
                 best_model_dict=best_model_dict,
                 epoch=epoch,
                 global_step=global_step,
+                writer=checkpoint_writer,
             )
 
             if log_writer is not None:
+                if checkpoint_writer is not None:
+                    checkpoint_writer.wait()
                 log_writer.log_model(is_best=False, prefix="latest")
 
         if dist.get_rank() == 0 and epoch > 0 and epoch % save_epoch_step == 0:
@@ -627,16 +676,24 @@ def train(
                 epoch=epoch,
                 global_step=global_step,
                 done_flag=epoch == config["Global"]["epoch_num"],
+                writer=checkpoint_writer,
             )
             if log_writer is not None:
+                if checkpoint_writer is not None:
+                    checkpoint_writer.wait()
                 log_writer.log_model(
                     is_best=False, prefix="iter_epoch_{}".format(epoch)
                 )
 
+    flush_train_stats()
+    if metric_executor is not None:
+        metric_executor.shutdown()
     best_str = "best metric, {}".format(
         ", ".join(["{}: {}".format(k, v) for k, v in best_model_dict.items()])
     )
     logger.info(best_str)
+    if checkpoint_writer is not None:
+        checkpoint_writer.close()
     if dist.get_rank() == 0 and log_writer is not None:
         log_writer.close()
     return